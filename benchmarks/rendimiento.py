@@ -0,0 +1,301 @@
+"""
+Mide el rendimiento de la consulta por lotes contra la API simulada de `servidor_simulado.py`.
+
+Para cada tamaño de lote genera un CSV de radicaciones y ejecuta `main.py consultar` en un
+proceso aparte y en una carpeta temporal (con la caché vacía). Registra:
+- registros por segundo
+- latencia p50/p99 de las solicitudes
+- memoria máxima (RSS)
+- tiempo de guardado de los archivos de Excel
+
+Antes de los lotes mide el arranque: ejecuta un lote pequeño desde un CSV con `python -X importtime`
+y comprueba que el tiempo total de importación no supere el presupuesto y que pandas no se importe.
+
+Cada medición se anexa a `resultados.jsonl` para seguir su evolución entre cambios. Con
+`--linea-base` las cifras se comparan contra una medición de referencia y el programa termina
+con código 1 si alguna empeora más que la tolerancia.
+
+Uso:
+    python benchmarks/rendimiento.py --tamanos 1000 10000 100000
+    python benchmarks/rendimiento.py --tamanos 1000 --guardar-linea-base benchmarks/linea_base.json
+    python benchmarks/rendimiento.py --tamanos 1000 --linea-base benchmarks/linea_base.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(DIRECTORIO)
+RUTA_RESULTADOS = os.path.join(DIRECTORIO, "resultados.jsonl")
+TAMANOS = (1000, 10000, 100000)
+TOLERANCIA = 0.2
+PRESUPUESTO_ARRANQUE_MS = 450  # importaciones de un lote pequeño desde CSV, incluido openpyxl al guardar
+RADICACIONES_ARRANQUE = 10
+MODULOS_PROHIBIDOS_CSV = ("pandas",)  # la lectura de CSV no debe cargarlos
+
+# Métricas comparadas contra la línea base: nombre -> True si un valor mayor es mejor
+COMPARADAS = {
+    "registros_por_segundo": True,
+    "p99_segundos": False,
+    "rss_maximo_mb": False,
+    "guardado_excel_segundos": False,
+}
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _esperar_puerto(puerto, limite=10.0):
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        try:
+            with socket.create_connection(("127.0.0.1", puerto), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"El servidor simulado no respondió en el puerto {puerto}.")
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def generar_entrada(ruta, tamano):
+    """
+    Escribe un CSV con `tamano` números de radicación distintos.
+    """
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        archivo.write("radicacion\n")
+        for i in range(tamano):
+            archivo.write(f"110013103{i:014d}\n")
+
+
+def percentil_cubetas(cubetas, p):
+    """
+    Estima un percentil a partir de las cubetas de latencia del resumen de métricas.
+
+    Args:
+        cubetas (dict): Límite superior de cada cubeta (como texto, el último "+Inf") -> conteo.
+        p (float): Percentil entre 0 y 100.
+    """
+    total = sum(cubetas.values())
+    if not total:
+        return None
+    acumulado = 0
+    for limite, conteo in cubetas.items():
+        acumulado += conteo
+        if acumulado >= p / 100 * total:
+            return float(limite) if limite != "+Inf" else None
+    return None
+
+
+def ejecutar_lote(tamano, url_api, args):
+    """
+    Ejecuta un lote completo en un proceso aparte y devuelve sus cifras.
+    """
+    with tempfile.TemporaryDirectory(prefix="rendimiento_rama_") as carpeta:
+        generar_entrada(os.path.join(carpeta, "entrada.csv"), tamano)
+        comando = [
+            sys.executable, os.path.join(RAIZ, "main.py"), "consultar", "entrada.csv",
+            "--url-api", url_api,
+            "--concurrencia", str(args.concurrencia),
+            "--tasa-maxima", str(args.tasa_maxima),
+            "--modo", args.modo,
+            "--salida-actuaciones", "actuaciones.xlsx",
+            "--salida-resultado", "resultado.xlsx",
+            "--metricas", "metricas.json",
+        ]
+        if args.descargar:
+            comando.append("--descargar")
+
+        inicio = time.perf_counter()
+        with open(os.path.join(carpeta, "salida.log"), "w", encoding="utf-8") as log:
+            proceso = subprocess.Popen(comando, cwd=carpeta, stdout=log, stderr=subprocess.STDOUT)
+            # wait4 devuelve el uso de recursos de este proceso en particular, incluida su memoria máxima
+            _, estado, uso = os.wait4(proceso.pid, 0)
+            proceso.returncode = os.waitstatus_to_exitcode(estado)
+        segundos = time.perf_counter() - inicio
+        if proceso.returncode != 0:
+            with open(os.path.join(carpeta, "salida.log"), encoding="utf-8") as log:
+                raise RuntimeError(f"El lote de {tamano} terminó con código {proceso.returncode}:\n{log.read()[-2000:]}")
+
+        with open(os.path.join(carpeta, "metricas.json"), encoding="utf-8") as archivo:
+            metricas = json.load(archivo)
+
+    cubetas = {}
+    for latencia in metricas["latencias"].values():
+        for limite, conteo in latencia["cubetas"].items():
+            cubetas[limite] = cubetas.get(limite, 0) + conteo
+    fases = metricas["fases_segundos"]
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    rss = uso.ru_maxrss / 1024 if sys.platform != "darwin" else uso.ru_maxrss / 1048576
+    return {
+        "fecha": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _commit(),
+        "radicaciones": tamano,
+        "concurrencia": args.concurrencia,
+        "latencia_simulada_ms": args.latencia,
+        "segundos": round(segundos, 3),
+        "registros_por_segundo": round(tamano / segundos, 2),
+        "solicitudes": sum(cubetas.values()),
+        "p50_segundos": percentil_cubetas(cubetas, 50),
+        "p99_segundos": percentil_cubetas(cubetas, 99),
+        "rss_maximo_mb": round(rss, 1),
+        "fases_segundos": fases,
+        "guardado_excel_segundos": round(fases.get("guardado_excel", 0), 3),
+    }
+
+
+def medir_arranque(url_api, args):
+    """
+    Ejecuta un lote pequeño desde CSV con `-X importtime` y mide el costo de las importaciones.
+
+    Returns:
+        dict: Con el tiempo total de importación en milisegundos, la duración del lote y los módulos
+            prohibidos que se importaron.
+    """
+    with tempfile.TemporaryDirectory(prefix="arranque_rama_") as carpeta:
+        generar_entrada(os.path.join(carpeta, "entrada.csv"), RADICACIONES_ARRANQUE)
+        inicio = time.perf_counter()
+        proceso = subprocess.run([
+            sys.executable, "-X", "importtime", os.path.join(RAIZ, "main.py"), "consultar", "entrada.csv",
+            "--url-api", url_api,
+            "--tasa-maxima", str(args.tasa_maxima),
+            "--salida-resultado", "resultado.xlsx",
+        ], cwd=carpeta, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        segundos = time.perf_counter() - inicio
+    if proceso.returncode != 0:
+        raise RuntimeError(f"El lote de arranque terminó con código {proceso.returncode}:\n{proceso.stderr[-2000:]}")
+
+    total_us = 0
+    modulos = set()
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        _, acumulado, nombre = linea[len("import time:"):].split("|")
+        modulos.add(nombre.strip())
+        # Los módulos de primer nivel llevan un solo espacio; sus dependencias, más sangría
+        if nombre.startswith(" ") and not nombre.startswith("  "):
+            total_us += int(acumulado)
+    return {
+        "fecha": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _commit(),
+        "tipo": "arranque",
+        "importacion_ms": round(total_us / 1000, 1),
+        "segundos": round(segundos, 3),
+        "modulos_prohibidos": sorted(modulo for modulo in MODULOS_PROHIBIDOS_CSV if modulo in modulos),
+    }
+
+
+def comparar(resultado, base, tolerancia):
+    """
+    Compara una medición con la línea base del mismo tamaño.
+
+    Returns:
+        list: Descripción de cada cifra que empeoró más que la tolerancia.
+    """
+    regresiones = []
+    for nombre, mayor_es_mejor in COMPARADAS.items():
+        actual, referencia = resultado.get(nombre), base.get(nombre)
+        if actual is None or not referencia:
+            continue
+        cambio = (actual - referencia) / referencia
+        if (mayor_es_mejor and cambio < -tolerancia) or (not mayor_es_mejor and cambio > tolerancia):
+            regresiones.append(f"{resultado['radicaciones']} radicaciones: {nombre} pasó de {referencia} a {actual} ({cambio:+.0%})")
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide el rendimiento de la consulta por lotes contra la API simulada.")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=list(TAMANOS[:2]),
+                        help="Tamaños de lote a medir (predeterminado: 1000 10000; agregue 100000 para la prueba larga).")
+    parser.add_argument("--concurrencia", type=int, default=20)
+    parser.add_argument("--tasa-maxima", type=float, default=1000.0, help="Solicitudes por segundo permitidas hacia la API simulada.")
+    parser.add_argument("--modo", default="ultima")
+    parser.add_argument("--descargar", action="store_true", help="Descarga también los adjuntos.")
+    parser.add_argument("--latencia", type=float, default=20.0, help="Latencia media simulada, en milisegundos.")
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="Fracción de respuestas 503 simuladas.")
+    parser.add_argument("--actuaciones", type=int, default=5, help="Actuaciones por proceso simulado.")
+    parser.add_argument("--tamano-adjunto", type=int, default=64 * 1024, help="Tamaño de cada adjunto simulado, en bytes.")
+    parser.add_argument("--salida", default=RUTA_RESULTADOS, help="Archivo JSONL donde se anexan las mediciones.")
+    parser.add_argument("--linea-base", help="Archivo JSON con mediciones de referencia para detectar regresiones.")
+    parser.add_argument("--guardar-linea-base", help="Guarda estas mediciones como nueva línea base.")
+    parser.add_argument("--presupuesto-arranque-ms", type=float, default=PRESUPUESTO_ARRANQUE_MS,
+                        help=f"Tiempo máximo de importación de un lote pequeño desde CSV (predeterminado: {PRESUPUESTO_ARRANQUE_MS} ms).")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA, help="Empeoramiento máximo aceptado (0.2 = 20%%).")
+    args = parser.parse_args(argv)
+
+    puerto = _puerto_libre()
+    servidor = subprocess.Popen([
+        sys.executable, os.path.join(DIRECTORIO, "servidor_simulado.py"),
+        "--puerto", str(puerto),
+        "--latencia", str(args.latencia),
+        "--tasa-error", str(args.tasa_error),
+        "--actuaciones", str(args.actuaciones),
+        "--tamano-adjunto", str(args.tamano_adjunto),
+    ], stdout=subprocess.DEVNULL)
+    resultados = []
+    problemas = []
+    try:
+        _esperar_puerto(puerto)
+        url_api = f"http://127.0.0.1:{puerto}/api/v2"
+
+        arranque = medir_arranque(url_api, args)
+        with open(args.salida, "a", encoding="utf-8") as archivo:
+            archivo.write(json.dumps(arranque, ensure_ascii=False) + "\n")
+        print(f"Arranque: {arranque['importacion_ms']:.0f} ms en importaciones "
+              f"(presupuesto {args.presupuesto_arranque_ms:.0f} ms), lote de {RADICACIONES_ARRANQUE} en {arranque['segundos']:.2f} s")
+        if arranque["importacion_ms"] > args.presupuesto_arranque_ms:
+            problemas.append(f"las importaciones tardan {arranque['importacion_ms']:.0f} ms, "
+                             f"más que el presupuesto de {args.presupuesto_arranque_ms:.0f} ms")
+        if arranque["modulos_prohibidos"]:
+            problemas.append(f"la lectura de CSV importa {', '.join(arranque['modulos_prohibidos'])}")
+
+        print(f"{'radicaciones':>12} {'seg':>9} {'reg/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'RSS MB':>8} {'Excel s':>8}")
+        for tamano in args.tamanos:
+            resultado = ejecutar_lote(tamano, url_api, args)
+            resultados.append(resultado)
+            with open(args.salida, "a", encoding="utf-8") as archivo:
+                archivo.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+            ms = lambda segundos: f"{segundos * 1000:.0f}" if segundos is not None else "-"
+            print(f"{tamano:>12} {resultado['segundos']:>9.1f} {resultado['registros_por_segundo']:>9.1f} "
+                  f"{ms(resultado['p50_segundos']):>8} {ms(resultado['p99_segundos']):>8} "
+                  f"{resultado['rss_maximo_mb']:>8.1f} {resultado['guardado_excel_segundos']:>8.2f}", flush=True)
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+    if args.guardar_linea_base:
+        with open(args.guardar_linea_base, "w", encoding="utf-8") as archivo:
+            json.dump({str(r["radicaciones"]): r for r in resultados}, archivo, ensure_ascii=False, indent=2)
+        print(f"Línea base guardada en {args.guardar_linea_base}.")
+
+    if args.linea_base:
+        with open(args.linea_base, encoding="utf-8") as archivo:
+            base = json.load(archivo)
+        for resultado in resultados:
+            if str(resultado["radicaciones"]) in base:
+                problemas.extend(comparar(resultado, base[str(resultado["radicaciones"])], args.tolerancia))
+    for problema in problemas:
+        print(f"REGRESIÓN: {problema}")
+    if problemas:
+        return 1
+    print("Sin regresiones.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
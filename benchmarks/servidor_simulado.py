@@ -0,0 +1,266 @@
+"""
+Servidor local que imita los endpoints de la API de la Rama Judicial usados por la herramienta.
+
+Sirve datos sintéticos y deterministas (el mismo número de radicación siempre devuelve el mismo
+proceso y las mismas actuaciones) con latencia, tasa de errores, paginación y tamaño de adjuntos
+configurables. Sirve para medir el rendimiento sin depender del servicio real.
+
+Uso:
+    python benchmarks/servidor_simulado.py --puerto 8765 --latencia 20 --tasa-error 0.01
+"""
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+PUERTO = 8765
+PREFIJO_API = "/api/v2"
+
+
+def _semilla(*partes):
+    return int(hashlib.blake2b("/".join(map(str, partes)).encode(), digest_size=8).hexdigest(), 16)
+
+
+class ConfiguracionSimulada:
+    """
+    Parámetros del servidor simulado.
+    """
+
+    def __init__(self, latencia=0.0, tasa_error=0.0, tasa_no_encontrados=0.0, actuaciones=5, por_pagina=40,
+                 documentos=2, tamano_adjunto=64 * 1024):
+        """
+        Args:
+            latencia (float): Latencia media de cada respuesta, en milisegundos. La real varía entre la mitad y 1,5 veces.
+            tasa_error (float): Fracción de solicitudes que responden 503.
+            tasa_no_encontrados (float): Fracción de radicaciones sin procesos asociados.
+            actuaciones (int): Actuaciones de cada proceso.
+            por_pagina (int): Registros por página en los listados.
+            documentos (int): Documentos de cada actuación con documentos.
+            tamano_adjunto (int): Tamaño de cada documento descargable, en bytes.
+        """
+        self.latencia = latencia
+        self.tasa_error = tasa_error
+        self.tasa_no_encontrados = tasa_no_encontrados
+        self.actuaciones = actuaciones
+        self.por_pagina = por_pagina
+        self.documentos = documentos
+        self.tamano_adjunto = tamano_adjunto
+
+
+def _paginacion(total, por_pagina, pagina):
+    return {
+        "cantidadRegistros": total,
+        "registrosPagina": por_pagina,
+        "cantidadPaginas": max(1, -(-total // por_pagina)),
+        "pagina": pagina,
+        "paginas": None,
+    }
+
+
+def procesos_de(numero, config):
+    """
+    Devuelve los procesos sintéticos asociados a un número de radicación.
+    """
+    if random.Random(_semilla("no_encontrado", numero)).random() < config.tasa_no_encontrados:
+        return []
+    return [{
+        "idProceso": _semilla("proceso", numero) % 900_000_000 + 100_000_000,
+        "idConexion": 263,
+        "llaveProceso": numero,
+        "fechaProceso": "2020-03-02T00:00:00",
+        "fechaUltimaActuacion": actuaciones_de(numero, config)[0]["fechaActuacion"] if config.actuaciones else None,
+        "despacho": "JUZGADO 001 CIVIL DEL CIRCUITO DE BOGOTÁ ",
+        "departamento": "BOGOTÁ",
+        "sujetosProcesales": "Demandante: PERSONA DE PRUEBA | Demandado: EMPRESA DE PRUEBA S.A.S.",
+        "esPrivado": False,
+        "cantFilas": -1,
+    }]
+
+
+def actuaciones_de(llave, config):
+    """
+    Devuelve las actuaciones sintéticas de un proceso, de la más reciente a la más antigua.
+    """
+    generador = random.Random(_semilla("actuaciones", llave))
+    fecha = datetime(2025, 1, 1) - timedelta(days=generador.randrange(0, 60))
+    actuaciones = []
+    for k in range(config.actuaciones):
+        cons = config.actuaciones - k
+        actuaciones.append({
+            "idRegActuacion": _semilla("actuacion", llave, cons) % 9_000_000_000 + 1_000_000_000,
+            "llaveProceso": llave,
+            "consActuacion": cons,
+            "fechaActuacion": fecha.strftime("%Y-%m-%dT00:00:00"),
+            "actuacion": "Fijacion estado",
+            "anotacion": f"Actuación registrada el {fecha:%d/%m/%Y}\nA LAS 17:13:42.",
+            "fechaInicial": fecha.strftime("%Y-%m-%dT00:00:00") if k % 3 == 0 else None,
+            "fechaFinal": fecha.strftime("%Y-%m-%dT00:00:00") if k % 3 == 0 else None,
+            "fechaRegistro": fecha.strftime("%Y-%m-%dT00:00:00"),
+            "codRegla": "00                              ",
+            "conDocumentos": k == 0 and config.documentos > 0,
+            "cant": config.actuaciones,
+        })
+        fecha -= timedelta(days=generador.randrange(1, 30))
+    return actuaciones
+
+
+class ManejadorSimulado(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, como el servicio real
+    disable_nagle_algorithm = True  # encabezados y cuerpo van en escrituras separadas
+    config = ConfiguracionSimulada()
+    llaves = {}  # idProceso -> llaveProceso, para responder Actuaciones
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        config = self.config
+        if config.latencia:
+            time.sleep(config.latencia / 1000 * random.uniform(0.5, 1.5))
+        if config.tasa_error and random.random() < config.tasa_error:
+            return self._responder(503, b"Service Unavailable", "text/plain")
+
+        url = urlparse(self.path)
+        ruta = url.path[len(PREFIJO_API):] if url.path.startswith(PREFIJO_API) else url.path
+        partes = ruta.strip("/").split("/")
+        consulta = {clave: valores[0] for clave, valores in parse_qs(url.query).items()}
+        pagina = int(consulta.get("pagina", "1"))
+
+        if ruta.startswith("/Procesos/Consulta/NumeroRadicacion"):
+            numero = consulta.get("numero", "")
+            procesos = procesos_de(numero, config)
+            with self.lock:
+                for proceso in procesos:
+                    self.llaves[proceso["idProceso"]] = numero
+            inicio = (pagina - 1) * config.por_pagina
+            return self._json({
+                "tipoConsulta": "NumeroRadicacion",
+                "procesos": procesos[inicio:inicio + config.por_pagina],
+                "parametros": {"numero": numero, "nombre": None, "tipoPersona": None, "idSujeto": None,
+                               "ponente": None, "claseProceso": None, "codificacionDespacho": None,
+                               "soloActivos": consulta.get("SoloActivos") == "true"},
+                "paginacion": _paginacion(len(procesos), config.por_pagina, pagina),
+            })
+
+        if partes[:2] == ["Proceso", "Actuaciones"] and len(partes) == 3 and partes[2].isdigit():
+            with self.lock:
+                llave = self.llaves.get(int(partes[2]), partes[2])
+            actuaciones = actuaciones_de(llave, config)
+            if "fechaIni" in consulta:
+                actuaciones = [ac for ac in actuaciones if consulta["fechaIni"] <= ac["fechaActuacion"] <= consulta.get("fechaFin", "9999")]
+                if not actuaciones:
+                    return self._json({"Message": "No se encontraron actuaciones en el rango de fechas."}, 404)
+            inicio = (pagina - 1) * config.por_pagina
+            return self._json({
+                "actuaciones": actuaciones[inicio:inicio + config.por_pagina],
+                "paginacion": _paginacion(len(actuaciones), config.por_pagina, pagina),
+            })
+
+        if partes[:2] == ["Proceso", "DocumentosActuacion"] and len(partes) == 3 and partes[2].isdigit():
+            id_reg = int(partes[2])
+            return self._json([
+                {"idRegDocumento": id_reg * 10 + k, "nombre": f"Documento {k + 1}", "descripcion": "AUTO",
+                 "fechaCarga": "2025-01-01T10:00:00"}
+                for k in range(config.documentos)
+            ])
+
+        if partes[:2] == ["Descarga", "Documento"] and len(partes) == 3 and partes[2].isdigit():
+            return self._documento(partes[2])
+
+        return self._json({"Message": "Recurso no encontrado."}, 404)
+
+    def _documento(self, id_documento):
+        bloque = hashlib.sha256(id_documento.encode()).digest()
+        contenido = (bloque * (self.config.tamano_adjunto // len(bloque) + 1))[:self.config.tamano_adjunto]
+        rango = self.headers.get("Range")
+        if rango and rango.startswith("bytes=") and rango[6:].rstrip("-").isdigit():
+            inicio = int(rango[6:].rstrip("-"))
+            if inicio >= len(contenido):
+                return self._responder(416, b"", "application/pdf")
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {inicio}-{len(contenido) - 1}/{len(contenido)}")
+            parte = contenido[inicio:]
+        else:
+            self.send_response(200)
+            self.send_header("Content-Disposition", f'attachment; filename="documento_{id_documento}.pdf"')
+            parte = contenido
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(parte)))
+        self.end_headers()
+        self.wfile.write(parte)
+
+    def _json(self, cuerpo, codigo=200):
+        self._responder(codigo, json.dumps(cuerpo, ensure_ascii=False).encode(), "application/json; charset=utf-8")
+
+    def _responder(self, codigo, cuerpo, tipo):
+        self.send_response(codigo)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+
+class ServidorSimulado(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+def iniciar(puerto=PUERTO, config=None, en_segundo_plano=True):
+    """
+    Inicia el servidor simulado.
+
+    Args:
+        puerto (int): Puerto local donde escuchar. Con 0 se elige uno libre.
+        config (ConfiguracionSimulada, optional): Parámetros de los datos y errores simulados.
+        en_segundo_plano (bool): Si es True, el servidor atiende en un hilo y la función retorna de inmediato.
+
+    Returns:
+        ServidorSimulado: El servidor; su URL base es `url_base(servidor)`.
+    """
+    manejador = type("Manejador", (ManejadorSimulado,), {"config": config or ConfiguracionSimulada(), "llaves": {}})
+    servidor = ServidorSimulado(("127.0.0.1", puerto), manejador)
+    if en_segundo_plano:
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    else:
+        servidor.serve_forever()
+    return servidor
+
+
+def url_base(servidor):
+    """
+    Devuelve la URL base de la API simulada, para usarla en lugar de la del servicio real.
+    """
+    return f"http://127.0.0.1:{servidor.server_address[1]}{PREFIJO_API}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local que imita la API de la Rama Judicial.")
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    parser.add_argument("--latencia", type=float, default=0.0, help="Latencia media por respuesta, en milisegundos.")
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="Fracción de respuestas 503.")
+    parser.add_argument("--tasa-no-encontrados", type=float, default=0.0, help="Fracción de radicaciones sin procesos.")
+    parser.add_argument("--actuaciones", type=int, default=5, help="Actuaciones por proceso.")
+    parser.add_argument("--por-pagina", type=int, default=40, help="Registros por página.")
+    parser.add_argument("--documentos", type=int, default=2, help="Documentos por actuación con documentos.")
+    parser.add_argument("--tamano-adjunto", type=int, default=64 * 1024, help="Tamaño de cada documento, en bytes.")
+    args = parser.parse_args(argv)
+
+    config = ConfiguracionSimulada(args.latencia, args.tasa_error, args.tasa_no_encontrados, args.actuaciones,
+                                   args.por_pagina, args.documentos, args.tamano_adjunto)
+    print(f"API simulada en http://127.0.0.1:{args.puerto}{PREFIJO_API}", flush=True)
+    try:
+        iniciar(args.puerto, config, en_segundo_plano=False)
+    except KeyboardInterrupt:
+        return 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
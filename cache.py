@@ -0,0 +1,215 @@
+import json
+import time
+import sqlite3
+import threading
+
+RUTA_CACHE = "cache_rama.sqlite3"
+TAMANO_MAXIMO = 512 * 1024 * 1024  # bytes
+ACCESOS_POR_ESCRITURA = 200  # aciertos cuyo último acceso se anota en disco de una sola vez
+
+HORA = 60 * 60
+DIA = 24 * HORA
+
+# Tiempo de vida por endpoint, en segundos. Las rutas que no aparecen aquí no se guardan en caché.
+TTL_POR_ENDPOINT = {
+    # La relación radicación -> idProceso prácticamente nunca cambia
+    "Procesos/Consulta/NumeroRadicacion": 30 * DIA,
+    "Proceso/Actuaciones": 6 * HORA,
+    "Proceso/DocumentosActuacion": 7 * DIA,
+}
+
+
+def endpoint_de(ruta):
+    """
+    Devuelve el endpoint de una ruta de la API, sin el identificador final.
+
+    Args:
+        ruta (str): Ruta relativa, por ejemplo "Proceso/Actuaciones/123".
+
+    Returns:
+        str: El endpoint registrado en `TTL_POR_ENDPOINT` al que pertenece la ruta, o None.
+    """
+    ruta = ruta.strip("/")
+    for endpoint in TTL_POR_ENDPOINT:
+        if ruta == endpoint or ruta.startswith(endpoint + "/"):
+            return endpoint
+    return None
+
+
+def clave_de(ruta, params=None):
+    """
+    Construye la clave de caché a partir de la ruta y los parámetros, sin depender de su orden.
+    """
+    params = {k: str(v) for k, v in (params or {}).items()}
+    return ruta.strip("/") + "?" + json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+
+class RespuestaCacheada:
+    """
+    Respuesta servida desde la caché, con la misma interfaz mínima que `requests.Response`
+    que usa el resto del programa.
+    """
+
+    def __init__(self, content, status_code=200):
+        self.content = content
+        self.status_code = status_code
+        self.headers = {}
+        self.from_cache = True
+
+    def json(self):
+        return json.loads(self.content)
+
+    def close(self):
+        pass
+
+
+class CacheRespuestas:
+    """
+    Caché persistente en SQLite de las respuestas JSON de la API.
+
+    Cada entrada expira según el TTL de su endpoint. Cuando el tamaño total supera el máximo,
+    se eliminan las entradas usadas hace más tiempo (LRU). Es seguro usarla desde varios hilos.
+
+    Los aciertos no escriben en disco uno por uno: su último acceso se acumula en memoria y se anota
+    cada `ACCESOS_POR_ESCRITURA` aciertos, antes de expulsar entradas y al cerrar la caché.
+    """
+
+    def __init__(self, ruta=RUTA_CACHE, tamano_maximo=TAMANO_MAXIMO, ttl_por_endpoint=None):
+        """
+        Args:
+            ruta (str): Archivo SQLite donde se guarda la caché.
+            tamano_maximo (int): Tamaño máximo, en bytes, del contenido almacenado.
+            ttl_por_endpoint (dict, optional): Reemplaza los TTL predeterminados de `TTL_POR_ENDPOINT`.
+        """
+        self.ruta = ruta
+        self.tamano_maximo = tamano_maximo
+        self.ttl_por_endpoint = dict(TTL_POR_ENDPOINT, **(ttl_por_endpoint or {}))
+        self._lock = threading.Lock()
+        self._accesos = {}
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.execute("""
+            CREATE TABLE IF NOT EXISTS respuestas (
+                clave TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                contenido BLOB NOT NULL,
+                tamano INTEGER NOT NULL,
+                creado REAL NOT NULL,
+                ultimo_acceso REAL NOT NULL
+            )""")
+        self._conexion.execute("CREATE INDEX IF NOT EXISTS idx_respuestas_acceso ON respuestas (ultimo_acceso)")
+        self._conexion.commit()
+        self._tamano_total = self._conexion.execute("SELECT COALESCE(SUM(tamano), 0) FROM respuestas").fetchone()[0]
+
+    def admite(self, ruta):
+        """
+        Indica si las respuestas de la ruta se pueden guardar en caché.
+        """
+        endpoint = endpoint_de(ruta)
+        return endpoint is not None and self.ttl_por_endpoint.get(endpoint, 0) > 0
+
+    def obtener(self, ruta, params=None):
+        """
+        Busca una respuesta vigente en la caché.
+
+        Args:
+            ruta (str): Ruta relativa de la API.
+            params (dict, optional): Parámetros de la consulta.
+
+        Returns:
+            bytes: El contenido guardado, o None si no existe o ya expiró.
+        """
+        endpoint = endpoint_de(ruta)
+        if endpoint is None:
+            return None
+        clave = clave_de(ruta, params)
+        ahora = time.time()
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT contenido, creado FROM respuestas WHERE clave = ?", (clave,)).fetchone()
+            if fila is None:
+                return None
+            contenido, creado = fila
+            if ahora - creado > self.ttl_por_endpoint.get(endpoint, 0):
+                return None
+            self._accesos[clave] = ahora
+            if len(self._accesos) >= ACCESOS_POR_ESCRITURA:
+                self._anotar_accesos()
+                self._conexion.commit()
+        return contenido
+
+    def _anotar_accesos(self):
+        # Se llama con el lock tomado; el commit queda a cargo de quien llama
+        if self._accesos:
+            self._conexion.executemany(
+                "UPDATE respuestas SET ultimo_acceso = ? WHERE clave = ?",
+                [(acceso, clave) for clave, acceso in self._accesos.items()])
+            self._accesos.clear()
+
+    def guardar(self, ruta, params, contenido):
+        """
+        Guarda o reemplaza el contenido de una respuesta y aplica la política de expulsión.
+
+        Args:
+            ruta (str): Ruta relativa de la API.
+            params (dict): Parámetros de la consulta.
+            contenido (bytes): Cuerpo de la respuesta.
+        """
+        endpoint = endpoint_de(ruta)
+        if endpoint is None:
+            return
+        clave = clave_de(ruta, params)
+        ahora = time.time()
+        with self._lock:
+            # La inserción ya fija el último acceso; uno pendiente y más viejo no debe pisarlo
+            self._accesos.pop(clave, None)
+            anterior = self._conexion.execute("SELECT tamano FROM respuestas WHERE clave = ?", (clave,)).fetchone()
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, endpoint, contenido, tamano, creado, ultimo_acceso) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (clave, endpoint, contenido, len(contenido), ahora, ahora))
+            self._tamano_total += len(contenido) - (anterior[0] if anterior else 0)
+            if self._tamano_total > self.tamano_maximo:
+                self._expulsar()
+            self._conexion.commit()
+
+    def _expulsar(self):
+        # Se libera hasta el 90% del máximo para no expulsar en cada inserción
+        self._anotar_accesos()
+        objetivo = self.tamano_maximo * 0.9
+        cursor = self._conexion.execute("SELECT clave, tamano FROM respuestas ORDER BY ultimo_acceso")
+        expulsadas = []
+        for clave, tamano in cursor:
+            if self._tamano_total <= objetivo:
+                break
+            expulsadas.append((clave,))
+            self._tamano_total -= tamano
+        self._conexion.executemany("DELETE FROM respuestas WHERE clave = ?", expulsadas)
+
+    def purgar_expiradas(self):
+        """
+        Elimina todas las entradas cuyo TTL ya venció.
+
+        Returns:
+            int: Número de entradas eliminadas.
+        """
+        ahora = time.time()
+        eliminadas = 0
+        with self._lock:
+            for endpoint, ttl in self.ttl_por_endpoint.items():
+                cursor = self._conexion.execute(
+                    "DELETE FROM respuestas WHERE endpoint = ? AND creado < ?", (endpoint, ahora - ttl))
+                eliminadas += cursor.rowcount
+            self._conexion.commit()
+            self._tamano_total = self._conexion.execute("SELECT COALESCE(SUM(tamano), 0) FROM respuestas").fetchone()[0]
+        return eliminadas
+
+    def close(self):
+        """
+        Anota los últimos accesos pendientes y cierra la conexión con el archivo de la caché.
+        """
+        with self._lock:
+            self._anotar_accesos()
+            self._conexion.commit()
+            self._conexion.close()
@@ -0,0 +1,381 @@
+import os
+import sys
+import json
+import signal
+import sqlite3
+import argparse
+import threading
+from entrada import cargar_radicaciones, es_excel
+from lote import process_data, resultado_a_json, RUTA_ACTUACIONES
+from diario import RUTA_DIARIO
+from cliente import URL_BASE, TASA_MAXIMA
+from cache import RUTA_CACHE
+from metricas import Metricas, RUTA_METRICAS
+from salidas import crear_salidas, validar_formatos, registro_actuacion, SalidaExcel, FORMATOS, FORMATO_EXCEL, TABLA_ACTUACIONES
+from historial import HistorialActuaciones, RUTA_HISTORIAL
+from motor import CONCURRENCIA_PREDETERMINADA, MODOS, MODO_ULTIMA, MODO_DIAS, MODO_COMPLETO
+from fragmentos import ejecutar_fragmentos, combinar_fragmentos, CARPETA_FRAGMENTOS
+from vigilancia import vigilar, RUTA_VIGILANCIA, RUTA_MARCAS_VIGILANCIA, SOLICITUDES_POR_MINUTO, INTERVALO_MINIMO, INTERVALO_MAXIMO
+
+
+def crear_parser():
+    """
+    Construye el parser de argumentos de la línea de comandos.
+    """
+    parser = argparse.ArgumentParser(
+        prog="main.py",
+        description="Consulta información de procesos judiciales sin interfaz gráfica. "
+                    "Sin argumentos, main.py abre la ventana de configuración.")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    consultar = subparsers.add_parser("consultar", help="Consulta las radicaciones de un archivo Excel o CSV.")
+    consultar.add_argument("archivo", help="Archivo Excel (.xlsx, .xls) o CSV con los números de radicación.")
+    consultar.add_argument("-c", "--columna", type=int,
+                           help="Número de columna con las radicaciones, empezando desde 1. Obligatorio para archivos Excel; "
+                                "en archivos CSV se usa la primera si no se indica.")
+    consultar.add_argument("--concurrencia", type=int, default=CONCURRENCIA_PREDETERMINADA,
+                           help=f"Consultas simultáneas a la API (predeterminado: {CONCURRENCIA_PREDETERMINADA}).")
+    consultar.add_argument("--modo", choices=MODOS, default=MODO_ULTIMA,
+                           help="Actuaciones a consultar de cada proceso (predeterminado: ultima).")
+    consultar.add_argument("--dias", type=int, help="Número de días hacia atrás para --modo dias.")
+    consultar.add_argument("--incremental", action="store_true",
+                           help="Solo consulta las actuaciones posteriores a la última vista de cada proceso.")
+    consultar.add_argument("--refrescar", action="store_true", help="Ignora las respuestas guardadas en la caché local.")
+    consultar.add_argument("--descargar", action="store_true", help="Descarga los documentos adjuntos.")
+    consultar.add_argument("--carpeta-descargas", default=".",
+                           help="Carpeta donde se crean las carpetas de adjuntos de cada radicación.")
+    consultar.add_argument("--salida-actuaciones", default=RUTA_ACTUACIONES,
+                           help=f"Archivo de Excel de actuaciones (predeterminado: {RUTA_ACTUACIONES}).")
+    consultar.add_argument("--salida-resultado",
+                           help="Archivo de Excel de resultados (predeterminado: resultado_procesos_<fecha>.xlsx).")
+    consultar.add_argument("--formatos", nargs="+", choices=FORMATOS, default=[FORMATO_EXCEL],
+                           help="Formatos de salida (predeterminado: excel). Parquet requiere pyarrow; "
+                                "para lotes grandes se recomienda omitir excel.")
+    consultar.add_argument("--carpeta-salidas", default=".",
+                           help="Carpeta de los archivos CSV y JSONL y del conjunto de datos Parquet particionado por fecha.")
+    consultar.add_argument("--reanudar", action="store_true",
+                           help="Continúa un lote interrumpido: no vuelve a consultar las radicaciones ya anotadas en el diario. "
+                                "Con --fragmentos, continúa los diarios de los fragmentos.")
+    consultar.add_argument("--diario", default=RUTA_DIARIO,
+                           help=f"Archivo del diario del lote (predeterminado: {RUTA_DIARIO}).")
+    consultar.add_argument("--historial", default=RUTA_HISTORIAL,
+                           help=f"Historial local donde se guardan todos los procesos y actuaciones recibidos (predeterminado: {RUTA_HISTORIAL}).")
+    consultar.add_argument("--sin-historial", action="store_true", help="No guarda las respuestas en el historial local.")
+    consultar.add_argument("--cache", default=RUTA_CACHE,
+                           help=f"Archivo de la caché local de respuestas de la API (predeterminado: {RUTA_CACHE}).")
+    consultar.add_argument("--fragmentos", type=int,
+                           help="Divide las radicaciones en N fragmentos que se consultan en procesos separados y "
+                                "luego se combinan en los archivos de salida, en el orden de entrada.")
+    consultar.add_argument("--fragmento", type=int, nargs="+",
+                           help="Con --fragmentos, ejecuta solo estos fragmentos (0 a N-1), por ejemplo en otra máquina, "
+                                "sin combinar. También sirve para repetir un fragmento fallido.")
+    consultar.add_argument("--combinar", action="store_true",
+                           help="Con --fragmentos, solo combina los resultados parciales ya terminados, sin consultar la API.")
+    consultar.add_argument("--procesos", type=int,
+                           help="Procesos simultáneos para los fragmentos (predeterminado: uno por fragmento, hasta el número de CPUs). "
+                                "La tasa máxima se reparte entre ellos.")
+    consultar.add_argument("--carpeta-fragmentos", default=CARPETA_FRAGMENTOS,
+                           help=f"Carpeta de los resultados parciales de los fragmentos (predeterminado: {CARPETA_FRAGMENTOS}).")
+    consultar.add_argument("--url-api", default=URL_BASE,
+                           help="URL base de la API. Útil para apuntar a un servidor de pruebas (predeterminado: la API de la Rama Judicial).")
+    consultar.add_argument("--tasa-maxima", type=float, default=TASA_MAXIMA,
+                           help=f"Solicitudes por segundo permitidas hacia la API (predeterminado: {TASA_MAXIMA:g}).")
+    consultar.add_argument("--metricas", default=RUTA_METRICAS,
+                           help=f"Archivo JSON con el resumen de métricas del lote (predeterminado: {RUTA_METRICAS}).")
+    consultar.add_argument("--prometheus",
+                           help="Archivo .prom donde se escriben las métricas para el textfile collector del node exporter.")
+    consultar.add_argument("--perfil", help="Ejecuta las consultas bajo cProfile y guarda las estadísticas en este archivo.")
+    consultar.add_argument("--jsonl", action="store_true",
+                           help="Escribe cada resultado como una línea JSON en la salida estándar. "
+                                "Los mensajes pasan a la salida de errores.")
+    consultar.set_defaults(funcion=comando_consultar)
+
+    historial = subparsers.add_parser(
+        "historial", help="Busca actuaciones en el historial local, sin consultar la API.",
+        description="Busca actuaciones en el historial local que llenan las consultas anteriores. Sin --exportar, "
+                    "escribe cada actuación como una línea JSON en la salida estándar.")
+    historial.add_argument("--ruta", default=RUTA_HISTORIAL, help=f"Archivo del historial (predeterminado: {RUTA_HISTORIAL}).")
+    historial.add_argument("--desde", help="Fecha mínima de la actuación (AAAA-MM-DD).")
+    historial.add_argument("--hasta", help="Fecha máxima de la actuación (AAAA-MM-DD), incluida.")
+    historial.add_argument("--proceso", type=int, help="Solo las actuaciones de este idProceso.")
+    historial.add_argument("--radicacion", help="Solo las actuaciones de este número de radicación.")
+    historial.add_argument("--despacho", help="Solo las actuaciones de procesos cuyo despacho contiene este texto.")
+    documentos = historial.add_mutually_exclusive_group()
+    documentos.add_argument("--con-documentos", dest="con_documentos", action="store_const", const=True,
+                            help="Solo las actuaciones con documentos.")
+    documentos.add_argument("--sin-documentos", dest="con_documentos", action="store_const", const=False,
+                            help="Solo las actuaciones sin documentos.")
+    historial.add_argument("--limite", type=int, help="Número máximo de actuaciones.")
+    historial.add_argument("--procesos", action="store_true",
+                           help="Lista los procesos (filtrados por --radicacion y --despacho) en lugar de las actuaciones.")
+    historial.add_argument("--exportar", help="Guarda las actuaciones encontradas en este archivo de Excel, con el formato "
+                                              "del archivo de actuaciones de una consulta.")
+    historial.add_argument("--url-api", default=URL_BASE, help="URL base para las URLs de descarga del archivo exportado.")
+    historial.set_defaults(funcion=comando_historial)
+
+    vigilar_parser = subparsers.add_parser(
+        "vigilar", help="Vigila de forma continua las radicaciones de un archivo y reporta las actuaciones nuevas.",
+        description="Demonio que consulta las radicaciones de un archivo con una cola de prioridad: los procesos con "
+                    "actividad reciente se consultan más seguido que los inactivos, sin superar un presupuesto de "
+                    "solicitudes por minuto. Cada radicación con actuaciones nuevas se escribe como una línea JSON.")
+    vigilar_parser.add_argument("archivo", help="Archivo Excel (.xlsx, .xls) o CSV con los números de radicación.")
+    vigilar_parser.add_argument("-c", "--columna", type=int,
+                                help="Número de columna con las radicaciones, empezando desde 1. Obligatorio para archivos Excel.")
+    vigilar_parser.add_argument("--solicitudes-por-minuto", type=float, default=SOLICITUDES_POR_MINUTO,
+                                help=f"Presupuesto global de solicitudes a la API (predeterminado: {SOLICITUDES_POR_MINUTO}).")
+    vigilar_parser.add_argument("--concurrencia", type=int, default=4, help="Consultas simultáneas a la API (predeterminado: 4).")
+    vigilar_parser.add_argument("--modo", choices=(MODO_ULTIMA, MODO_COMPLETO), default=MODO_ULTIMA,
+                                help="Reporta solo la actuación nueva más reciente (ultima) o todas las nuevas (completo).")
+    vigilar_parser.add_argument("--intervalo-minimo", type=float, default=INTERVALO_MINIMO / 60,
+                                help=f"Minutos mínimos entre dos consultas de una radicación (predeterminado: {INTERVALO_MINIMO // 60}).")
+    vigilar_parser.add_argument("--intervalo-maximo", type=float, default=INTERVALO_MAXIMO / 3600,
+                                help=f"Horas máximas entre dos consultas de una radicación (predeterminado: {INTERVALO_MAXIMO // 3600}).")
+    vigilar_parser.add_argument("--estado", default=RUTA_VIGILANCIA,
+                                help=f"Archivo con el estado de la cola, que se conserva entre reinicios (predeterminado: {RUTA_VIGILANCIA}).")
+    vigilar_parser.add_argument("--marcas", default=RUTA_MARCAS_VIGILANCIA,
+                                help="Archivo de marcas de agua del demonio, separado del de consultar --incremental "
+                                     f"(predeterminado: {RUTA_MARCAS_VIGILANCIA}).")
+    vigilar_parser.add_argument("--salida", help="Archivo JSONL al que se anexan los cambios. Por defecto, la salida estándar.")
+    vigilar_parser.add_argument("--historial", default=RUTA_HISTORIAL,
+                                help=f"Historial local donde se guardan las respuestas (predeterminado: {RUTA_HISTORIAL}).")
+    vigilar_parser.add_argument("--sin-historial", action="store_true", help="No guarda las respuestas en el historial local.")
+    vigilar_parser.add_argument("--cache", default=RUTA_CACHE,
+                                help=f"Archivo de la caché local de respuestas de la API (predeterminado: {RUTA_CACHE}).")
+    vigilar_parser.add_argument("--url-api", default=URL_BASE, help="URL base de la API.")
+    vigilar_parser.set_defaults(funcion=comando_vigilar)
+
+    return parser
+
+
+def reportar_progreso(salida):
+    """
+    Devuelve una función de progreso que escribe una línea cada vez que avanza un punto porcentual.
+    """
+    ultimo = {"porcentaje": -1}
+
+    def al_progreso(actual, total):
+        porcentaje = int(actual * 100 / total) if total else 100
+        if porcentaje != ultimo["porcentaje"]:
+            ultimo["porcentaje"] = porcentaje
+            salida.write(f"Progreso: {actual}/{total} ({porcentaje}%)\n")
+            salida.flush()
+
+    return al_progreso
+
+
+def mensaje_de_error(error):
+    """
+    Devuelve el mensaje para el usuario de un error que detuvo el lote. Los ValueError ya traen un
+    mensaje completo; los errores de archivos y de SQLite se acompañan de su tipo.
+    """
+    if isinstance(error, ValueError):
+        return str(error)
+    return f"No se pudo ejecutar el lote ({type(error).__name__}): {error}"
+
+
+def comando_consultar(args, parser):
+    if es_excel(args.archivo) and args.columna is None:
+        parser.error("Debe ingresar el número de columna (--columna) para archivos Excel.")
+    if args.concurrencia < 1:
+        parser.error("--concurrencia debe ser mayor o igual a 1.")
+    if args.modo == MODO_DIAS and args.dias is None:
+        parser.error("--modo dias requiere --dias.")
+    if args.dias is not None and args.dias < 1:
+        parser.error("--dias debe ser mayor o igual a 1.")
+    if args.tasa_maxima <= 0:
+        parser.error("--tasa-maxima debe ser mayor que 0.")
+    if args.procesos is not None and args.procesos < 1:
+        parser.error("--procesos debe ser mayor o igual a 1.")
+    if (args.fragmento is not None or args.combinar) and not args.fragmentos:
+        parser.error("--fragmento y --combinar requieren --fragmentos.")
+    if args.fragmentos is not None and args.fragmentos < 1:
+        parser.error("--fragmentos debe ser mayor o igual a 1.")
+    if args.fragmento is not None and not all(0 <= indice < args.fragmentos for indice in args.fragmento):
+        parser.error(f"--fragmento debe estar entre 0 y {args.fragmentos - 1}.")
+
+    # Con --jsonl la salida estándar queda reservada para los resultados
+    salida_mensajes = sys.stderr if args.jsonl else sys.stdout
+    # Los hilos de descarga también envían mensajes: cada línea se escribe completa
+    lock_mensajes = threading.Lock()
+
+    def al_mensaje(*mensaje):
+        with lock_mensajes:
+            salida_mensajes.write(" ".join(map(str, mensaje)) + "\n")
+            salida_mensajes.flush()
+
+    def al_resultado(resultado):
+        print(json.dumps(resultado_a_json(resultado), ensure_ascii=False, default=str), flush=True)
+
+    try:
+        # Antes de consultar, para no descubrir al final (por ejemplo, tras los fragmentos) que falta pyarrow
+        validar_formatos(args.formatos)
+    except ImportError as e:
+        al_mensaje(str(e))
+        return 1
+
+    numero_columna = args.columna - 1 if args.columna is not None else None
+    metricas = Metricas()
+    try:
+        with metricas.fase("ingesta"):
+            entrada = cargar_radicaciones(args.archivo, numero_columna)
+    except Exception as e:
+        al_mensaje(f"Error al leer el archivo {args.archivo}: {e}")
+        return 1
+
+    consulta = {
+        "descargar_adjuntos": args.descargar,
+        "concurrencia": args.concurrencia,
+        "refrescar_cache": args.refrescar,
+        "incremental": args.incremental,
+        "modo": args.modo,
+        "dias": args.dias,
+        "carpeta_descargas": args.carpeta_descargas,
+        "ruta_historial": None if args.sin_historial else args.historial,
+        "ruta_cache": args.cache,
+        "url_base": args.url_api,
+    }
+
+    if args.fragmentos and not args.combinar:
+        indices = args.fragmento if args.fragmento is not None else list(range(args.fragmentos))
+        procesos = args.procesos or min(len(indices), os.cpu_count() or 1)
+        # Los procesos de esta máquina comparten la misma IP de salida, así que se reparten la tasa
+        fallidos = ejecutar_fragmentos(entrada.radicaciones, args.fragmentos, args.carpeta_fragmentos, procesos, indices,
+                                       al_mensaje=al_mensaje, salida_errores=args.jsonl, reanudar=args.reanudar,
+                                       tasa_maxima=args.tasa_maxima / procesos, **consulta)
+        if fallidos:
+            al_mensaje(f"Fragmentos interrumpidos: {' '.join(map(str, fallidos))}. Repítalos con --fragmento "
+                       f"{' '.join(map(str, fallidos))} --reanudar; las radicaciones ya terminadas no se vuelven a consultar.")
+            return 1
+        if args.fragmento is not None:
+            return 0
+
+    try:
+        salidas = crear_salidas(args.formatos, args.salida_actuaciones, args.salida_resultado, args.carpeta_salidas)
+    except (ImportError, OSError) as e:
+        al_mensaje(str(e))
+        return 1
+
+    opciones = dict(
+        consulta,
+        salidas=salidas,
+        metricas=metricas,
+        ruta_metricas=args.metricas,
+        ruta_prometheus=args.prometheus,
+        ruta_perfil=args.perfil,
+        tasa_maxima=args.tasa_maxima,
+        al_progreso=reportar_progreso(sys.stderr),
+        al_mensaje=al_mensaje,
+        al_resultado=al_resultado if args.jsonl else None,
+    )
+    if args.fragmentos:
+        try:
+            combinar_fragmentos(entrada, args.fragmentos, args.carpeta_fragmentos, **opciones)
+        except (ValueError, OSError, sqlite3.Error) as e:
+            for salida in salidas:
+                salida.close()
+            al_mensaje(mensaje_de_error(e))
+            return 1
+        return 0
+
+    try:
+        process_data(entrada, reanudar=args.reanudar, ruta_diario=args.diario, **opciones)
+    except (ValueError, OSError, sqlite3.Error) as e:
+        # Por ejemplo, un diario generado con otros parámetros al usar --reanudar o un historial
+        # en una carpeta que no existe
+        for salida in salidas:
+            salida.close()
+        al_mensaje(mensaje_de_error(e))
+        return 1
+    return 0
+
+
+def comando_historial(args, parser):
+    if not os.path.exists(args.ruta):
+        print(f"No existe el historial {args.ruta}. Se crea al ejecutar una consulta.", file=sys.stderr)
+        return 1
+    historial = HistorialActuaciones(args.ruta)
+    try:
+        if args.procesos:
+            for proceso in historial.procesos(args.radicacion, args.despacho):
+                print(json.dumps(proceso, ensure_ascii=False), flush=True)
+            return 0
+        actuaciones = historial.actuaciones(desde=args.desde, hasta=args.hasta, id_proceso=args.proceso,
+                                            llave_proceso=args.radicacion, despacho=args.despacho,
+                                            con_documentos=args.con_documentos, limite=args.limite)
+    finally:
+        historial.close()
+
+    if args.exportar:
+        salida = SalidaExcel(args.exportar)
+        try:
+            url_base = args.url_api.rstrip("/")
+            for fila in actuaciones:
+                salida.agregar(TABLA_ACTUACIONES, registro_actuacion(
+                    fila["numeroRadicacion"], fila["idProceso"], fila["actuacion"], fila["urlsDocumentos"], url_base))
+            salida.guardar()
+        finally:
+            salida.close()
+        print(f"{len(actuaciones)} actuaciones exportadas a {args.exportar}.", file=sys.stderr)
+        return 0
+
+    for fila in actuaciones:
+        print(json.dumps(fila, ensure_ascii=False), flush=True)
+    print(f"{len(actuaciones)} actuaciones encontradas.", file=sys.stderr)
+    return 0
+
+
+def comando_vigilar(args, parser):
+    if es_excel(args.archivo) and args.columna is None:
+        parser.error("Debe ingresar el número de columna (--columna) para archivos Excel.")
+    if args.concurrencia < 1:
+        parser.error("--concurrencia debe ser mayor o igual a 1.")
+    if args.solicitudes_por_minuto <= 0:
+        parser.error("--solicitudes-por-minuto debe ser mayor que 0.")
+
+    def al_mensaje(*mensaje):
+        print(" ".join(map(str, mensaje)), file=sys.stderr, flush=True)
+
+    try:
+        entrada = cargar_radicaciones(args.archivo, args.columna - 1 if args.columna is not None else None)
+    except Exception as e:
+        al_mensaje(f"Error al leer el archivo {args.archivo}: {e}")
+        return 1
+    if entrada.invalidas:
+        al_mensaje(f"Se omiten {len(entrada.invalidas)} valores que no tienen 23 dígitos.")
+
+    # SIGTERM (systemd, docker stop) termina la ronda en curso y guarda el estado
+    detener = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: detener.set())
+
+    salida = open(args.salida, "a", encoding="utf-8") if args.salida else sys.stdout
+    historial = None if args.sin_historial else HistorialActuaciones(args.historial)
+
+    def al_cambio(resultado):
+        print(json.dumps(resultado_a_json(resultado), ensure_ascii=False, default=str), file=salida, flush=True)
+
+    try:
+        vigilar(entrada.radicaciones, solicitudes_por_minuto=args.solicitudes_por_minuto, concurrencia=args.concurrencia,
+                modo=args.modo, ruta_estado=args.estado, ruta_marcas=args.marcas, ruta_cache=args.cache,
+                intervalo_minimo=args.intervalo_minimo * 60,
+                intervalo_maximo=args.intervalo_maximo * 3600, historial=historial, url_base=args.url_api,
+                detener=detener, al_cambio=al_cambio, al_mensaje=al_mensaje)
+    except KeyboardInterrupt:
+        al_mensaje("Vigilancia interrumpida.")
+    finally:
+        if historial is not None:
+            historial.close()
+        if salida is not sys.stdout:
+            salida.close()
+    return 0
+
+
+def main(argv=None):
+    """
+    Punto de entrada de la línea de comandos.
+
+    Returns:
+        int: Código de salida del proceso.
+    """
+    parser = crear_parser()
+    args = parser.parse_args(argv)
+    return args.funcion(args, parser)
@@ -0,0 +1,251 @@
+import time
+import random
+import threading
+from cache import RespuestaCacheada
+from metricas import endpoint_de_ruta
+
+URL_BASE = "https://consultaprocesos.ramajudicial.gov.co:448/api/v2"
+
+HEADERS = {
+    "accept": "application/json, text/plain, */*",
+    "user-agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+}
+
+HEADERS_DOCUMENTOS = {
+    'accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+    'accept-language': 'es-US,es;q=0.8',
+    'cache-control': 'max-age=0',
+    'priority': 'u=0, i',
+    'sec-ch-ua': '"Brave";v="131", "Chromium";v="131", "Not_A Brand";v="24"',
+    'sec-ch-ua-mobile': '?0',
+    'sec-ch-ua-platform': '"Linux"',
+    'sec-fetch-dest': 'document',
+    'sec-fetch-mode': 'navigate',
+    'sec-fetch-site': 'none',
+    'sec-fetch-user': '?1',
+    'sec-gpc': '1',
+    'upgrade-insecure-requests': '1',
+    'user-agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36'
+}
+
+TIMEOUT_CONEXION = 10  # segundos
+TIMEOUT_LECTURA = 60  # segundos
+REINTENTOS = 4
+BACKOFF_BASE = 0.5  # segundos
+BACKOFF_MAXIMO = 30  # segundos
+TASA_MAXIMA = 10.0  # solicitudes por segundo
+
+CODIGOS_REINTENTABLES = {429, 500, 502, 503, 504}
+CODIGOS_SATURACION = {429, 503}
+
+
+class LimitadorTasa:
+    """
+    Cubeta de fichas (token bucket) compartida por todos los hilos.
+
+    La tasa se reduce a la mitad cada vez que el servidor responde 429 o 503 y se recupera
+    de forma gradual con cada respuesta correcta, hasta volver a la tasa máxima.
+    """
+
+    def __init__(self, tasa_maxima=TASA_MAXIMA, tasa_minima=0.5, capacidad=None):
+        """
+        Args:
+            tasa_maxima (float): Solicitudes por segundo permitidas cuando el servidor responde bien.
+            tasa_minima (float): Límite inferior al que puede bajar la tasa tras recibir 429/503.
+            capacidad (float, optional): Máximo de fichas acumuladas (ráfaga). Por defecto igual a la tasa máxima.
+        """
+        self.tasa_maxima = tasa_maxima
+        self.tasa_minima = min(tasa_minima, tasa_maxima)
+        self.tasa = tasa_maxima
+        self.capacidad = capacidad or max(1.0, tasa_maxima)
+        self._fichas = self.capacidad
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _rellenar(self):
+        ahora = time.monotonic()
+        self._fichas = min(self.capacidad, self._fichas + (ahora - self._ultimo) * self.tasa)
+        self._ultimo = ahora
+
+    def adquirir(self):
+        """
+        Bloquea el hilo actual hasta que haya una ficha disponible.
+        """
+        while True:
+            with self._lock:
+                self._rellenar()
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return
+                espera = (1 - self._fichas) / self.tasa
+            time.sleep(espera)
+
+    def penalizar(self):
+        """
+        Reduce la tasa a la mitad y vacía la cubeta para cortar la ráfaga en curso.
+        """
+        with self._lock:
+            self.tasa = max(self.tasa_minima, self.tasa / 2)
+            self._fichas = min(self._fichas, 0)
+
+    def recompensar(self):
+        """
+        Aumenta la tasa de forma aditiva tras una respuesta correcta.
+        """
+        with self._lock:
+            if self.tasa < self.tasa_maxima:
+                self.tasa = min(self.tasa_maxima, self.tasa + self.tasa_maxima * 0.05)
+
+
+class ClienteRama:
+    """
+    Cliente HTTP único para la API de la Rama Judicial.
+
+    Reutiliza las conexiones TLS mediante un pool con keep-alive, aplica timeouts, reintenta
+    los errores 5xx y de red con backoff exponencial con jitter, y respeta un limitador de tasa
+    adaptativo. Opcionalmente guarda las respuestas JSON en una `CacheRespuestas`.
+    Es seguro usarlo desde varios hilos a la vez.
+    """
+
+    def __init__(self, url_base=URL_BASE, conexiones=10, timeout=(TIMEOUT_CONEXION, TIMEOUT_LECTURA),
+                 reintentos=REINTENTOS, backoff_base=BACKOFF_BASE, backoff_maximo=BACKOFF_MAXIMO,
+                 tasa_maxima=TASA_MAXIMA, cache=None, refrescar=False, metricas=None):
+        """
+        Args:
+            url_base (str): URL base de la API.
+            conexiones (int): Tamaño del pool de conexiones (normalmente igual a la concurrencia).
+            timeout (tuple): Timeout de conexión y de lectura, en segundos.
+            reintentos (int): Número de reintentos ante errores 5xx, 429, timeouts o errores de conexión.
+            backoff_base (float): Espera base del backoff exponencial, en segundos.
+            backoff_maximo (float): Espera máxima entre reintentos, en segundos.
+            tasa_maxima (float): Solicitudes por segundo permitidas por el limitador de tasa.
+            cache (CacheRespuestas, optional): Caché persistente de respuestas. Si es None, no se usa caché.
+            refrescar (bool): Si es True, se ignoran las respuestas guardadas en la caché (pero se actualizan).
+            metricas (Metricas, optional): Registra la latencia, el código de estado y los errores de cada
+                solicitud, los reintentos y los aciertos de la caché.
+        """
+        self.url_base = url_base.rstrip("/")
+        self.timeout = timeout
+        self.reintentos = reintentos
+        self.backoff_base = backoff_base
+        self.backoff_maximo = backoff_maximo
+        self.limitador = LimitadorTasa(tasa_maxima)
+        self.cache = cache
+        self.refrescar = refrescar
+        self.metricas = metricas
+
+        # requests solo se carga al crear un cliente: los comandos que no consultan la API no lo pagan
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=conexiones, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def url(self, ruta):
+        """
+        Construye la URL completa de una ruta de la API (por ejemplo "Proceso/Actuaciones/123").
+        """
+        if ruta.startswith("http://") or ruta.startswith("https://"):
+            return ruta
+        return f"{self.url_base}/{ruta.lstrip('/')}"
+
+    def _ruta_relativa(self, ruta):
+        if ruta.startswith(self.url_base + "/"):
+            return ruta[len(self.url_base) + 1:]
+        if ruta.startswith("http://") or ruta.startswith("https://"):
+            return None
+        return ruta.lstrip("/")
+
+    def get(self, ruta, params=None, headers=None, stream=False, refrescar=None):
+        """
+        Realiza una solicitud GET con reintentos y control de tasa.
+
+        Si hay caché y la ruta pertenece a un endpoint con TTL, una respuesta vigente se devuelve
+        sin salir a la red, y las respuestas 200 se guardan para las siguientes ejecuciones.
+
+        Args:
+            ruta (str): Ruta relativa a la URL base o URL completa.
+            params (dict, optional): Parámetros de la consulta.
+            headers (dict, optional): Encabezados que reemplazan a los predeterminados.
+            stream (bool, optional): Si es True, el cuerpo no se descarga de inmediato y no se usa la caché.
+            refrescar (bool, optional): Fuerza (o evita) la consulta a la red aunque exista una respuesta en
+                caché. Por defecto se usa el valor indicado al crear el cliente.
+
+        Returns:
+            Response: La respuesta en caché (`RespuestaCacheada`) o la última respuesta recibida. Si se
+                agotan los reintentos ante un 5xx o 429, se devuelve esa respuesta para que el llamador
+                la trate como hasta ahora.
+
+        Raises:
+            requests.RequestException: Si tras agotar los reintentos persiste un timeout o error de conexión.
+        """
+        if refrescar is None:
+            refrescar = self.refrescar
+        ruta_cache = self._ruta_relativa(ruta) if self.cache is not None and not stream else None
+        if ruta_cache is not None and self.cache.admite(ruta_cache):
+            if not refrescar:
+                contenido = self.cache.obtener(ruta_cache, params)
+                if contenido is not None:
+                    if self.metricas is not None:
+                        self.metricas.contar("cache_aciertos")
+                    return RespuestaCacheada(contenido)
+            if self.metricas is not None:
+                self.metricas.contar("cache_fallos")
+            response = self._get_red(ruta, params, headers, stream)
+            if response.status_code == 200 and response.content:
+                self.cache.guardar(ruta_cache, params, response.content)
+            return response
+        return self._get_red(ruta, params, headers, stream)
+
+    def _get_red(self, ruta, params, headers, stream):
+        import requests
+        url = self.url(ruta)
+        endpoint = endpoint_de_ruta(self._ruta_relativa(url) or "externo") if self.metricas is not None else None
+        for intento in range(self.reintentos + 1):
+            if intento and self.metricas is not None:
+                self.metricas.contar("reintentos")
+            self.limitador.adquirir()
+            inicio = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=self.timeout, stream=stream)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                if self.metricas is not None:
+                    self.metricas.contar_error(endpoint, e)
+                if intento == self.reintentos:
+                    raise
+                time.sleep(self._espera(intento))
+                continue
+            if self.metricas is not None:
+                self.metricas.observar_solicitud(endpoint, time.perf_counter() - inicio, response.status_code)
+
+            if response.status_code in CODIGOS_SATURACION:
+                self.limitador.penalizar()
+            else:
+                self.limitador.recompensar()
+
+            if response.status_code in CODIGOS_REINTENTABLES and intento < self.reintentos:
+                espera = self._retry_after(response)
+                if espera is None:
+                    espera = self._espera(intento)
+                response.close()
+                time.sleep(espera)
+                continue
+            return response
+
+    def _espera(self, intento):
+        # Backoff exponencial con "full jitter" para no sincronizar los reintentos de todos los hilos
+        return random.uniform(0, min(self.backoff_maximo, self.backoff_base * (2 ** intento)))
+
+    def _retry_after(self, response):
+        valor = response.headers.get("Retry-After")
+        if valor and valor.isdigit():
+            return min(self.backoff_maximo, int(valor))
+        return None
+
+    def close(self):
+        """
+        Cierra las conexiones del pool.
+        """
+        self.session.close()
@@ -0,0 +1,394 @@
+import os
+import re
+import time
+import queue
+import shutil
+import sqlite3
+import hashlib
+import threading
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+RUTA_ALMACEN = "adjuntos"
+TAMANO_BLOQUE = 1024 * 1024  # bytes
+TRABAJADORES_DESCARGA = 4
+CAPACIDAD_COLA_DESCARGAS = 200
+ESPERA_BLOQUEO = 30.0  # segundos que se espera a otro proceso que está escribiendo el índice
+
+
+def nombre_archivo_de(response, url):
+    """
+    Obtiene el nombre del archivo a partir del encabezado Content-Disposition o, si no viene, de la URL.
+    """
+    content_disposition = response.headers.get('Content-Disposition')
+    if content_disposition:
+        match = re.search(r'filename\*?=([^;]+)', content_disposition)
+        if match:
+            return os.path.basename(match.group(1).strip().strip('"').split("''")[-1])
+    return url.split("/")[-1]
+
+
+def _tamano_esperado(response, desplazamiento):
+    # En una respuesta 206 el tamaño total viene en Content-Range: "bytes inicio-fin/total"
+    content_range = response.headers.get('Content-Range')
+    if content_range and "/" in content_range:
+        total = content_range.rsplit("/", 1)[1]
+        if total.isdigit():
+            return int(total)
+    content_length = response.headers.get('Content-Length')
+    if content_length and content_length.isdigit():
+        return desplazamiento + int(content_length)
+    return None
+
+
+def _inicio_content_range(response):
+    match = re.match(r'bytes (\d+)-', response.headers.get('Content-Range', ''))
+    return int(match.group(1)) if match else None
+
+
+def _bloquear(descriptor):
+    if fcntl is not None:
+        fcntl.flock(descriptor, fcntl.LOCK_EX)
+        return
+    while True:
+        try:
+            # LK_LOCK reintenta durante unos segundos y luego falla; se sigue esperando
+            msvcrt.locking(descriptor, msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            pass
+
+
+def _desbloquear(descriptor):
+    if fcntl is not None:
+        fcntl.flock(descriptor, fcntl.LOCK_UN)
+    else:
+        os.lseek(descriptor, 0, os.SEEK_SET)
+        msvcrt.locking(descriptor, msvcrt.LK_UNLCK, 1)
+
+
+@contextlib.contextmanager
+def _bloqueo_archivo(ruta):
+    """
+    Bloqueo exclusivo del sistema operativo sobre un archivo de bloqueo.
+
+    Excluye tanto a otros hilos como a otros procesos (por ejemplo, fragmentos que comparten la
+    carpeta de descargas). En POSIX el archivo se elimina al liberar el bloqueo; quien lo estaba
+    esperando detecta que ya no es el mismo archivo y vuelve a intentarlo con uno nuevo.
+
+    Args:
+        ruta (str): Archivo de bloqueo. Se crea si no existe.
+    """
+    while True:
+        descriptor = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            _bloquear(descriptor)
+        except BaseException:
+            os.close(descriptor)
+            raise
+        try:
+            if os.path.samestat(os.fstat(descriptor), os.stat(ruta)):
+                break
+        except FileNotFoundError:
+            pass
+        _desbloquear(descriptor)
+        os.close(descriptor)
+    try:
+        yield
+    finally:
+        # En Windows no se puede eliminar un archivo abierto: el archivo de bloqueo se conserva
+        if fcntl is not None:
+            os.remove(ruta)
+        _desbloquear(descriptor)
+        os.close(descriptor)
+
+
+class AlmacenDocumentos:
+    """
+    Almacén de adjuntos direccionado por contenido.
+
+    Cada documento se descarga por bloques a un archivo parcial, se verifica contra su
+    Content-Length y se mueve de forma atómica a `objetos/<sha256>`. Las carpetas de cada
+    radicación solo contienen enlaces duros a esos objetos, de modo que un documento repetido
+    se escribe una sola vez. Si una descarga se interrumpe, el archivo parcial se reanuda en el
+    siguiente intento con una solicitud HTTP Range.
+
+    Cada URL se descarga bajo un bloqueo del sistema operativo sobre su archivo parcial, así que
+    varios hilos o procesos pueden compartir el mismo almacén.
+    """
+
+    def __init__(self, cliente, ruta=RUTA_ALMACEN, metricas=None):
+        """
+        Args:
+            cliente (ClienteRama): Cliente HTTP compartido para realizar las descargas.
+            ruta (str): Carpeta raíz del almacén.
+            metricas (Metricas, optional): Registra los bytes recibidos y los documentos reutilizados.
+        """
+        self.cliente = cliente
+        self.ruta = ruta
+        self.metricas = metricas
+        self.ruta_objetos = os.path.join(ruta, "objetos")
+        self.ruta_parciales = os.path.join(ruta, "parciales")
+        os.makedirs(self.ruta_objetos, exist_ok=True)
+        os.makedirs(self.ruta_parciales, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(os.path.join(ruta, "indice.sqlite3"), timeout=ESPERA_BLOQUEO,
+                                         check_same_thread=False)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.execute("""
+            CREATE TABLE IF NOT EXISTS documentos (
+                url TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                nombre TEXT NOT NULL,
+                tamano INTEGER NOT NULL
+            )""")
+        self._conexion.commit()
+
+    def ruta_objeto(self, sha256):
+        """
+        Devuelve la ruta del objeto con el hash indicado.
+        """
+        return os.path.join(self.ruta_objetos, sha256[:2], sha256)
+
+    def _ruta_parcial(self, url):
+        return os.path.join(self.ruta_parciales, hashlib.sha1(url.encode()).hexdigest() + ".part")
+
+    def _buscar(self, url):
+        with self._lock:
+            return self._conexion.execute(
+                "SELECT sha256, nombre FROM documentos WHERE url = ?", (url,)).fetchone()
+
+    def _registrar(self, url, sha256, nombre, tamano):
+        with self._lock:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO documentos (url, sha256, nombre, tamano) VALUES (?, ?, ?, ?)",
+                (url, sha256, nombre, tamano))
+            self._conexion.commit()
+
+    def descargar(self, url, headers, carpeta_descargas):
+        """
+        Descarga un documento (o lo reutiliza si ya está en el almacén) y lo enlaza en la carpeta indicada.
+
+        Args:
+            url (str): La URL del archivo a descargar.
+            headers (dict): Encabezados HTTP para la solicitud.
+            carpeta_descargas (str): Carpeta donde debe aparecer el archivo.
+
+        Returns:
+            tuple: La ruta del archivo dentro de `carpeta_descargas` y los bytes recibidos de la red,
+                que son 0 si el documento ya estaba en el almacén.
+
+        Raises:
+            ValueError: Si el servidor no devuelve el archivo o la descarga queda incompleta.
+        """
+        with _bloqueo_archivo(self._ruta_parcial(url) + ".lock"):
+            conocido = self._buscar(url)
+            if conocido and os.path.exists(self.ruta_objeto(conocido[0])):
+                sha256, nombre = conocido
+                recibidos = 0
+                if self.metricas is not None:
+                    self.metricas.contar("documentos_reutilizados")
+            else:
+                sha256, nombre, recibidos = self._descargar_objeto(url, headers)
+            destino = os.path.join(carpeta_descargas, nombre)
+            self._enlazar(self.ruta_objeto(sha256), destino)
+            return destino, recibidos
+
+    def _descargar_objeto(self, url, headers):
+        ruta_parcial = self._ruta_parcial(url)
+        desplazamiento = os.path.getsize(ruta_parcial) if os.path.exists(ruta_parcial) else 0
+
+        headers_descarga = dict(headers or {})
+        if desplazamiento:
+            headers_descarga["Range"] = f"bytes={desplazamiento}-"
+        response = self.cliente.get(url, headers=headers_descarga, stream=True)
+        try:
+            if desplazamiento and (response.status_code == 416 or (
+                    response.status_code == 206 and _inicio_content_range(response) != desplazamiento)):
+                # El parcial ya no corresponde al archivo del servidor: se descarta y se empieza de nuevo
+                os.remove(ruta_parcial)
+                response.close()
+                return self._descargar_objeto(url, headers)
+            if response.status_code == 206:
+                modo = "ab"
+            elif response.status_code == 200:
+                modo, desplazamiento = "wb", 0
+            else:
+                raise ValueError(f"Respuesta inválida del servidor al descargar. code: {response.status_code}")
+
+            # Las respuestas 206 pueden omitir Content-Disposition; se conserva el nombre del primer intento
+            ruta_nombre = ruta_parcial + ".nombre"
+            if modo == "ab" and not response.headers.get('Content-Disposition') and os.path.exists(ruta_nombre):
+                with open(ruta_nombre, encoding="utf-8") as archivo_nombre:
+                    nombre = archivo_nombre.read()
+            else:
+                nombre = nombre_archivo_de(response, url)
+                with open(ruta_nombre, "w", encoding="utf-8") as archivo_nombre:
+                    archivo_nombre.write(nombre)
+            esperado = _tamano_esperado(response, desplazamiento)
+            if response.headers.get('Content-Encoding', 'identity') != 'identity':
+                # Content-Length se refiere al cuerpo comprimido; no se puede comparar con lo escrito
+                esperado = None
+
+            # El hash se calcula sobre el archivo completo, incluida la parte ya descargada
+            hasher = hashlib.sha256()
+            if modo == "ab":
+                with open(ruta_parcial, "rb") as parcial:
+                    for bloque in iter(lambda: parcial.read(TAMANO_BLOQUE), b""):
+                        hasher.update(bloque)
+
+            recibidos = 0
+            with open(ruta_parcial, modo) as archivo:
+                for bloque in response.iter_content(TAMANO_BLOQUE):
+                    archivo.write(bloque)
+                    hasher.update(bloque)
+                    recibidos += len(bloque)
+                    if self.metricas is not None:
+                        self.metricas.contar("bytes_descargados", len(bloque))
+                archivo.flush()
+                os.fsync(archivo.fileno())
+        finally:
+            response.close()
+
+        tamano = os.path.getsize(ruta_parcial)
+        if esperado is not None and tamano != esperado:
+            raise ValueError(f"Descarga incompleta: {tamano} de {esperado} bytes. Se reanudará en el próximo intento.")
+
+        sha256 = hasher.hexdigest()
+        ruta_objeto = self.ruta_objeto(sha256)
+        if os.path.exists(ruta_objeto):
+            os.remove(ruta_parcial)
+        else:
+            os.makedirs(os.path.dirname(ruta_objeto), exist_ok=True)
+            os.replace(ruta_parcial, ruta_objeto)
+        os.remove(ruta_nombre)
+        self._registrar(url, sha256, nombre, tamano)
+        return sha256, nombre, recibidos
+
+    @staticmethod
+    def _enlazar(origen, destino):
+        if os.path.exists(destino) and os.path.samefile(origen, destino):
+            return
+        temporal = destino + ".tmp"
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        try:
+            os.link(origen, temporal)
+        except OSError:
+            # Sistemas de archivos sin enlaces duros o en otro dispositivo
+            shutil.copyfile(origen, temporal)
+        os.replace(temporal, destino)
+
+    def close(self):
+        """
+        Cierra el índice del almacén.
+        """
+        with self._lock:
+            self._conexion.close()
+
+
+class PoolDescargas:
+    """
+    Pool global de hilos de descarga con una cola acotada.
+
+    Las consultas encolan los documentos y siguen con la siguiente radicación mientras los
+    trabajadores descargan en segundo plano. Si la cola se llena, `enviar` bloquea hasta que
+    haya espacio, lo que frena las consultas en lugar de acumular descargas sin límite.
+    """
+
+    def __init__(self, descargar, trabajadores=TRABAJADORES_DESCARGA, capacidad=CAPACIDAD_COLA_DESCARGAS, metricas=None,
+                 al_mensaje=print):
+        """
+        Args:
+            descargar (callable): Función `descargar(url, headers, carpeta)` que devuelve la ruta del
+                archivo descargado y los bytes recibidos de la red, o None si falló.
+            trabajadores (int): Número fijo de hilos de descarga.
+            capacidad (int): Máximo de descargas en espera antes de bloquear a quien encola.
+            metricas (Metricas, optional): Registra el nivel de la cola de descargas.
+            al_mensaje (callable, optional): Recibe los mensajes de error de los trabajadores. Por defecto se imprimen.
+        """
+        if trabajadores < 1:
+            raise ValueError("El número de trabajadores de descarga debe ser mayor o igual a 1.")
+        self.descargar = descargar
+        self.metricas = metricas
+        self.al_mensaje = al_mensaje
+        self._cola = queue.Queue(maxsize=capacidad)
+        self._estadisticas = [{"archivos": 0, "errores": 0, "bytes": 0, "segundos": 0.0} for _ in range(trabajadores)]
+        self._hilos = [
+            threading.Thread(target=self._trabajar, args=(numero,), name=f"descarga-{numero + 1}", daemon=True)
+            for numero in range(trabajadores)
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def _trabajar(self, numero):
+        estadisticas = self._estadisticas[numero]
+        while True:
+            tarea = self._cola.get()
+            try:
+                if tarea is None:
+                    return
+                inicio = time.monotonic()
+                descargado = self.descargar(*tarea)
+                estadisticas["segundos"] += time.monotonic() - inicio
+                if descargado:
+                    # Solo cuentan los bytes de la red: un documento reutilizado del almacén no suma
+                    estadisticas["archivos"] += 1
+                    estadisticas["bytes"] += descargado[1]
+                else:
+                    estadisticas["errores"] += 1
+            except Exception as e:
+                estadisticas["errores"] += 1
+                self.al_mensaje(f"Error descargando el archivo {tarea[0]}: {e}")
+            finally:
+                self._cola.task_done()
+
+    def enviar(self, url, headers, carpeta_descargas):
+        """
+        Encola un documento para descargarlo. Bloquea si la cola está llena.
+        """
+        self._cola.put((url, headers, carpeta_descargas))
+        if self.metricas is not None:
+            self.metricas.fijar("cola_descargas", self._cola.qsize())
+
+    def pendientes(self):
+        """
+        Devuelve el número aproximado de descargas en espera.
+        """
+        return self._cola.qsize()
+
+    def esperar(self):
+        """
+        Espera a que terminen todas las descargas encoladas hasta el momento.
+        """
+        self._cola.join()
+
+    def cerrar(self):
+        """
+        Espera a que terminen las descargas pendientes y detiene los trabajadores.
+        """
+        self.esperar()
+        for _ in self._hilos:
+            self._cola.put(None)
+        for hilo in self._hilos:
+            hilo.join()
+
+    def resumen(self):
+        """
+        Devuelve las estadísticas de cada trabajador.
+
+        Returns:
+            list: Un diccionario por trabajador con "archivos", "errores", "bytes", "segundos" y
+                "bytes_por_segundo".
+        """
+        return [
+            dict(estadisticas, bytes_por_segundo=estadisticas["bytes"] / estadisticas["segundos"] if estadisticas["segundos"] else 0.0)
+            for estadisticas in self._estadisticas
+        ]
@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import threading
+
+RUTA_DIARIO = "diario_lote.jsonl"
+REGISTROS_POR_FSYNC = 50
+SEGUNDOS_POR_FSYNC = 2.0
+
+
+class DiarioLote:
+    """
+    Diario de solo anexado con el resultado de cada radicación terminada.
+
+    Cada línea es un objeto JSON. La primera es una cabecera con los parámetros del lote y las
+    demás son los resultados, escritos apenas termina cada radicación. El archivo se sincroniza
+    con el disco por tandas (cada `registros_por_fsync` resultados o `segundos_por_fsync`
+    segundos), así que una interrupción pierde como mucho la última tanda. Si el proceso muere a
+    mitad de una línea, esa línea incompleta se descarta al reanudar.
+
+    Al reanudar, el diario se compacta: solo se conserva el último resultado de cada radicación,
+    de modo que los reintentos sucesivos no lo hacen crecer sin límite.
+    """
+
+    def __init__(self, ruta=RUTA_DIARIO, parametros=None, registros_por_fsync=REGISTROS_POR_FSYNC,
+                 segundos_por_fsync=SEGUNDOS_POR_FSYNC):
+        """
+        Args:
+            ruta (str): Archivo JSONL del diario.
+            parametros (dict, optional): Parámetros del lote que deben coincidir para poder reanudarlo.
+            registros_por_fsync (int): Resultados escritos entre dos sincronizaciones con el disco.
+            segundos_por_fsync (float): Tiempo máximo entre dos sincronizaciones con el disco.
+        """
+        self.ruta = ruta
+        self.parametros = parametros or {}
+        self.registros_por_fsync = registros_por_fsync
+        self.segundos_por_fsync = segundos_por_fsync
+        self._lock = threading.Lock()
+        self._archivo = None
+        self._sin_sincronizar = 0
+        self._ultima_sincronizacion = time.monotonic()
+
+    def abrir(self, reanudar=False):
+        """
+        Abre el diario para anexar resultados.
+
+        Args:
+            reanudar (bool): Si es True, carga los resultados del diario existente y lo compacta.
+                Si es False, el diario anterior se descarta y se empieza uno nuevo.
+
+        Returns:
+            dict: Último resultado registrado de cada número de radicación (vacío si no se reanuda).
+
+        Raises:
+            ValueError: Si el diario existente se generó con otros parámetros.
+        """
+        resultados = {}
+        if reanudar and os.path.exists(self.ruta):
+            cabecera, resultados = self._leer()
+            if cabecera is not None and cabecera.get("parametros") != self.parametros:
+                raise ValueError(
+                    f"El diario {self.ruta} se generó con otros parámetros ({cabecera.get('parametros')}). "
+                    "Ejecute sin reanudar para empezar un lote nuevo.")
+        self._reescribir(resultados)
+        self._archivo = open(self.ruta, "a", encoding="utf-8")
+        return resultados
+
+    def _leer(self):
+        cabecera = None
+        resultados = {}
+        with open(self.ruta, encoding="utf-8") as archivo:
+            for linea in archivo:
+                try:
+                    registro = json.loads(linea)
+                except ValueError:
+                    # Línea a medio escribir por una interrupción: lo que sigue no es confiable
+                    break
+                if "parametros" in registro:
+                    cabecera = registro
+                elif "numeroRadicacion" in registro:
+                    resultados[registro["numeroRadicacion"]] = registro
+        return cabecera, resultados
+
+    def _reescribir(self, resultados):
+        # Se escribe un archivo nuevo y se reemplaza de forma atómica para no perder el diario anterior
+        temporal = self.ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as archivo:
+            archivo.write(json.dumps({"parametros": self.parametros}, ensure_ascii=False) + "\n")
+            for resultado in resultados.values():
+                archivo.write(json.dumps(resultado, ensure_ascii=False, default=str) + "\n")
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        os.replace(temporal, self.ruta)
+
+    def compactar(self):
+        """
+        Reescribe el diario conservando solo el último resultado de cada radicación.
+        """
+        with self._lock:
+            abierto = self._archivo is not None
+            if abierto:
+                self._archivo.close()
+            _, resultados = self._leer()
+            self._reescribir(resultados)
+            if abierto:
+                self._archivo = open(self.ruta, "a", encoding="utf-8")
+            self._sin_sincronizar = 0
+
+    def registrar(self, resultado):
+        """
+        Anexa el resultado de una radicación al diario.
+
+        Args:
+            resultado (dict): Resultado serializable como JSON, con la clave "numeroRadicacion".
+        """
+        with self._lock:
+            self._archivo.write(json.dumps(resultado, ensure_ascii=False, default=str) + "\n")
+            self._sin_sincronizar += 1
+            if (self._sin_sincronizar >= self.registros_por_fsync
+                    or time.monotonic() - self._ultima_sincronizacion >= self.segundos_por_fsync):
+                self._sincronizar()
+
+    def _sincronizar(self):
+        self._archivo.flush()
+        os.fsync(self._archivo.fileno())
+        self._sin_sincronizar = 0
+        self._ultima_sincronizacion = time.monotonic()
+
+    def close(self):
+        """
+        Sincroniza los resultados pendientes con el disco y cierra el diario.
+        """
+        with self._lock:
+            if self._archivo is not None:
+                self._sincronizar()
+                self._archivo.close()
+                self._archivo = None
@@ -0,0 +1,178 @@
+import re
+import csv
+import itertools
+
+LARGO_RADICACION = 23
+TAMANO_BLOQUE_LECTURA = 10000  # filas por bloque
+FILA_INICIAL = 2  # la fila 1 es el encabezado
+
+_NO_DIGITOS = re.compile(r'\D')
+
+
+def es_excel(ruta_archivo):
+    return ruta_archivo.endswith('.xlsx') or ruta_archivo.endswith('.xls')
+
+
+def leer_bloques(ruta_archivo, numero_columna=None, tamano_bloque=TAMANO_BLOQUE_LECTURA):
+    """
+    Lee la columna de radicaciones de un archivo Excel o CSV por bloques, sin cargar el archivo completo.
+
+    Los archivos CSV se leen con el módulo `csv` y los .xlsx con openpyxl en modo de solo lectura;
+    pandas solo se importa para el formato antiguo .xls.
+
+    Args:
+        ruta_archivo (str): La ruta del archivo a leer.
+        numero_columna (int, optional): El índice de la columna a leer, empezando desde 0. Por defecto la primera.
+        tamano_bloque (int): Número de filas de cada bloque.
+
+    Yields:
+        tuple: `(filas, valores)`, con los números de fila en el archivo y los valores leídos de esas filas.
+
+    Raises:
+        ValueError: Si el formato del archivo no es soportado.
+    """
+    numero_columna = numero_columna or 0
+    if ruta_archivo.endswith('.xlsx'):
+        yield from _bloques(_filas_xlsx(ruta_archivo, numero_columna), tamano_bloque)
+    elif ruta_archivo.endswith('.xls'):
+        # El formato antiguo de Excel no se puede leer por partes; se divide después de leerlo
+        import pandas as pd
+        df = pd.read_excel(ruta_archivo, usecols=[numero_columna], dtype=str)
+        valores = df.iloc[:, 0].tolist()
+        yield from _bloques(zip(range(FILA_INICIAL, FILA_INICIAL + len(valores)), valores), tamano_bloque)
+    elif ruta_archivo.endswith('.csv'):
+        yield from _bloques(_filas_csv(ruta_archivo, numero_columna), tamano_bloque)
+    else:
+        raise ValueError("Formato de archivo no soportado. Por favor, ingrese un archivo Excel o CSV.")
+
+
+def _filas_xlsx(ruta_archivo, numero_columna):
+    from openpyxl import load_workbook
+    wb = load_workbook(ruta_archivo, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        filas_hoja = ws.iter_rows(min_row=FILA_INICIAL, min_col=numero_columna + 1, max_col=numero_columna + 1, values_only=True)
+        for fila, (valor,) in enumerate(filas_hoja, start=FILA_INICIAL):
+            yield fila, valor
+    finally:
+        wb.close()
+
+
+def _filas_csv(ruta_archivo, numero_columna):
+    # utf-8-sig descarta la marca BOM que agrega Excel al exportar CSV
+    with open(ruta_archivo, newline="", encoding="utf-8-sig") as archivo:
+        lector = csv.reader(archivo)
+        next(lector, None)  # encabezado
+        for campos in lector:
+            yield lector.line_num, campos[numero_columna] if numero_columna < len(campos) else None
+
+
+def _bloques(filas, tamano_bloque):
+    filas = iter(filas)
+    while True:
+        bloque = list(itertools.islice(filas, tamano_bloque))
+        if not bloque:
+            return
+        yield [fila for fila, _ in bloque], [valor for _, valor in bloque]
+
+
+def normalizar_bloque(filas, valores):
+    """
+    Normaliza los números de radicación de un bloque de valores leídos del archivo.
+
+    Recorre los valores uno por uno; el bloque solo agrupa el trabajo por cada lectura del archivo.
+
+    Args:
+        filas (list): Números de fila de los valores.
+        valores (list): Valores leídos del archivo.
+
+    Returns:
+        list: Tuplas `(fila, valor original, radicación)` de los valores no vacíos, donde la radicación
+            conserva solo los dígitos del valor.
+    """
+    normalizados = []
+    for fila, valor in zip(filas, valores):
+        if valor is None or valor != valor:  # vacío o NaN
+            continue
+        valor = str(valor).strip()
+        if valor:
+            normalizados.append((fila, valor, _NO_DIGITOS.sub("", valor)))
+    return normalizados
+
+
+class EntradaRadicaciones:
+    """
+    Radicaciones de un archivo de entrada, normalizadas, validadas y sin repetir.
+
+    Los valores se agregan por bloques. Las radicaciones que no tienen 23 dígitos se rechazan sin
+    consultar la API, y cada radicación repetida se consulta una sola vez, conservando todas las
+    filas del archivo en las que aparece.
+    """
+
+    def __init__(self):
+        self.radicaciones = []  # radicaciones válidas, sin repetir, en orden de aparición
+        self.filas = {}  # radicación -> filas del archivo donde aparece
+        self.invalidas = []  # (fila, valor original) de los valores rechazados
+        self.total = 0  # valores no vacíos leídos
+
+    def agregar(self, filas, valores):
+        """
+        Normaliza y agrega un bloque de valores.
+
+        Args:
+            filas (list): Números de fila de los valores en el archivo.
+            valores (list): Valores leídos del archivo.
+        """
+        for fila, valor, numeroRadicacion in normalizar_bloque(filas, valores):
+            self.total += 1
+            if len(numeroRadicacion) != LARGO_RADICACION:
+                self.invalidas.append((fila, valor))
+            elif numeroRadicacion in self.filas:
+                self.filas[numeroRadicacion].append(fila)
+            else:
+                self.filas[numeroRadicacion] = [fila]
+                self.radicaciones.append(numeroRadicacion)
+
+    @property
+    def repetidas(self):
+        """
+        Número de valores omitidos por repetir una radicación ya leída.
+        """
+        return self.total - len(self.invalidas) - len(self.radicaciones)
+
+
+def preparar_radicaciones(data):
+    """
+    Prepara una lista de números de radicación ya leídos, numerando sus filas desde 1.
+
+    Args:
+        data (list): Números de radicación tal como vienen del usuario.
+
+    Returns:
+        EntradaRadicaciones: Las radicaciones normalizadas, validadas y sin repetir.
+    """
+    data = list(data)
+    entrada = EntradaRadicaciones()
+    entrada.agregar(list(range(1, len(data) + 1)), data)
+    return entrada
+
+
+def cargar_radicaciones(ruta_archivo, numero_columna=None, tamano_bloque=TAMANO_BLOQUE_LECTURA):
+    """
+    Lee un archivo Excel o CSV por bloques y prepara sus números de radicación.
+
+    Args:
+        ruta_archivo (str): La ruta del archivo a leer.
+        numero_columna (int, optional): El índice de la columna con las radicaciones, empezando desde 0.
+        tamano_bloque (int): Número de filas que se leen y normalizan a la vez.
+
+    Returns:
+        EntradaRadicaciones: Las radicaciones normalizadas, validadas y sin repetir.
+
+    Raises:
+        ValueError: Si el formato del archivo no es soportado.
+    """
+    entrada = EntradaRadicaciones()
+    for filas, valores in leer_bloques(ruta_archivo, numero_columna, tamano_bloque):
+        entrada.agregar(filas, valores)
+    return entrada
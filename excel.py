@@ -0,0 +1,131 @@
+import pickle
+import tempfile
+
+ANCHO_MAXIMO = 20  # Máximo ancho de columna
+ALTO_LINEA = 15
+
+# Columnas con formato especial según el tipo de libro
+COLUMNAS_TEXTO = {'resultado': ['A', 'C'], 'actuaciones': ['B', 'F', 'J']}
+COLUMNAS_FECHA = {'resultado': [], 'actuaciones': ['D', 'G', 'H', 'I']}
+COLUMNAS_HIPERVINCULO = ['M', 'N']
+
+
+def _indices(columnas):
+    from openpyxl.utils import column_index_from_string
+    return {column_index_from_string(col) for col in columnas}
+
+
+class EscritorExcel:
+    """
+    Escribe una hoja de Excel en modo streaming, con memoria constante.
+
+    Las filas se guardan a medida que llegan en un archivo temporal mientras se calculan, como
+    máximos acumulados, el ancho de cada columna y el alto de cada fila. Al guardar, el libro se
+    genera en modo de solo escritura de openpyxl aplicando en una sola pasada todo el formato:
+    anchos y altos ajustados, primera fila inmovilizada y en negrita, columnas de texto y de
+    fecha, e hipervínculos.
+    """
+
+    def __init__(self, titulo, tipo_libro):
+        """
+        Args:
+            titulo (str): Título de la hoja.
+            tipo_libro (str): "actuaciones" o "resultado"; define qué columnas llevan formato especial.
+        """
+        if tipo_libro not in COLUMNAS_TEXTO:
+            raise ValueError(f"Tipo de libro no soportado: {tipo_libro}")
+        self.titulo = titulo
+        self.tipo_libro = tipo_libro
+        self.filas = 0
+        self._largos = []
+        self._temporal = tempfile.TemporaryFile()
+
+    def append(self, fila):
+        """
+        Agrega una fila al final de la hoja.
+
+        Args:
+            fila (list): Valores de la fila. La primera fila agregada es el encabezado.
+        """
+        fila = list(fila)
+        for indice, valor in enumerate(fila):
+            if indice == len(self._largos):
+                self._largos.append(0)
+            # Igual que antes, solo los textos cuentan para el ancho de la columna
+            if isinstance(valor, str) and len(valor) > self._largos[indice]:
+                self._largos[indice] = len(valor)
+        pickle.dump(fila, self._temporal, pickle.HIGHEST_PROTOCOL)
+        self.filas += 1
+
+    def _filas_guardadas(self):
+        self._temporal.seek(0)
+        while True:
+            try:
+                yield pickle.load(self._temporal)
+            except EOFError:
+                return
+
+    def guardar(self, ruta):
+        """
+        Genera el archivo .xlsx con todas las filas agregadas y su formato.
+
+        Args:
+            ruta (str): Ruta del archivo de Excel a crear.
+        """
+        # openpyxl solo se importa al guardar; las filas se acumulan sin necesitarlo
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, NamedStyle
+        from openpyxl.utils import get_column_letter
+
+        text_style = NamedStyle(name="text_style")
+        text_style.font = Font(name='Arial', size=11)
+        text_style.number_format = '@'  # Formato de texto
+
+        header_style = NamedStyle(name="header_style")
+        header_style.font = Font(bold=True, size=12)
+
+        columnas_texto = _indices(COLUMNAS_TEXTO[self.tipo_libro])
+        columnas_fecha = _indices(COLUMNAS_FECHA[self.tipo_libro])
+        columnas_hipervinculo = _indices(COLUMNAS_HIPERVINCULO)
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(self.titulo)
+        # Inmovilizar la primera fila
+        ws.freeze_panes = 'A2'
+        for indice, largo in enumerate(self._largos, start=1):
+            ws.column_dimensions[get_column_letter(indice)].width = min(largo + 2, ANCHO_MAXIMO)
+
+        for numero_fila, fila in enumerate(self._filas_guardadas(), start=1):
+            alto = max((len(str(valor).split('\n')) for valor in fila if valor), default=0)
+            ws.row_dimensions[numero_fila].height = alto * ALTO_LINEA
+
+            celdas = []
+            for indice, valor in enumerate(fila, start=1):
+                if numero_fila == 1:
+                    celda = WriteOnlyCell(ws, value=valor)
+                    celda.style = header_style
+                elif indice in columnas_texto:
+                    celda = WriteOnlyCell(ws, value=valor)
+                    celda.style = text_style
+                elif indice in columnas_fecha:
+                    celda = WriteOnlyCell(ws, value=valor)
+                    celda.number_format = 'd-mmm-yy'
+                elif indice in columnas_hipervinculo and isinstance(valor, str) and valor.startswith('https'):
+                    celda = WriteOnlyCell(ws, value=valor)
+                    celda.hyperlink = valor
+                    celda.style = 'Hyperlink'
+                else:
+                    celda = valor
+                celdas.append(celda)
+            ws.append(celdas)
+            # La fila ya se escribió; no hace falta conservar su alto en memoria
+            del ws.row_dimensions[numero_fila]
+
+        wb.save(ruta)
+
+    def close(self):
+        """
+        Elimina el archivo temporal con las filas.
+        """
+        self._temporal.close()
@@ -0,0 +1,191 @@
+import os
+import sys
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from diario import DiarioLote
+from entrada import preparar_radicaciones
+from lote import process_data
+from motor import MODO_ULTIMA
+
+CARPETA_FRAGMENTOS = "fragmentos"
+
+
+def fragmento_de(numeroRadicacion, fragmentos):
+    """
+    Devuelve el fragmento al que pertenece una radicación.
+
+    El reparto usa un hash estable del número de radicación, así que no depende del orden del
+    archivo, del proceso ni de la máquina: la misma radicación siempre cae en el mismo fragmento.
+
+    Args:
+        numeroRadicacion (str): Número de radicación normalizado.
+        fragmentos (int): Número total de fragmentos.
+
+    Returns:
+        int: Índice del fragmento, entre 0 y `fragmentos - 1`.
+    """
+    return int.from_bytes(hashlib.blake2b(numeroRadicacion.encode(), digest_size=8).digest(), "big") % fragmentos
+
+
+def radicaciones_del_fragmento(radicaciones, indice, fragmentos):
+    """
+    Devuelve, en su orden original, las radicaciones que corresponden a un fragmento.
+    """
+    return [numero for numero in radicaciones if fragmento_de(numero, fragmentos) == indice]
+
+
+def ruta_fragmento(carpeta, indice, fragmentos, extension="jsonl"):
+    """
+    Devuelve la ruta del resultado parcial de un fragmento, por ejemplo "fragmentos/fragmento_3_de_8.jsonl".
+    """
+    return os.path.join(carpeta, f"fragmento_{indice}_de_{fragmentos}.{extension}")
+
+
+def _parametros_diario(opciones):
+    # Los mismos parámetros con los que process_data crea y valida el diario
+    return {"modo": opciones.get("modo", MODO_ULTIMA), "dias": opciones.get("dias"),
+            "incremental": opciones.get("incremental", False)}
+
+
+def ejecutar_fragmento(radicaciones, indice, fragmentos, carpeta=CARPETA_FRAGMENTOS, reanudar=False, al_mensaje=print,
+                       **opciones):
+    """
+    Consulta las radicaciones de un fragmento y guarda sus resultados parciales.
+
+    Los resultados quedan en el diario del fragmento, sin generar archivos de salida. Una ejecución
+    nueva descarta el diario anterior del fragmento. Con `reanudar=True` continúa donde quedó y
+    solo vuelve a consultar las radicaciones pendientes o con error, así que un fragmento fallido
+    se puede repetir solo.
+
+    Args:
+        radicaciones (list): Todas las radicaciones normalizadas del lote; se toman las del fragmento.
+        indice (int): Índice del fragmento, entre 0 y `fragmentos - 1`.
+        fragmentos (int): Número total de fragmentos.
+        carpeta (str): Carpeta de los resultados parciales.
+        reanudar (bool, optional): Si es True, continúa el diario existente del fragmento.
+        al_mensaje (callable, optional): Recibe cada mensaje para el usuario.
+        **opciones: Parámetros de consulta de `process_data` (modo, dias, incremental, concurrencia, url_base, ...).
+
+    Returns:
+        dict: El resumen de `process_data` para el fragmento.
+    """
+    if not 0 <= indice < fragmentos:
+        raise ValueError(f"El fragmento debe estar entre 0 y {fragmentos - 1}.")
+    os.makedirs(carpeta, exist_ok=True)
+    propias = radicaciones_del_fragmento(radicaciones, indice, fragmentos)
+    al_mensaje(f"Fragmento {indice} de {fragmentos}: {len(propias)} radicaciones.")
+    return process_data(
+        preparar_radicaciones(propias),
+        salidas=[],
+        reanudar=reanudar,
+        ruta_diario=ruta_fragmento(carpeta, indice, fragmentos),
+        ruta_metricas=ruta_fragmento(carpeta, indice, fragmentos, "metricas.json"),
+        al_mensaje=al_mensaje,
+        **opciones,
+    )
+
+
+def _ejecutar_en_proceso(radicaciones, indice, fragmentos, carpeta, salida_errores, opciones):
+    # Punto de entrada de cada proceso trabajador; los mensajes llevan el número del fragmento
+    salida = sys.stderr if salida_errores else sys.stdout
+
+    def al_mensaje(*mensaje):
+        salida.write(" ".join(map(str, (f"[fragmento {indice}]",) + mensaje)) + "\n")
+        salida.flush()
+
+    return ejecutar_fragmento(radicaciones, indice, fragmentos, carpeta, al_mensaje=al_mensaje, **opciones)
+
+
+def ejecutar_fragmentos(radicaciones, fragmentos, carpeta=CARPETA_FRAGMENTOS, procesos=None, indices=None,
+                        al_mensaje=print, salida_errores=False, **opciones):
+    """
+    Ejecuta varios fragmentos de un lote, cada uno en su propio proceso.
+
+    Args:
+        radicaciones (list): Todas las radicaciones normalizadas del lote.
+        fragmentos (int): Número total de fragmentos.
+        carpeta (str): Carpeta de los resultados parciales.
+        procesos (int, optional): Procesos simultáneos. Por defecto uno por fragmento, hasta el número de CPUs.
+        indices (list, optional): Fragmentos a ejecutar. Por defecto todos.
+        al_mensaje (callable, optional): Recibe cada mensaje para el usuario.
+        salida_errores (bool, optional): Si es True, los procesos de los fragmentos escriben sus mensajes
+            en la salida de errores en lugar de la salida estándar.
+        **opciones: Parámetros de consulta de `process_data`, incluido `reanudar` para continuar los
+            diarios existentes de los fragmentos.
+
+    Returns:
+        list: Índices de los fragmentos que se interrumpieron, para repetirlos con `reanudar=True`. Las
+            radicaciones que terminaron con error dentro de un fragmento se reintentan al repetirlo.
+    """
+    indices = list(range(fragmentos)) if indices is None else list(indices)
+    procesos = procesos or min(len(indices), os.cpu_count() or 1)
+    fallidos = []
+    with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+        futuros = {
+            ejecutor.submit(_ejecutar_en_proceso, radicaciones, indice, fragmentos, carpeta, salida_errores, opciones): indice
+            for indice in indices
+        }
+        for futuro in as_completed(futuros):
+            indice = futuros[futuro]
+            try:
+                resumen = futuro.result()
+            except Exception as e:
+                al_mensaje(f"El fragmento {indice} falló: {e}")
+                fallidos.append(indice)
+                continue
+            al_mensaje(f"Fragmento {indice} terminado: {resumen['exitosos']} exitosos, {resumen['con_error']} con error.")
+    return sorted(fallidos)
+
+
+def combinar_fragmentos(entrada, fragmentos, carpeta=CARPETA_FRAGMENTOS, al_mensaje=print, **opciones):
+    """
+    Combina los resultados parciales de todos los fragmentos en las salidas del lote, en el orden de entrada.
+
+    No consulta la API: los resultados, incluidos los errores, se toman de los diarios de los
+    fragmentos y se escriben igual que en una ejecución sin fragmentos.
+
+    Args:
+        entrada (EntradaRadicaciones): Las radicaciones del lote completo.
+        fragmentos (int): Número total de fragmentos.
+        carpeta (str): Carpeta de los resultados parciales.
+        al_mensaje (callable, optional): Recibe cada mensaje para el usuario.
+        **opciones: Parámetros de `process_data` (salidas, rutas, modo, dias, incremental, ...).
+
+    Returns:
+        dict: El resumen de `process_data`.
+
+    Raises:
+        ValueError: Si falta algún resultado parcial o algún fragmento tiene radicaciones sin consultar.
+    """
+    parametros = _parametros_diario(opciones)
+    resultados = {}
+    incompletos = []
+    for indice in range(fragmentos):
+        ruta = ruta_fragmento(carpeta, indice, fragmentos)
+        if not os.path.exists(ruta):
+            incompletos.append(indice)
+            continue
+        diario = DiarioLote(ruta, parametros)
+        try:
+            previos = diario.abrir(reanudar=True)
+        finally:
+            diario.close()
+        faltantes = [numero for numero in radicaciones_del_fragmento(entrada.radicaciones, indice, fragmentos)
+                     if numero not in previos]
+        if faltantes:
+            incompletos.append(indice)
+        resultados.update(previos)
+    if incompletos:
+        raise ValueError(f"Hay fragmentos sin terminar: {', '.join(map(str, incompletos))}. Ejecútelos de nuevo antes de combinar.")
+
+    # Un diario con todos los resultados permite reutilizar la reanudación de process_data
+    ruta_combinado = os.path.join(carpeta, f"combinado_de_{fragmentos}.jsonl")
+    diario = DiarioLote(ruta_combinado, parametros)
+    diario.abrir(reanudar=False)
+    try:
+        for numero in entrada.radicaciones:
+            diario.registrar(resultados[numero])
+    finally:
+        diario.close()
+    return process_data(entrada, reanudar=True, reintentar_errores=False, ruta_diario=ruta_combinado,
+                        al_mensaje=al_mensaje, **opciones)
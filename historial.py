@@ -0,0 +1,220 @@
+import json
+import time
+import sqlite3
+import threading
+
+RUTA_HISTORIAL = "historial_actuaciones.sqlite3"
+ESPERA_BLOQUEO = 30.0  # segundos que se espera a otro proceso que está escribiendo
+
+# Columnas de la tabla de actuaciones que se pueden filtrar; la actuación completa queda en `datos`
+COLUMNAS_ACTUACION = ("idRegActuacion", "idProceso", "llaveProceso", "consActuacion", "fechaActuacion", "actuacion",
+                      "anotacion", "fechaRegistro", "conDocumentos")
+COLUMNAS_PROCESO = ("idProceso", "llaveProceso", "despacho", "departamento", "sujetosProcesales", "fechaProceso",
+                    "fechaUltimaActuacion", "esPrivado")
+
+
+def _fin_del_dia(fecha):
+    # "2025-01-31" incluye todas las actuaciones de ese día
+    return fecha + "T23:59:59" if len(fecha) == 10 else fecha
+
+
+class HistorialActuaciones:
+    """
+    Historial local de todos los procesos y actuaciones que ha devuelto la API.
+
+    Cada consulta de un lote actualiza el historial (insertando o reemplazando por identificador),
+    de modo que preguntas por rango de fechas, por proceso o por despacho se responden desde el
+    disco sin volver a consultar la API. Cada escritura se confirma de inmediato: en modo WAL
+    con `synchronous=NORMAL` confirmar no sincroniza el disco, y así ningún proceso retiene el
+    bloqueo de escritura. Es seguro usarlo desde varios hilos y desde varios procesos que
+    comparten el archivo.
+    """
+
+    def __init__(self, ruta=RUTA_HISTORIAL):
+        """
+        Args:
+            ruta (str): Archivo SQLite del historial.
+        """
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, timeout=ESPERA_BLOQUEO, check_same_thread=False)
+        self._conexion.row_factory = sqlite3.Row
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.executescript("""
+            CREATE TABLE IF NOT EXISTS procesos (
+                idProceso INTEGER PRIMARY KEY,
+                llaveProceso TEXT NOT NULL,
+                despacho TEXT,
+                departamento TEXT,
+                sujetosProcesales TEXT,
+                fechaProceso TEXT,
+                fechaUltimaActuacion TEXT,
+                esPrivado INTEGER,
+                actualizado REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_procesos_llave ON procesos (llaveProceso);
+            CREATE INDEX IF NOT EXISTS idx_procesos_despacho ON procesos (despacho);
+
+            CREATE TABLE IF NOT EXISTS actuaciones (
+                idRegActuacion INTEGER PRIMARY KEY,
+                idProceso INTEGER NOT NULL,
+                llaveProceso TEXT,
+                consActuacion INTEGER,
+                fechaActuacion TEXT,
+                actuacion TEXT,
+                anotacion TEXT,
+                fechaRegistro TEXT,
+                conDocumentos INTEGER,
+                urlsDocumentos TEXT,
+                datos TEXT NOT NULL,
+                actualizado REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_actuaciones_proceso ON actuaciones (idProceso, fechaActuacion);
+            CREATE INDEX IF NOT EXISTS idx_actuaciones_llave ON actuaciones (llaveProceso, fechaActuacion);
+            CREATE INDEX IF NOT EXISTS idx_actuaciones_fecha ON actuaciones (fechaActuacion);
+            CREATE INDEX IF NOT EXISTS idx_actuaciones_documentos ON actuaciones (conDocumentos, fechaActuacion);
+        """)
+        self._conexion.commit()
+
+    def registrar_proceso(self, proceso):
+        """
+        Inserta o actualiza un proceso devuelto por la consulta por número de radicación.
+        """
+        fila = [proceso.get(columna) for columna in COLUMNAS_PROCESO] + [time.time()]
+        with self._lock:
+            self._conexion.execute(
+                f"INSERT INTO procesos ({', '.join(COLUMNAS_PROCESO)}, actualizado) "
+                f"VALUES ({', '.join('?' * (len(COLUMNAS_PROCESO) + 1))}) "
+                f"ON CONFLICT (idProceso) DO UPDATE SET "
+                + ", ".join(f"{columna} = excluded.{columna}" for columna in COLUMNAS_PROCESO[1:] + ("actualizado",)),
+                fila)
+            self._conexion.commit()
+
+    def registrar_actuaciones(self, id_proceso, actuaciones):
+        """
+        Inserta o actualiza, en una sola operación, las actuaciones de un proceso.
+
+        Args:
+            id_proceso (int): Identificador del proceso.
+            actuaciones (list): Actuaciones devueltas por la API.
+        """
+        ahora = time.time()
+        filas = []
+        for ac in actuaciones:
+            fila = [ac.get(columna) for columna in COLUMNAS_ACTUACION]
+            fila[1] = id_proceso
+            fila.append(json.dumps(ac, ensure_ascii=False))
+            fila.append(ahora)
+            filas.append(fila)
+        if not filas:
+            return
+        columnas = COLUMNAS_ACTUACION + ("datos", "actualizado")
+        with self._lock:
+            # Las URLs de documentos se conservan: se registran aparte y no vienen en la actuación
+            self._conexion.executemany(
+                f"INSERT INTO actuaciones ({', '.join(columnas)}) VALUES ({', '.join('?' * len(columnas))}) "
+                f"ON CONFLICT (idRegActuacion) DO UPDATE SET "
+                + ", ".join(f"{columna} = excluded.{columna}" for columna in columnas[1:]),
+                filas)
+            self._conexion.commit()
+
+    def registrar_documentos(self, id_reg_actuacion, urls_documentos):
+        """
+        Guarda las URLs de descarga de los documentos de una actuación ya registrada.
+        """
+        with self._lock:
+            self._conexion.execute(
+                "UPDATE actuaciones SET urlsDocumentos = ? WHERE idRegActuacion = ?",
+                (json.dumps(urls_documentos), id_reg_actuacion))
+            self._conexion.commit()
+
+    def actuaciones(self, desde=None, hasta=None, id_proceso=None, llave_proceso=None, despacho=None,
+                    con_documentos=None, limite=None):
+        """
+        Busca actuaciones en el historial, de la más reciente a la más antigua.
+
+        Args:
+            desde (str, optional): Fecha mínima de la actuación, "AAAA-MM-DD" o "AAAA-MM-DDTHH:MM:SS".
+            hasta (str, optional): Fecha máxima de la actuación. Una fecha sin hora incluye todo ese día.
+            id_proceso (int, optional): Solo las actuaciones de este proceso.
+            llave_proceso (str, optional): Solo las actuaciones de este número de radicación.
+            despacho (str, optional): Solo las de procesos cuyo despacho contiene este texto.
+            con_documentos (bool, optional): Solo las actuaciones con (True) o sin (False) documentos.
+            limite (int, optional): Número máximo de actuaciones a devolver.
+
+        Returns:
+            list: Diccionarios con las claves "numeroRadicacion", "idProceso", "despacho", "actuacion"
+                (la actuación tal como la devolvió la API) y "urlsDocumentos" (lista o None).
+        """
+        condiciones = []
+        parametros = []
+        if desde:
+            condiciones.append("a.fechaActuacion >= ?")
+            parametros.append(desde)
+        if hasta:
+            condiciones.append("a.fechaActuacion <= ?")
+            parametros.append(_fin_del_dia(hasta))
+        if id_proceso is not None:
+            condiciones.append("a.idProceso = ?")
+            parametros.append(int(id_proceso))
+        if llave_proceso:
+            condiciones.append("a.llaveProceso = ?")
+            parametros.append(llave_proceso)
+        if despacho:
+            condiciones.append("p.despacho LIKE ?")
+            parametros.append(f"%{despacho.strip()}%")
+        if con_documentos is not None:
+            condiciones.append("a.conDocumentos = ?")
+            parametros.append(int(con_documentos))
+        consulta = ("SELECT a.llaveProceso, a.idProceso, p.despacho, a.datos, a.urlsDocumentos "
+                    "FROM actuaciones a LEFT JOIN procesos p ON p.idProceso = a.idProceso")
+        if condiciones:
+            consulta += " WHERE " + " AND ".join(condiciones)
+        consulta += " ORDER BY a.fechaActuacion DESC, a.consActuacion DESC"
+        if limite:
+            consulta += " LIMIT ?"
+            parametros.append(int(limite))
+        with self._lock:
+            filas = self._conexion.execute(consulta, parametros).fetchall()
+        return [{
+            "numeroRadicacion": fila["llaveProceso"],
+            "idProceso": fila["idProceso"],
+            "despacho": fila["despacho"],
+            "actuacion": json.loads(fila["datos"]),
+            "urlsDocumentos": json.loads(fila["urlsDocumentos"]) if fila["urlsDocumentos"] else None,
+        } for fila in filas]
+
+    def procesos(self, llave_proceso=None, despacho=None):
+        """
+        Busca procesos en el historial.
+
+        Args:
+            llave_proceso (str, optional): Solo los procesos de este número de radicación.
+            despacho (str, optional): Solo los procesos cuyo despacho contiene este texto.
+
+        Returns:
+            list: Diccionarios con los datos del proceso y "actuaciones" (número de actuaciones en el historial).
+        """
+        condiciones = []
+        parametros = []
+        if llave_proceso:
+            condiciones.append("p.llaveProceso = ?")
+            parametros.append(llave_proceso)
+        if despacho:
+            condiciones.append("p.despacho LIKE ?")
+            parametros.append(f"%{despacho.strip()}%")
+        consulta = (f"SELECT {', '.join('p.' + columna for columna in COLUMNAS_PROCESO)}, "
+                    "(SELECT COUNT(*) FROM actuaciones a WHERE a.idProceso = p.idProceso) AS actuaciones FROM procesos p")
+        if condiciones:
+            consulta += " WHERE " + " AND ".join(condiciones)
+        consulta += " ORDER BY p.fechaUltimaActuacion DESC"
+        with self._lock:
+            return [dict(fila) for fila in self._conexion.execute(consulta, parametros)]
+
+    def close(self):
+        """
+        Cierra el historial.
+        """
+        with self._lock:
+            self._conexion.close()
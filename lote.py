@@ -0,0 +1,391 @@
+import os
+import functools
+from datetime import datetime
+from cliente import ClienteRama, URL_BASE, TASA_MAXIMA
+from cache import CacheRespuestas, RUTA_CACHE
+from sincronizacion import MarcasAgua
+from descargas import AlmacenDocumentos, PoolDescargas, RUTA_ALMACEN, TRABAJADORES_DESCARGA
+from diario import DiarioLote, RUTA_DIARIO
+from entrada import EntradaRadicaciones, preparar_radicaciones
+from motor import MotorConsultas, validar_parametros, CONCURRENCIA_PREDETERMINADA, MODO_ULTIMA
+from metricas import Metricas, RUTA_METRICAS
+from salidas import crear_salidas, registro_actuacion, TABLA_ACTUACIONES, TABLA_RESULTADO, FORMATO_EXCEL
+from historial import HistorialActuaciones, RUTA_HISTORIAL
+
+RUTA_ACTUACIONES = "actuaciones_procesos.xlsx"
+
+
+def resultado_a_json(resultado):
+    """
+    Convierte el resultado de una radicación en un diccionario serializable como JSON.
+    """
+    error = resultado["error"]
+    return dict(resultado, error=str(error) if error is not None else None)
+
+
+def download_file_threaded(url, headers, carpeta_descargas, almacen, al_mensaje=print):
+    """
+    Descarga un archivo desde una URL y lo deja en una carpeta específica, enlazado desde el almacén de adjuntos.
+
+    Args:
+        url (str): La URL del archivo a descargar.
+        headers (dict): Encabezados HTTP para la solicitud.
+        carpeta_descargas (str): Carpeta donde se guardará el archivo.
+        almacen (AlmacenDocumentos): Almacén compartido que descarga por bloques y evita duplicados.
+        al_mensaje (callable, optional): Recibe los mensajes de error. Por defecto se imprimen.
+
+    Returns:
+        tuple: La ruta del archivo descargado y los bytes recibidos de la red, o None si ocurrió un error.
+    """
+    try:
+        return almacen.descargar(url, headers, carpeta_descargas)
+    except Exception as e:
+        al_mensaje(f"Error descargando el archivo {url}: {e}")
+        return None
+
+
+def process_data(data, descargar_adjuntos=False, concurrencia=CONCURRENCIA_PREDETERMINADA, refrescar_cache=False,
+                 incremental=False, modo=MODO_ULTIMA, dias=None, ruta_actuaciones=RUTA_ACTUACIONES, ruta_resultado=None,
+                 carpeta_descargas=".", formatos=(FORMATO_EXCEL,), carpeta_salidas=".", salidas=None, reanudar=False,
+                 reintentar_errores=True, ruta_diario=RUTA_DIARIO, ruta_historial=RUTA_HISTORIAL, ruta_cache=RUTA_CACHE, metricas=None,
+                 ruta_metricas=RUTA_METRICAS, ruta_prometheus=None, ruta_perfil=None, url_base=URL_BASE,
+                 tasa_maxima=TASA_MAXIMA, control=None, al_progreso=None, al_mensaje=print, al_resultado=None):
+    """
+    Procesa cada número de radicación, consulta la información del proceso y guarda los resultados en las salidas elegidas.
+    Las consultas se ejecutan de forma concurrente, pero las filas se escriben en el orden de entrada.
+    En modo incremental solo se escriben los procesos con actuaciones posteriores a su marca de agua.
+
+    Cada radicación terminada se anota en un diario en disco. Con `reanudar=True` las radicaciones
+    que ya terminaron sin error en una ejecución interrumpida no se vuelven a consultar: sus
+    resultados se toman del diario para generar los archivos completos.
+
+    Los registros se entregan a las salidas (Excel, CSV, JSONL y/o Parquet) a medida que se consultan,
+    con las fechas ya convertidas a datetime. Para lotes grandes se puede omitir el Excel.
+
+    No depende de ninguna interfaz gráfica: el progreso y los mensajes se informan mediante funciones.
+
+    Args:
+        data (EntradaRadicaciones | list): Radicaciones ya preparadas o lista de números de radicación. Los
+            valores que no tienen 23 dígitos se reportan como error sin consultar la API y las
+            radicaciones repetidas se consultan una sola vez. Las salidas de resultado tienen una fila por
+            cada fila de entrada, en el mismo orden.
+        descargar_adjuntos (bool, optional): Indica si se deben descargar los adjuntos.
+        concurrencia (int, optional): Número máximo de solicitudes simultáneas a la API.
+        refrescar_cache (bool, optional): Si es True, se consulta la API aunque la respuesta esté en la caché local.
+        incremental (bool, optional): Si es True, solo se consultan las actuaciones posteriores a la última vista de cada proceso.
+        modo (str, optional): Actuaciones a consultar de cada proceso: "ultima", "dias" o "completo".
+        dias (int, optional): Número de días hacia atrás para el modo "dias".
+        ruta_actuaciones (str, optional): Archivo de Excel de actuaciones a generar.
+        ruta_resultado (str, optional): Archivo de Excel de resultados. Por defecto incluye la fecha y hora actual.
+        carpeta_descargas (str, optional): Carpeta donde se crean las subcarpetas de adjuntos de cada radicación.
+        formatos (list, optional): Formatos de salida: "excel", "csv", "jsonl" y/o "parquet".
+        carpeta_salidas (str, optional): Carpeta de los archivos CSV, JSONL y del conjunto de datos Parquet.
+        salidas (list, optional): Salidas ya creadas (ver `salidas.Salida`). Si se indican, se ignoran `formatos`,
+            `carpeta_salidas`, `ruta_actuaciones` y `ruta_resultado`.
+        reanudar (bool, optional): Si es True, continúa el lote anotado en el diario en lugar de empezar uno nuevo.
+        reintentar_errores (bool, optional): Al reanudar, vuelve a consultar las radicaciones que terminaron con
+            error. Si es False, también sus errores se toman del diario.
+        ruta_diario (str, optional): Archivo del diario del lote.
+        ruta_historial (str, optional): Historial local donde se guardan todos los procesos y actuaciones
+            recibidos, para consultarlos después sin la API. None para no guardarlos.
+        ruta_cache (str, optional): Archivo SQLite de la caché local de respuestas de la API.
+        metricas (Metricas, optional): Métricas donde registrar la ejecución, por ejemplo para incluir la
+            lectura del archivo de entrada. Si es None, se crean unas nuevas.
+        ruta_metricas (str, optional): Archivo JSON donde se guarda el resumen de las métricas. None para no guardarlo.
+        ruta_prometheus (str, optional): Archivo de texto de Prometheus donde se guardan las métricas.
+        ruta_perfil (str, optional): Si se indica, las consultas se ejecutan bajo cProfile y las estadísticas
+            se guardan en este archivo (legible con `pstats` o snakeviz).
+        url_base (str, optional): URL base de la API. Permite apuntar a un servidor de pruebas.
+        tasa_maxima (float, optional): Solicitudes por segundo permitidas hacia la API.
+        control (ControlLote, optional): Permite pausar o cancelar el lote desde otro hilo. Un lote cancelado
+            guarda las radicaciones ya consultadas y se puede continuar después con `reanudar=True`.
+        al_progreso (callable, optional): Se llama con `(completados, total)` al terminar cada radicación.
+        al_mensaje (callable, optional): Recibe cada mensaje para el usuario. Por defecto se imprime.
+        al_resultado (callable, optional): Recibe, en el orden de entrada, el diccionario de resultado de cada radicación.
+
+    Returns:
+        dict: Resumen con las claves "total", "exitosos", "con_error", "repetidas", "invalidas",
+            "consultas_evitadas" (solicitudes HTTP ahorradas, por tipo de recurso), "con_actividad" (lista de tuplas
+            `(numeroRadicacion, idProceso, nuevas)`), "ruta_actuaciones" y "ruta_resultado" (None si no
+            se generó Excel), "archivos" (rutas generadas por cada formato) y "cancelado".
+
+    Raises:
+        ValueError: Si algún parámetro de consulta o formato de salida no es válido, o si al reanudar el
+            diario se generó con otros parámetros.
+        ImportError: Si se pide Parquet y pyarrow no está instalado.
+    """
+    validar_parametros(concurrencia, modo, dias)
+    metricas = metricas if metricas is not None else Metricas()
+    url_base = url_base.rstrip("/")
+    with metricas.fase("ingesta"):
+        entrada = data if isinstance(data, EntradaRadicaciones) else preparar_radicaciones(data)
+    total_registros = entrada.total
+    radicaciones = entrada.radicaciones
+    estado = {"exitosos": 0, "con_error": 0}
+
+    salidas_propias = salidas is None
+    if salidas_propias:
+        salidas = crear_salidas(formatos, ruta_actuaciones, ruta_resultado, carpeta_salidas)
+
+    diario = DiarioLote(ruta_diario, {"modo": modo, "dias": dias, "incremental": incremental})
+    try:
+        # Normalmente solo se reutilizan los resultados sin error; las radicaciones que fallaron se reintentan
+        previos = {numero: resultado for numero, resultado in diario.abrir(reanudar).items()
+                   if resultado["error"] is None or not reintentar_errores}
+    except Exception:
+        if salidas_propias:
+            for salida in salidas:
+                salida.close()
+        raise
+
+    def agregar(tabla, registro):
+        for salida in salidas:
+            salida.agregar(tabla, registro)
+
+    def agregar_resultado(numeroRadicacion, estado_registro, detalle=None):
+        agregar(TABLA_RESULTADO, {"numeroRadicacion": numeroRadicacion, "estado": estado_registro,
+                                  "fechaConsulta": datetime.now().replace(microsecond=0), "detalle": detalle})
+
+    # Las filas de resultado siguen el orden del archivo: una por cada fila de entrada, con los
+    # valores inválidos en su posición y cada radicación repetida tantas veces como aparece
+    filas_entrada = sorted([(fila, numero) for numero in radicaciones for fila in entrada.filas[numero]]
+                           + [(fila, None) for fila, _ in entrada.invalidas])
+    valores_invalidos = dict(entrada.invalidas)
+    resultados_por_fila = {}  # radicación -> registros de resultado y filas que faltan por escribir
+    fila_actual = {"siguiente": 0}
+
+    def escribir_invalida(fila, valor):
+        error = ValueError("Número de radicación inválido: debe tener 23 dígitos")
+        agregar_resultado(valor, "Error", str(error))
+        if al_resultado is not None:
+            al_resultado({"numeroRadicacion": valor, "procesos": [], "error": error, "indice": None, "filas": [fila]})
+
+    def emitir_filas():
+        # Avanza hasta la primera fila cuya radicación todavía no tiene resultado
+        while fila_actual["siguiente"] < len(filas_entrada):
+            fila, numeroRadicacion = filas_entrada[fila_actual["siguiente"]]
+            if numeroRadicacion is None:
+                escribir_invalida(fila, valores_invalidos[fila])
+            elif numeroRadicacion in resultados_por_fila:
+                pendiente = resultados_por_fila[numeroRadicacion]
+                if pendiente["resultado"] is not None:
+                    # El resultado completo se entrega una vez, en la primera fila donde aparece
+                    al_resultado(pendiente["resultado"])
+                    pendiente["resultado"] = None
+                for estado_registro, detalle in pendiente["registros"]:
+                    agregar_resultado(numeroRadicacion, estado_registro, detalle)
+                pendiente["filas"] -= 1
+                if not pendiente["filas"]:
+                    del resultados_por_fila[numeroRadicacion]
+            else:
+                return
+            fila_actual["siguiente"] += 1
+
+    con_actividad = []
+    marcas = None  # se abren junto con los demás recursos del lote
+
+    def escribir_resultado(resultado):
+        numeroRadicacion = resultado["numeroRadicacion"]
+        registros = []
+        for proceso in resultado["procesos"]:
+            id_proceso = proceso["idProceso"]
+
+            if not proceso["actuaciones"]:
+                estado_proceso = "Sin actuaciones nuevas" if proceso["nuevas"] == 0 else "Sin actuaciones en el periodo consultado"
+                registros.append((estado_proceso, None))
+                estado["exitosos"] += 1
+                continue
+
+            for item in proceso["actuaciones"]:
+                agregar(TABLA_ACTUACIONES, registro_actuacion(
+                    numeroRadicacion, id_proceso, item["actuacion"], item["urls_documentos"], url_base))
+
+            if marcas is not None:
+                marcas.registrar(id_proceso, proceso["actuaciones"][0]["actuacion"])
+            if proceso["nuevas"]:
+                con_actividad.append((numeroRadicacion, id_proceso, proceso["nuevas"]))
+                registros.append((f"Con actuaciones nuevas ({proceso['nuevas']})", None))
+            else:
+                registros.append(("Consultado correctamente", None))
+            estado["exitosos"] += 1
+
+        e = resultado["error"]
+        if isinstance(e, ValueError):
+            al_mensaje(f"Error procesando el número de radicación {numeroRadicacion}: {e}")
+            estado["con_error"] += 1
+            registros.append(("Error", str(e)))
+        elif e is not None:
+            registros.append(("Error", str(e)))
+            al_mensaje(f"Error en el proceso {numeroRadicacion}: {e}")
+            estado["con_error"] += 1
+
+        resultados_por_fila[numeroRadicacion] = {
+            "registros": registros,
+            "filas": len(entrada.filas[numeroRadicacion]),
+            "resultado": dict(resultado, filas=entrada.filas[numeroRadicacion]) if al_resultado is not None else None,
+        }
+        emitir_filas()
+
+    # Los valores inválidos se reportan sin consultar la API, cada uno en su fila
+    estado["con_error"] += len(entrada.invalidas)
+    if entrada.invalidas:
+        al_mensaje(f"Registros con número de radicación inválido: {len(entrada.invalidas)} "
+                   f"(filas {', '.join(str(fila) for fila, _ in entrada.invalidas[:20])}"
+                   f"{'...' if len(entrada.invalidas) > 20 else ''})")
+    if entrada.repetidas:
+        al_mensaje(f"Registros con número de radicación repetido (se consultan una sola vez): {entrada.repetidas}")
+
+    pendientes = [(indice, numero) for indice, numero in enumerate(radicaciones) if numero not in previos]
+    if previos:
+        al_mensaje(f"Reanudando el lote: {len(radicaciones) - len(pendientes)} registros tomados del diario, "
+                   f"{len(pendientes)} por consultar.")
+    posicion = {"siguiente": 0}
+
+    def emitir_previos(hasta):
+        # Los resultados del diario se intercalan en su posición original
+        # Si el lote se canceló, se detienen en la primera radicación sin consultar
+        while posicion["siguiente"] < hasta and radicaciones[posicion["siguiente"]] in previos:
+            numeroRadicacion = radicaciones[posicion["siguiente"]]
+            escribir_resultado(dict(previos[numeroRadicacion], indice=posicion["siguiente"]))
+            posicion["siguiente"] += 1
+
+    def al_terminado(resultado):
+        # Se anota apenas termina, aunque todavía espere su turno para escribirse en las salidas
+        diario.registrar({clave: valor for clave, valor in resultado_a_json(resultado).items() if clave != "indice"})
+
+    def al_consultado(resultado):
+        indice = pendientes[resultado["indice"]][0]
+        emitir_previos(indice)
+        resultado["indice"] = indice
+        escribir_resultado(resultado)
+        posicion["siguiente"] += 1
+
+    def al_avance(completados, total):
+        if al_progreso is not None:
+            al_progreso(len(radicaciones) - total + completados, len(radicaciones))
+
+    cache = cliente = almacen = pool_descargas = historial = perfil = None
+    try:
+        # Si falla la creación de algún recurso (por ejemplo, un historial en una carpeta que no
+        # existe), los ya creados se cierran igual que al terminar
+        if incremental:
+            marcas = MarcasAgua()
+        cache = CacheRespuestas(ruta_cache)
+        # Los hilos de descarga comparten la sesión: el pool debe alcanzar para ellos y para las consultas
+        conexiones = concurrencia + (TRABAJADORES_DESCARGA if descargar_adjuntos else 0)
+        cliente = ClienteRama(url_base, conexiones=conexiones, tasa_maxima=tasa_maxima, cache=cache,
+                              refrescar=refrescar_cache, metricas=metricas)
+        if descargar_adjuntos:
+            # El almacén vive junto a las carpetas de adjuntos para poder usar enlaces duros
+            almacen = AlmacenDocumentos(cliente, os.path.join(carpeta_descargas, RUTA_ALMACEN), metricas=metricas)
+            pool_descargas = PoolDescargas(functools.partial(download_file_threaded, almacen=almacen, al_mensaje=al_mensaje),
+                                           metricas=metricas, al_mensaje=al_mensaje)
+        historial = HistorialActuaciones(ruta_historial) if ruta_historial else None
+        motor = MotorConsultas(concurrencia=concurrencia, descargador=pool_descargas.enviar if pool_descargas else None,
+                               cliente=cliente, marcas=marcas, modo=modo, dias=dias, carpeta_descargas=carpeta_descargas,
+                               metricas=metricas, historial=historial, control=control)
+        if ruta_perfil:
+            import cProfile
+            perfil = cProfile.Profile()
+
+        with metricas.fase("consultas"):
+            if perfil is not None:
+                perfil.enable()
+            try:
+                motor.procesar([numero for _, numero in pendientes], al_consultado, al_avance, al_terminado)
+                emitir_previos(len(radicaciones))
+                emitir_filas()
+            finally:
+                if perfil is not None:
+                    perfil.disable()
+    except BaseException:
+        # El lote no terminó: no se guarda ninguna salida ni avanza ninguna marca
+        for salida in salidas:
+            salida.close()
+        if marcas is not None:
+            marcas.close()
+        raise
+    finally:
+        diario.close()
+        if perfil is not None:
+            perfil.dump_stats(ruta_perfil)
+            al_mensaje(f"Perfil de las consultas guardado en {ruta_perfil}.")
+        if pool_descargas is not None:
+            # Barrera final: todas las descargas terminan antes de guardar los libros
+            al_mensaje("Esperando a que terminen las descargas pendientes...")
+            with metricas.fase("espera_descargas"):
+                pool_descargas.cerrar()
+            for numero, estadisticas in enumerate(pool_descargas.resumen(), start=1):
+                al_mensaje(
+                    f"Descargador {numero}: {estadisticas['archivos']} archivos, {estadisticas['errores']} errores, "
+                    f"{estadisticas['bytes'] / 1048576:.1f} MB, {estadisticas['bytes_por_segundo'] / 1048576:.2f} MB/s")
+        if almacen is not None:
+            almacen.close()
+        if historial is not None:
+            historial.close()
+        if cliente is not None:
+            cliente.close()
+        if cache is not None:
+            cache.close()
+    exitosos = estado["exitosos"]
+    con_error = estado["con_error"]
+    cancelado = control is not None and control.cancelado and posicion["siguiente"] < len(radicaciones)
+    if cancelado:
+        al_mensaje(f"Lote cancelado: {len(radicaciones) - posicion['siguiente']} radicaciones quedaron sin consultar. "
+                   f"Se pueden consultar después reanudando el lote.")
+
+    archivos = {}
+    try:
+        for salida in salidas:
+            try:
+                with metricas.fase(f"guardado_{salida.nombre}"):
+                    archivos[salida.nombre] = salida.guardar()
+                al_mensaje(f"Archivos {salida.nombre} guardados exitosamente: {', '.join(archivos[salida.nombre])}.")
+            except Exception as e:
+                al_mensaje(f"Error al guardar los archivos {salida.nombre}: {e}")
+        # Las marcas solo avanzan si las actuaciones nuevas quedaron guardadas en todas las salidas
+        if marcas is not None and salidas and len(archivos) == len(salidas):
+            marcas.guardar()
+    finally:
+        for salida in salidas:
+            salida.close()
+        if marcas is not None:
+            marcas.close()
+
+    al_mensaje(f"Total de registros procesados: {total_registros}")
+    al_mensaje(f"Registros exitosos: {exitosos}")
+    al_mensaje(f"Registros con error: {con_error}")
+    if motor.consultas_evitadas:
+        al_mensaje("Solicitudes evitadas por recursos repetidos en el lote: " + ", ".join(
+            f"{tipo} {cantidad}" for tipo, cantidad in sorted(motor.consultas_evitadas.items())))
+    if incremental:
+        al_mensaje(f"Procesos con actuaciones nuevas: {len(con_actividad)}")
+        for numeroRadicacion, id_proceso, nuevas in con_actividad:
+            al_mensaje(f"  {numeroRadicacion} (idProceso {id_proceso}): {nuevas} actuaciones nuevas")
+
+    metricas.contar("radicaciones", len(radicaciones))
+    metricas.contar("registros_exitosos", exitosos)
+    metricas.contar("registros_con_error", con_error)
+    for tipo, cantidad in motor.consultas_evitadas.items():
+        metricas.contar(f"consultas_evitadas_{tipo}", cantidad)
+    try:
+        if ruta_metricas:
+            metricas.guardar_json(ruta_metricas)
+        if ruta_prometheus:
+            metricas.guardar_prometheus(ruta_prometheus)
+    except Exception as e:
+        al_mensaje(f"Error al guardar las métricas: {e}")
+
+    return {
+        "total": total_registros,
+        "exitosos": exitosos,
+        "con_error": con_error,
+        "repetidas": entrada.repetidas,
+        "invalidas": len(entrada.invalidas),
+        "consultas_evitadas": dict(motor.consultas_evitadas),
+        "con_actividad": con_actividad,
+        "ruta_actuaciones": archivos[FORMATO_EXCEL][0] if FORMATO_EXCEL in archivos else None,
+        "ruta_resultado": archivos[FORMATO_EXCEL][1] if FORMATO_EXCEL in archivos else None,
+        "archivos": archivos,
+        "cancelado": cancelado,
+    }
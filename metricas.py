@@ -0,0 +1,228 @@
+import os
+import re
+import json
+import time
+import bisect
+import threading
+import contextlib
+import collections
+
+RUTA_METRICAS = "metricas_lote.json"
+PREFIJO_PROMETHEUS = "rama"
+LIMITES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)  # segundos
+
+
+def endpoint_de_ruta(ruta):
+    """
+    Devuelve el endpoint de una ruta relativa de la API, sin los identificadores numéricos.
+
+    Por ejemplo, "Proceso/Actuaciones/123" pasa a ser "Proceso/Actuaciones".
+    """
+    partes = [parte for parte in ruta.split("?")[0].strip("/").split("/") if parte and not parte.isdigit()]
+    return "/".join(partes) or "desconocido"
+
+
+class Histograma:
+    """
+    Histograma de latencias con límites fijos, al estilo de Prometheus.
+    """
+
+    def __init__(self, limites=LIMITES_LATENCIA):
+        self.limites = limites
+        self.conteos = [0] * (len(limites) + 1)  # el último cubre los valores por encima del mayor límite
+        self.suma = 0.0
+        self.total = 0
+        self.maximo = 0.0
+
+    def observar(self, valor):
+        self.conteos[bisect.bisect_left(self.limites, valor)] += 1
+        self.suma += valor
+        self.total += 1
+        self.maximo = max(self.maximo, valor)
+
+    def percentil(self, p):
+        """
+        Estima un percentil como el límite superior de la cubeta que lo contiene.
+        """
+        if not self.total:
+            return None
+        objetivo = p / 100 * self.total
+        acumulado = 0
+        for limite, conteo in zip(self.limites, self.conteos):
+            acumulado += conteo
+            if acumulado >= objetivo:
+                return limite
+        return self.maximo
+
+    def resumen(self):
+        return {
+            "total": self.total,
+            "suma_segundos": round(self.suma, 6),
+            "promedio_segundos": round(self.suma / self.total, 6) if self.total else None,
+            "p50_segundos": self.percentil(50),
+            "p90_segundos": self.percentil(90),
+            "p99_segundos": self.percentil(99),
+            "maximo_segundos": round(self.maximo, 6),
+            "cubetas": {str(limite): conteo for limite, conteo in zip(self.limites + ("+Inf",), self.conteos)},
+        }
+
+
+class Metricas:
+    """
+    Métricas de una ejecución: latencia por endpoint, códigos de estado, errores, contadores,
+    niveles de colas y solicitudes en curso, y duración de cada fase del lote.
+
+    Es seguro usarla desde varios hilos. Al terminar se puede guardar como resumen JSON o como
+    archivo de texto de Prometheus para el textfile collector del node exporter.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.inicio = time.time()
+        self.latencias = collections.defaultdict(Histograma)
+        self.respuestas = collections.Counter()  # (endpoint, código) -> respuestas
+        self.errores = collections.Counter()  # (endpoint, tipo de error) -> errores
+        self.contadores = collections.Counter()
+        self.niveles = {}  # nombre -> valor actual
+        self.maximos = collections.Counter()  # nombre -> valor máximo alcanzado
+        self.fases = {}  # nombre -> segundos
+
+    def observar_solicitud(self, endpoint, segundos, codigo):
+        """
+        Registra una solicitud HTTP terminada: su latencia y su código de estado.
+        """
+        with self._lock:
+            self.latencias[endpoint].observar(segundos)
+            self.respuestas[(endpoint, codigo)] += 1
+
+    def contar_error(self, endpoint, error):
+        """
+        Registra una solicitud que falló sin respuesta (timeout, error de conexión, ...).
+        """
+        with self._lock:
+            self.errores[(endpoint, type(error).__name__)] += 1
+
+    def contar(self, nombre, cantidad=1):
+        """
+        Suma una cantidad a un contador, por ejemplo "bytes_descargados" o "cache_aciertos".
+        """
+        with self._lock:
+            self.contadores[nombre] += cantidad
+
+    def fijar(self, nombre, valor):
+        """
+        Fija el valor actual de un nivel (tamaño de una cola, solicitudes en curso) y su máximo.
+        """
+        with self._lock:
+            self.niveles[nombre] = valor
+            if valor > self.maximos[nombre]:
+                self.maximos[nombre] = valor
+
+    def sumar(self, nombre, delta):
+        """
+        Suma o resta al valor actual de un nivel.
+        """
+        with self._lock:
+            valor = self.niveles.get(nombre, 0) + delta
+            self.niveles[nombre] = valor
+            if valor > self.maximos[nombre]:
+                self.maximos[nombre] = valor
+
+    @contextlib.contextmanager
+    def fase(self, nombre):
+        """
+        Mide la duración de un bloque de código y la suma a la fase indicada.
+        """
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.fases[nombre] = self.fases.get(nombre, 0.0) + time.perf_counter() - inicio
+
+    def resumen(self):
+        """
+        Devuelve todas las métricas como un diccionario serializable como JSON.
+        """
+        with self._lock:
+            respuestas = collections.defaultdict(dict)
+            for (endpoint, codigo), cantidad in sorted(self.respuestas.items(), key=str):
+                respuestas[endpoint][str(codigo)] = cantidad
+            errores = collections.defaultdict(dict)
+            for (endpoint, tipo), cantidad in sorted(self.errores.items()):
+                errores[endpoint][tipo] = cantidad
+            return {
+                "inicio": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.inicio)),
+                "duracion_segundos": round(time.time() - self.inicio, 3),
+                "fases_segundos": {nombre: round(segundos, 6) for nombre, segundos in self.fases.items()},
+                "latencias": {endpoint: histograma.resumen() for endpoint, histograma in sorted(self.latencias.items())},
+                "respuestas": dict(respuestas),
+                "errores": dict(errores),
+                "contadores": dict(self.contadores),
+                "niveles_maximos": dict(self.maximos),
+            }
+
+    def guardar_json(self, ruta=RUTA_METRICAS):
+        """
+        Guarda el resumen de las métricas como JSON.
+        """
+        _escribir_atomico(ruta, json.dumps(self.resumen(), ensure_ascii=False, indent=2))
+
+    def guardar_prometheus(self, ruta):
+        """
+        Guarda las métricas en el formato de texto de Prometheus.
+
+        El archivo se reemplaza de forma atómica para que el node exporter nunca lea uno a medias.
+        """
+        p = PREFIJO_PROMETHEUS
+        lineas = []
+
+        def tipo(nombre, tipo_metrica, ayuda):
+            lineas.append(f"# HELP {p}_{nombre} {ayuda}")
+            lineas.append(f"# TYPE {p}_{nombre} {tipo_metrica}")
+
+        with self._lock:
+            tipo("solicitud_segundos", "histogram", "Latencia de las solicitudes HTTP por endpoint.")
+            for endpoint, histograma in sorted(self.latencias.items()):
+                acumulado = 0
+                for limite, conteo in zip(histograma.limites + ("+Inf",), histograma.conteos):
+                    acumulado += conteo
+                    lineas.append(f'{p}_solicitud_segundos_bucket{{endpoint="{endpoint}",le="{limite}"}} {acumulado}')
+                lineas.append(f'{p}_solicitud_segundos_sum{{endpoint="{endpoint}"}} {histograma.suma}')
+                lineas.append(f'{p}_solicitud_segundos_count{{endpoint="{endpoint}"}} {histograma.total}')
+
+            tipo("respuestas_total", "counter", "Respuestas HTTP por endpoint y código de estado.")
+            for (endpoint, codigo), cantidad in sorted(self.respuestas.items(), key=str):
+                lineas.append(f'{p}_respuestas_total{{endpoint="{endpoint}",codigo="{codigo}"}} {cantidad}')
+
+            tipo("errores_total", "counter", "Solicitudes HTTP fallidas sin respuesta por endpoint y tipo de error.")
+            for (endpoint, nombre_error), cantidad in sorted(self.errores.items()):
+                lineas.append(f'{p}_errores_total{{endpoint="{endpoint}",tipo="{nombre_error}"}} {cantidad}')
+
+            for nombre, cantidad in sorted(self.contadores.items()):
+                tipo(f"{_nombre_prometheus(nombre)}_total", "counter", f"Contador {nombre}.")
+                lineas.append(f"{p}_{_nombre_prometheus(nombre)}_total {cantidad}")
+
+            for nombre, valor in sorted(self.maximos.items()):
+                tipo(f"{_nombre_prometheus(nombre)}_maximo", "gauge", f"Valor máximo de {nombre} durante el lote.")
+                lineas.append(f"{p}_{_nombre_prometheus(nombre)}_maximo {valor}")
+
+            tipo("fase_segundos", "gauge", "Duración de cada fase del último lote.")
+            for nombre, segundos in sorted(self.fases.items()):
+                lineas.append(f'{p}_fase_segundos{{fase="{nombre}"}} {segundos}')
+
+            tipo("ultimo_lote_timestamp_segundos", "gauge", "Momento en que terminó el último lote.")
+            lineas.append(f"{p}_ultimo_lote_timestamp_segundos {time.time()}")
+
+        _escribir_atomico(ruta, "\n".join(lineas) + "\n")
+
+
+def _nombre_prometheus(nombre):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", nombre)
+
+
+def _escribir_atomico(ruta, contenido):
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as archivo:
+        archivo.write(contenido)
+    os.replace(temporal, ruta)
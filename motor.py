@@ -0,0 +1,483 @@
+import os
+import asyncio
+import functools
+import threading
+import contextlib
+import contextvars
+import collections
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from cliente import ClienteRama, HEADERS_DOCUMENTOS
+from cache import RespuestaCacheada
+from sincronizacion import clave_actuacion, FORMATO_FECHA
+
+CONCURRENCIA_PREDETERMINADA = 10
+
+# Qué actuaciones se consultan de cada proceso
+MODO_ULTIMA = "ultima"  # solo la más reciente
+MODO_DIAS = "dias"  # las de los últimos N días
+MODO_COMPLETO = "completo"  # todo el historial
+MODOS = (MODO_ULTIMA, MODO_DIAS, MODO_COMPLETO)
+
+ESPERA_PAUSA = 0.2  # segundos entre revisiones mientras el lote está en pausa
+VENTANA_REORDEN = 4  # radicaciones por trabajador que se pueden adelantar a la primera sin entregar
+
+# Solicitudes HTTP hechas por la consulta compartida en curso (las subtareas heredan el contador)
+_solicitudes_compartida = contextvars.ContextVar("solicitudes_compartida", default=None)
+
+
+def validar_parametros(concurrencia, modo, dias):
+    """
+    Verifica los parámetros de consulta de un lote antes de crear cualquier recurso.
+
+    Raises:
+        ValueError: Si la concurrencia, el modo o los días no son válidos.
+    """
+    if concurrencia < 1:
+        raise ValueError("La concurrencia debe ser un número mayor o igual a 1.")
+    if modo not in MODOS:
+        raise ValueError(f"Modo de consulta no soportado: {modo}. Use uno de {', '.join(MODOS)}.")
+    if modo == MODO_DIAS and (not dias or dias < 1):
+        raise ValueError("El modo 'dias' requiere un número de días mayor o igual a 1.")
+
+
+class ControlLote:
+    """
+    Permite pausar, continuar y cancelar un lote en curso desde otro hilo, por ejemplo desde la interfaz gráfica.
+
+    La pausa y la cancelación se aplican entre radicaciones: las que ya están en curso terminan
+    y se entregan normalmente.
+    """
+
+    def __init__(self):
+        self._pausado = threading.Event()
+        self._cancelado = threading.Event()
+
+    @property
+    def pausado(self):
+        return self._pausado.is_set()
+
+    @property
+    def cancelado(self):
+        return self._cancelado.is_set()
+
+    def pausar(self):
+        self._pausado.set()
+
+    def continuar(self):
+        self._pausado.clear()
+
+    def cancelar(self):
+        self._cancelado.set()
+
+
+class MotorConsultas:
+    """
+    Consulta muchas radicaciones a la vez contra la API de la Rama Judicial.
+
+    Cada radicación recorre la cadena NumeroRadicacion -> Actuaciones -> DocumentosActuacion,
+    pero varias radicaciones avanzan al mismo tiempo. Las llamadas HTTP se ejecutan en un
+    pool de hilos que comparten un mismo `ClienteRama`, y un semáforo limita cuántas están en
+    curso simultáneamente.
+
+    Dentro de un lote, las actuaciones de cada idProceso y los documentos de cada actuación se
+    consultan una sola vez: si varias radicaciones llevan al mismo recurso, todas esperan la misma
+    consulta y las siguientes reutilizan su resultado. `consultas_evitadas` cuenta, por tipo de
+    recurso, cuántas solicitudes HTTP se ahorraron así: cada radicación que reutiliza un resultado
+    suma las solicitudes que hizo la consulta compartida (por ejemplo, todas las páginas de
+    actuaciones de un proceso). Las respuestas servidas desde la caché local no cuentan.
+
+    Si se indica un historial, todos los procesos, actuaciones y documentos recibidos se guardan en él.
+    """
+
+    def __init__(self, concurrencia=CONCURRENCIA_PREDETERMINADA, descargador=None, cliente=None, marcas=None,
+                 modo=MODO_ULTIMA, dias=None, carpeta_descargas=".", metricas=None, historial=None,
+                 control=None):
+        """
+        Args:
+            concurrencia (int): Número máximo de solicitudes HTTP simultáneas.
+            descargador (callable, optional): Función `descargador(url, headers, carpeta)` que encola la
+                descarga de un documento, normalmente `PoolDescargas.enviar`. Si es None, los adjuntos
+                no se descargan.
+            cliente (ClienteRama, optional): Cliente HTTP a usar. Si es None, se crea uno con un pool
+                del tamaño de la concurrencia.
+            marcas (MarcasAgua, optional): Activa el modo incremental. Para los procesos con marca de agua
+                solo se piden las actuaciones desde esa fecha y se omiten los que no tienen actuaciones nuevas.
+            modo (str): "ultima" (solo la actuación más reciente), "dias" (las de los últimos `dias` días)
+                o "completo" (todo el historial).
+            dias (int, optional): Número de días hacia atrás para el modo "dias".
+            carpeta_descargas (str): Carpeta donde se crea la subcarpeta de adjuntos de cada radicación.
+            metricas (Metricas, optional): Registra las solicitudes en curso y los resultados que esperan
+                su turno para entregarse en orden.
+            historial (HistorialActuaciones, optional): Historial local donde se guardan todas las respuestas.
+            control (ControlLote, optional): Permite pausar o cancelar el lote. Al cancelarlo no se
+                empiezan más radicaciones y `procesar` retorna cuando terminan las que están en curso.
+        """
+        validar_parametros(concurrencia, modo, dias)
+        self.concurrencia = concurrencia
+        self.descargador = descargador
+        self.cliente = cliente or ClienteRama(conexiones=concurrencia)
+        self.marcas = marcas
+        self.modo = modo
+        self.dias = dias
+        self.carpeta_descargas = carpeta_descargas
+        self.metricas = metricas
+        self.historial = historial
+        self.control = control
+        self._ejecutor = None
+        self._semaforo = None
+        self._compartidas = {}
+        self.consultas_evitadas = collections.Counter()
+
+    def procesar(self, radicaciones, al_resultado, al_progreso=None, al_terminado=None):
+        """
+        Consulta todas las radicaciones y entrega los resultados en el mismo orden de entrada.
+
+        Args:
+            radicaciones (list): Números de radicación ya normalizados.
+            al_resultado (callable): Se llama con el diccionario de resultado de cada radicación,
+                respetando el orden de `radicaciones`.
+            al_progreso (callable, optional): Se llama con `(completados, total)` cada vez que
+                termina una radicación, sin importar su posición.
+            al_terminado (callable, optional): Se llama con el resultado de cada radicación apenas
+                termina, antes de esperar su turno; por ejemplo, para anotarlo en el diario.
+        """
+        asyncio.run(self._procesar(radicaciones, al_resultado, al_progreso, al_terminado))
+
+    async def _procesar(self, radicaciones, al_resultado, al_progreso, al_terminado):
+        total = len(radicaciones)
+        pendientes = self._entradas(radicaciones)
+        terminados = {}
+        estado = {"siguiente": 0, "completados": 0, "tomados": 0}
+        # Si la primera radicación sin entregar se demora (por ejemplo, reintentando), los trabajadores
+        # no se alejan más de la ventana: así los resultados en espera no crecen sin límite
+        ventana = VENTANA_REORDEN * self.concurrencia
+        avance = asyncio.Condition()
+
+        async def trabajador():
+            while True:
+                async with avance:
+                    await avance.wait_for(lambda: estado["tomados"] < estado["siguiente"] + ventana)
+                if not await self._esperar_turno():
+                    return
+                siguiente = next(pendientes, None)
+                if siguiente is None:
+                    return
+                estado["tomados"] += 1
+                indice, numero = siguiente
+                resultado = await self.consultar_radicacion(numero)
+                resultado["indice"] = indice
+                if al_terminado:
+                    al_terminado(resultado)
+                estado["completados"] += 1
+                if al_progreso:
+                    al_progreso(estado["completados"], total)
+
+                # Los resultados que llegan adelantados esperan a que termine el anterior
+                terminados[indice] = resultado
+                if estado["siguiente"] in terminados:
+                    while estado["siguiente"] in terminados:
+                        al_resultado(terminados.pop(estado["siguiente"]))
+                        estado["siguiente"] += 1
+                    async with avance:
+                        avance.notify_all()
+                if self.metricas is not None:
+                    self.metricas.fijar("resultados_en_espera", len(terminados))
+
+        # Los resultados compartidos solo valen durante el lote
+        self._compartidas = {}
+        with ThreadPoolExecutor(max_workers=self.concurrencia) as ejecutor:
+            self._ejecutor = ejecutor
+            self._semaforo = asyncio.Semaphore(self.concurrencia)
+            trabajadores = max(1, min(self.concurrencia, total))
+            await asyncio.gather(*(trabajador() for _ in range(trabajadores)))
+
+    async def _esperar_turno(self):
+        # Devuelve False si el lote se canceló; mientras esté en pausa no se toman radicaciones nuevas
+        if self.control is None:
+            return True
+        while self.control.pausado and not self.control.cancelado:
+            await asyncio.sleep(ESPERA_PAUSA)
+        return not self.control.cancelado
+
+    @staticmethod
+    def _entradas(radicaciones):
+        # Un único iterador compartido reparte el trabajo entre los trabajadores
+        yield from enumerate(radicaciones)
+
+    async def _compartida(self, tipo, clave, consulta):
+        # La primera solicitud de un recurso lanza la consulta; las demás esperan la misma tarea
+        compartida = self._compartidas.get((tipo, clave))
+        unida = compartida is not None
+        if not unida:
+            solicitudes = [0]
+
+            async def contada():
+                _solicitudes_compartida.set(solicitudes)
+                return await consulta()
+
+            compartida = (asyncio.ensure_future(contada()), solicitudes)
+            self._compartidas[(tipo, clave)] = compartida
+        tarea, solicitudes = compartida
+        try:
+            # Si se cancela a quien espera, la consulta sigue para los demás
+            return await asyncio.shield(tarea)
+        finally:
+            if unida and tarea.done():
+                self.consultas_evitadas[tipo] += solicitudes[0]
+
+    async def _get(self, ruta, params=None, headers=None, refrescar=None):
+        loop = asyncio.get_running_loop()
+        async with self._semaforo:
+            if self.metricas is not None:
+                self.metricas.sumar("solicitudes_en_curso", 1)
+            try:
+                response = await loop.run_in_executor(
+                    self._ejecutor,
+                    functools.partial(self.cliente.get, ruta, params=params, headers=headers, refrescar=refrescar))
+                solicitudes = _solicitudes_compartida.get()
+                if solicitudes is not None and not isinstance(response, RespuestaCacheada):
+                    solicitudes[0] += 1
+                return response
+            finally:
+                if self.metricas is not None:
+                    self.metricas.sumar("solicitudes_en_curso", -1)
+
+    async def paginar(self, ruta, clave, params=None, primera=None, refrescar=None):
+        """
+        Recorre todas las páginas de un listado de la API y entrega sus registros uno a uno.
+
+        Las páginas 2 en adelante solo se piden cuando se agotan los registros de la primera, y se
+        consultan de forma concurrente con una ventana de `concurrencia` páginas adelantadas. Los
+        registros se entregan en el orden de las páginas. Si quien consume el generador deja de
+        iterar, las páginas pendientes se cancelan.
+
+        Args:
+            ruta (str): Ruta de la API, por ejemplo "Proceso/Actuaciones/123".
+            clave (str): Clave de la respuesta que contiene la lista de registros ("actuaciones", "procesos").
+            params (dict, optional): Parámetros de la consulta, sin el número de página.
+            primera (dict, optional): Primera página ya consultada y validada por el llamador.
+            refrescar (bool, optional): Se pasa al cliente para ignorar la caché.
+
+        Yields:
+            dict: Cada registro de la lista, página por página.
+
+        Raises:
+            ValueError: Si alguna página no devuelve una respuesta válida.
+        """
+        params = dict(params or {})
+        if primera is None:
+            primera = self._datos_pagina(await self._get(ruta, dict(params, pagina="1"), refrescar=refrescar), 1)
+        for registro in primera.get(clave) or []:
+            yield registro
+
+        paginas = int((primera.get("paginacion") or {}).get("cantidadPaginas") or 1)
+        siguientes = iter(range(2, paginas + 1))
+        en_curso = collections.deque()
+
+        def lanzar():
+            pagina = next(siguientes, None)
+            if pagina is not None:
+                en_curso.append((pagina, asyncio.ensure_future(
+                    self._get(ruta, dict(params, pagina=str(pagina)), refrescar=refrescar))))
+
+        try:
+            for _ in range(self.concurrencia):
+                lanzar()
+            while en_curso:
+                pagina, tarea = en_curso.popleft()
+                response = await tarea
+                lanzar()
+                for registro in self._datos_pagina(response, pagina).get(clave) or []:
+                    yield registro
+        finally:
+            for _, tarea in en_curso:
+                tarea.cancel()
+            await asyncio.gather(*(tarea for _, tarea in en_curso), return_exceptions=True)
+
+    @staticmethod
+    def _datos_pagina(response, pagina):
+        if response.status_code != 200 or not response.content:
+            raise ValueError(f"Respuesta inválida del servidor en la página {pagina}. code:", response.status_code)
+        return response.json() or {}
+
+    async def consultar_radicacion(self, numeroRadicacion):
+        """
+        Consulta un número de radicación y las actuaciones de cada proceso asociado, recorriendo
+        todas las páginas de procesos que coincidan con la radicación.
+
+        Args:
+            numeroRadicacion (str): Número de radicación normalizado.
+
+        Returns:
+            dict: Con las claves "numeroRadicacion", "procesos" (lista con un diccionario por proceso
+                consultado) y "error" (la excepción que detuvo la consulta, o None).
+        """
+        resultado = {"numeroRadicacion": numeroRadicacion, "procesos": [], "error": None}
+        try:
+            ruta = "Procesos/Consulta/NumeroRadicacion"
+            params = {"numero": numeroRadicacion, "SoloActivos": "false"}
+            response = await self._get(ruta, dict(params, pagina="1"))
+            proceso_data = response.json()
+
+            if not proceso_data or not proceso_data.get('procesos'):
+                raise ValueError("No se encontró información del proceso.")
+
+            async with contextlib.aclosing(self.paginar(ruta, "procesos", params, primera=proceso_data)) as procesos:
+                async for proceso in procesos:
+                    if self.historial is not None:
+                        self.historial.registrar_proceso(proceso)
+                    resultado["procesos"].append(await self.consultar_proceso(numeroRadicacion, proceso))
+        except Exception as e:
+            resultado["error"] = e
+        return resultado
+
+    async def consultar_proceso(self, numeroRadicacion, proceso):
+        """
+        Consulta las actuaciones de un proceso según el modo del motor y, para las que tienen
+        documentos, sus URLs de descarga.
+
+        Args:
+            numeroRadicacion (str): Número de radicación al que pertenece el proceso.
+            proceso (dict): Proceso devuelto por la consulta por número de radicación.
+
+        Returns:
+            dict: Con las claves "idProceso", "actuaciones" (lista de diccionarios con las claves
+                "actuacion" y "urls_documentos", de la más reciente a la más antigua; vacía si no hay
+                actuaciones nuevas o en el rango) y "nuevas" (número de actuaciones posteriores a la
+                marca de agua, o None si el proceso no tenía marca).
+
+        Raises:
+            ValueError: Si el servicio de actuaciones no devuelve una respuesta válida.
+        """
+        id_proceso = proceso['idProceso']
+        seleccionadas, nuevas = await self._compartida(
+            "actuaciones", id_proceso, functools.partial(self.consultar_actuaciones, id_proceso))
+
+        documentos = await asyncio.gather(*(self.consultar_documentos(numeroRadicacion, ac) for ac in seleccionadas))
+        return {
+            "idProceso": id_proceso,
+            "actuaciones": [{"actuacion": ac, "urls_documentos": urls} for ac, urls in zip(seleccionadas, documentos)],
+            "nuevas": nuevas,
+        }
+
+    async def consultar_actuaciones(self, id_proceso):
+        """
+        Consulta las actuaciones de un proceso que corresponden al modo del motor.
+
+        En modo incremental, si el proceso ya tiene marca de agua solo se piden las actuaciones
+        desde esa fecha, sin usar la caché, y se descartan las que no son posteriores a la marca.
+
+        Args:
+            id_proceso (int): Identificador del proceso.
+
+        Returns:
+            tuple: `(actuaciones, nuevas)`, con la lista de actuaciones seleccionadas de la más reciente
+                a la más antigua y el número de actuaciones posteriores a la marca de agua (None si el
+                proceso no tenía marca).
+
+        Raises:
+            ValueError: Si el servicio de actuaciones no devuelve una respuesta válida.
+        """
+        marca = self.marcas.obtener(id_proceso) if self.marcas is not None else None
+        ruta = f"Proceso/Actuaciones/{id_proceso}"
+        ahora = datetime.now()
+        params = {}
+        refrescar = None
+        fecha_limite = None
+
+        if marca is not None:
+            params = {"fechaIni": marca[0], "fechaFin": ahora.strftime(FORMATO_FECHA)}
+            refrescar = True
+        elif self.modo == MODO_DIAS:
+            fecha_limite = (ahora - timedelta(days=self.dias)).strftime("%Y-%m-%dT00:00:00")
+            params = {"fechaIni": fecha_limite, "fechaFin": ahora.strftime(FORMATO_FECHA)}
+
+        actuaciones_response = await self._get(ruta, dict(params, pagina="1"), refrescar=refrescar)
+
+        sin_actuaciones = ([], 0 if marca is not None else None)
+        # Con filtro de fechas, un 404 o una respuesta vacía indican que no hay actuaciones en el rango
+        if params and (actuaciones_response.status_code == 404 or (
+                actuaciones_response.status_code == 200 and not actuaciones_response.content)):
+            return sin_actuaciones
+
+        if actuaciones_response.status_code == 404:
+            mensaje_error = actuaciones_response.json()["Message"]
+            raise ValueError(mensaje_error)
+
+        if actuaciones_response.status_code != 200 or not actuaciones_response.content:
+            raise ValueError("Respuesta inválida del servidor. consultando actuaciones. code:", actuaciones_response.status_code)
+
+        actuaciones_data = actuaciones_response.json()
+        if not actuaciones_data:
+            raise ValueError("No se encontraron actuaciones.")
+
+        # La API devuelve las actuaciones de la más reciente a la más antigua
+        seleccionadas = []
+        # Se guarda en el historial todo lo recibido, aunque el modo solo use una parte
+        recibidas = list(actuaciones_data.get("actuaciones") or [])
+        en_primera = len(recibidas)
+        nuevas = 0
+        paginas = self.paginar(ruta, "actuaciones", params, primera=actuaciones_data, refrescar=refrescar)
+        async with contextlib.aclosing(paginas) as actuaciones:
+            async for ac in actuaciones:
+                if en_primera:
+                    en_primera -= 1
+                else:
+                    recibidas.append(ac)
+                if marca is not None and clave_actuacion(ac) <= marca:
+                    break
+                if fecha_limite is not None and (ac.get("fechaActuacion") or "") < fecha_limite:
+                    break
+                nuevas += 1
+                if self.modo != MODO_ULTIMA or not seleccionadas:
+                    seleccionadas.append(ac)
+                elif marca is None:
+                    # En modo "última" sin marca de agua basta con la primera actuación
+                    break
+        if self.historial is not None:
+            self.historial.registrar_actuaciones(id_proceso, recibidas)
+
+        if not seleccionadas:
+            return sin_actuaciones
+        return seleccionadas, nuevas if marca is not None else None
+
+    async def consultar_documentos(self, numeroRadicacion, ac):
+        """
+        Consulta las URLs de descarga de los documentos de una actuación y, si el motor tiene
+        descargador, descarga los archivos.
+
+        Returns:
+            list: URLs de descarga, o None si la actuación no tiene documentos o no se pudieron consultar.
+        """
+        if ac.get("conDocumentos") != True:
+            return None
+
+        id_reg_actuacion = ac["idRegActuacion"]
+        urls_documentos = await self._compartida(
+            "documentos", id_reg_actuacion, functools.partial(self._urls_documentos, id_reg_actuacion))
+        # Cada radicación recibe su copia de los adjuntos, aunque la consulta se haya compartido
+        if urls_documentos is not None and self.descargador:
+            await self._descargar(numeroRadicacion, urls_documentos)
+        return urls_documentos
+
+    async def _urls_documentos(self, id_reg_actuacion):
+        documentos_response = await self._get(
+            f"Proceso/DocumentosActuacion/{id_reg_actuacion}", headers=HEADERS_DOCUMENTOS)
+
+        if documentos_response.status_code != 200 or not documentos_response.content:
+            return None
+
+        documentos_data = documentos_response.json()
+        urls_documentos = [self.cliente.url(f"Descarga/Documento/{doc['idRegDocumento']}") for doc in documentos_data]
+        if self.historial is not None:
+            self.historial.registrar_documentos(id_reg_actuacion, urls_documentos)
+        return urls_documentos
+
+    async def _descargar(self, numeroRadicacion, urls_documentos):
+        carpeta_descargas = os.path.join(self.carpeta_descargas, numeroRadicacion)
+        os.makedirs(carpeta_descargas, exist_ok=True)
+        loop = asyncio.get_running_loop()
+        # Solo se espera a que la descarga quede encolada; si la cola está llena, esto frena la consulta
+        for url in urls_documentos:
+            await loop.run_in_executor(self._ejecutor, self.descargador, url, HEADERS_DOCUMENTOS, carpeta_descargas)
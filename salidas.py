@@ -0,0 +1,381 @@
+import os
+import csv
+import json
+from datetime import datetime
+from excel import EscritorExcel
+
+TABLA_ACTUACIONES = "actuaciones"
+TABLA_RESULTADO = "resultado"
+
+FORMATO_EXCEL = "excel"
+FORMATO_CSV = "csv"
+FORMATO_JSONL = "jsonl"
+FORMATO_PARQUET = "parquet"
+FORMATOS = (FORMATO_EXCEL, FORMATO_CSV, FORMATO_JSONL, FORMATO_PARQUET)
+
+FILAS_POR_GRUPO_PARQUET = 10000
+
+# Campos de contexto que los archivos tipados agregan a cada actuación y que el Excel no muestra
+CAMPOS_CONTEXTO = ("numeroRadicacion", "idProceso")
+# Campos calculados al final de cada actuación y su encabezado en el Excel
+CAMPOS_URL = {
+    "urlDescargaDoc": "URL Descarga DOC",
+    "urlDescargaCsv": "URL Descarga CSV",
+    "urlsDocumentos": "URLs Documentos",
+}
+ENCABEZADO_RESULTADO_EXCEL = ["Número de Proceso", "Estado", "Fecha y Hora de Consulta"]
+
+
+def a_fecha(valor):
+    """
+    Convierte una fecha de la API ("2024-01-02T00:00:00") en datetime. Si no se puede, la devuelve igual.
+    """
+    if isinstance(valor, str):
+        try:
+            return datetime.fromisoformat(valor)
+        except ValueError:
+            return valor
+    return valor
+
+
+def tipar_actuacion(actuacion):
+    """
+    Devuelve una copia de la actuación con los campos de fecha convertidos a datetime, una sola vez
+    para todas las salidas.
+    """
+    return {campo: a_fecha(valor) if campo.startswith("fecha") else valor for campo, valor in actuacion.items()}
+
+
+def registro_actuacion(numeroRadicacion, id_proceso, actuacion, urls_documentos, url_base):
+    """
+    Construye el registro de una actuación tal como lo reciben las salidas.
+
+    Args:
+        numeroRadicacion (str): Número de radicación consultado.
+        id_proceso (int): Proceso al que pertenece la actuación.
+        actuacion (dict): Actuación tal como la devuelve la API.
+        urls_documentos (list): URLs de descarga de sus documentos, o None.
+        url_base (str): URL base de la API, sin "/" final, para las URLs de descarga del proceso.
+    """
+    registro = {"numeroRadicacion": numeroRadicacion, "idProceso": id_proceso}
+    registro.update(tipar_actuacion(actuacion))
+    registro["urlDescargaDoc"] = f"{url_base}/Descarga/DOCX/Proceso/{id_proceso}"
+    registro["urlDescargaCsv"] = f"{url_base}/Descarga/CSV/Detalle/{id_proceso}"
+    registro["urlsDocumentos"] = urls_documentos
+    return registro
+
+
+def _texto(valor):
+    # Representación de texto compatible con la que devuelve la API
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    if isinstance(valor, list):
+        return ";".join(map(str, valor))
+    return valor
+
+
+class Salida:
+    """
+    Destino de los registros de un lote.
+
+    `process_data` entrega cada registro a todas las salidas a medida que se consulta, en el orden
+    de entrada, con `agregar(tabla, registro)`. Las tablas son "actuaciones" y "resultado", y los
+    registros son diccionarios con fechas ya convertidas a datetime. Al terminar el lote se llama
+    a `guardar`, y siempre a `close`.
+    """
+
+    nombre = None
+
+    def agregar(self, tabla, registro):
+        raise NotImplementedError
+
+    def guardar(self):
+        """
+        Termina de escribir los archivos.
+
+        Returns:
+            list: Rutas de los archivos generados.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SalidaExcel(Salida):
+    """
+    Los dos libros de Excel de siempre, con el mismo contenido y formato.
+
+    Sin `ruta_resultado` solo se genera el libro de actuaciones.
+    """
+
+    nombre = FORMATO_EXCEL
+
+    def __init__(self, ruta_actuaciones, ruta_resultado=None):
+        self.ruta_actuaciones = ruta_actuaciones
+        self.ruta_resultado = ruta_resultado
+        # Las hojas se escriben en streaming y el formato se aplica al guardarlas
+        self._actuaciones = EscritorExcel("Actuaciones", "actuaciones")
+        self._resultado = None
+        if ruta_resultado is not None:
+            self._resultado = EscritorExcel("Resultado del Proceso", "resultado")
+            self._resultado.append(ENCABEZADO_RESULTADO_EXCEL)
+        self._campos = None
+
+    def agregar(self, tabla, registro):
+        if tabla == TABLA_RESULTADO:
+            if self._resultado is None:
+                return
+            detalle = registro["detalle"]
+            fecha = registro["fechaConsulta"].strftime("%Y-%m-%d %H:%M:%S")
+            self._resultado.append([registro["numeroRadicacion"], registro["estado"], detalle if detalle is not None else fecha])
+            return
+
+        if self._campos is None:
+            self._campos = [campo for campo in registro if campo not in CAMPOS_CONTEXTO and campo not in CAMPOS_URL]
+            self._actuaciones.append(self._campos + list(CAMPOS_URL.values()))
+        fila = [_texto(registro.get(campo)) for campo in self._campos]
+        fila.extend(_texto(registro[campo]) or "" for campo in CAMPOS_URL)
+        self._actuaciones.append(fila)
+
+    def guardar(self):
+        self._actuaciones.guardar(self.ruta_actuaciones)
+        if self._resultado is None:
+            return [self.ruta_actuaciones]
+        self._resultado.guardar(self.ruta_resultado)
+        return [self.ruta_actuaciones, self.ruta_resultado]
+
+    def close(self):
+        self._actuaciones.close()
+        if self._resultado is not None:
+            self._resultado.close()
+
+
+class _SalidaPorTabla(Salida):
+    # Un archivo por tabla, escrito primero como temporal y renombrado al guardar
+    extension = None
+
+    def __init__(self, carpeta, sufijo):
+        os.makedirs(carpeta, exist_ok=True)
+        self.rutas = {tabla: os.path.join(carpeta, f"{tabla}_{sufijo}.{self.extension}")
+                      for tabla in (TABLA_ACTUACIONES, TABLA_RESULTADO)}
+        self._archivos = {}
+
+    def _archivo(self, tabla):
+        if tabla not in self._archivos:
+            self._archivos[tabla] = open(self.rutas[tabla] + ".tmp", "w", newline="", encoding="utf-8")
+        return self._archivos[tabla]
+
+    def guardar(self):
+        rutas = []
+        for tabla, archivo in self._archivos.items():
+            archivo.close()
+            os.replace(archivo.name, self.rutas[tabla])
+            rutas.append(self.rutas[tabla])
+        self._archivos = {}
+        return rutas
+
+    def close(self):
+        for archivo in self._archivos.values():
+            archivo.close()
+            os.remove(archivo.name)
+        self._archivos = {}
+
+
+class SalidaCSV(_SalidaPorTabla):
+    """
+    Un CSV por tabla, escrito fila a fila. Las fechas van en formato ISO 8601.
+    """
+
+    nombre = FORMATO_CSV
+    extension = "csv"
+
+    def __init__(self, carpeta, sufijo):
+        super().__init__(carpeta, sufijo)
+        self._escritores = {}
+
+    def agregar(self, tabla, registro):
+        escritor = self._escritores.get(tabla)
+        if escritor is None:
+            escritor = csv.DictWriter(self._archivo(tabla), fieldnames=list(registro), extrasaction="ignore")
+            escritor.writeheader()
+            self._escritores[tabla] = escritor
+        escritor.writerow({campo: _texto(valor) for campo, valor in registro.items()})
+
+
+class SalidaJSONL(_SalidaPorTabla):
+    """
+    Un archivo JSON Lines por tabla. Las fechas van en formato ISO 8601.
+    """
+
+    nombre = FORMATO_JSONL
+    extension = "jsonl"
+
+    def agregar(self, tabla, registro):
+        self._archivo(tabla).write(json.dumps(registro, ensure_ascii=False, default=_texto) + "\n")
+
+
+class SalidaParquet(Salida):
+    """
+    Conjunto de datos Parquet particionado por fecha de consulta, al que cada lote agrega archivos.
+
+    Cada tabla se escribe en `<carpeta>/<tabla>/fecha_consulta=AAAA-MM-DD/<lote>.parquet` (particiones
+    al estilo Hive), de modo que los lotes sucesivos se suman sin reescribir los anteriores. Las
+    filas se escriben por grupos con tipos fijos: las fechas como timestamp y los identificadores
+    como enteros. Requiere el paquete opcional `pyarrow`.
+    """
+
+    nombre = FORMATO_PARQUET
+
+    def __init__(self, carpeta, sufijo, filas_por_grupo=FILAS_POR_GRUPO_PARQUET):
+        self._pa, self._pq = _importar_pyarrow()
+        fecha_consulta = datetime.now().strftime("%Y-%m-%d")
+        self.rutas = {
+            tabla: os.path.join(carpeta, tabla, f"fecha_consulta={fecha_consulta}", f"{sufijo}.parquet")
+            for tabla in (TABLA_ACTUACIONES, TABLA_RESULTADO)
+        }
+        self.filas_por_grupo = filas_por_grupo
+        self._pendientes = {tabla: [] for tabla in self.rutas}
+        self._escritores = {}
+
+    def _esquema(self, tabla, registro):
+        pa = self._pa
+        tipos = {
+            "idProceso": pa.int64(),
+            "idRegActuacion": pa.int64(),
+            "consActuacion": pa.int64(),
+            "cant": pa.int64(),
+            "conDocumentos": pa.bool_(),
+            "urlsDocumentos": pa.list_(pa.string()),
+        }
+        campos = []
+        for campo in registro:
+            if campo.startswith("fecha"):
+                tipo = pa.timestamp("s")
+            else:
+                tipo = tipos.get(campo, pa.string())
+            campos.append(pa.field(campo, tipo))
+        return pa.schema(campos)
+
+    def agregar(self, tabla, registro):
+        pendientes = self._pendientes[tabla]
+        pendientes.append(registro)
+        if len(pendientes) >= self.filas_por_grupo:
+            self._escribir(tabla)
+
+    def _escribir(self, tabla):
+        pendientes = self._pendientes[tabla]
+        if not pendientes:
+            return
+        escritor = self._escritores.get(tabla)
+        if escritor is None:
+            esquema = self._esquema(tabla, pendientes[0])
+            os.makedirs(os.path.dirname(self.rutas[tabla]), exist_ok=True)
+            escritor = self._pq.ParquetWriter(self.rutas[tabla] + ".tmp", esquema, compression="zstd")
+            self._escritores[tabla] = escritor
+        esquema = escritor.schema
+        columnas = {
+            campo.name: [self._valor(campo, fila.get(campo.name)) for fila in pendientes]
+            for campo in esquema
+        }
+        escritor.write_table(self._pa.Table.from_pydict(columnas, schema=esquema))
+        pendientes.clear()
+
+    def _valor(self, campo, valor):
+        pa = self._pa
+        # Lo que no se pudo convertir al tipo de la columna queda vacío en lugar de abortar el lote
+        if pa.types.is_timestamp(campo.type):
+            return valor if isinstance(valor, datetime) else None
+        if pa.types.is_integer(campo.type):
+            try:
+                return int(valor) if valor is not None else None
+            except (TypeError, ValueError):
+                return None
+        if pa.types.is_boolean(campo.type):
+            return bool(valor) if valor is not None else None
+        if pa.types.is_list(campo.type):
+            return valor
+        return str(valor) if valor is not None else None
+
+    def guardar(self):
+        rutas = []
+        for tabla in self.rutas:
+            self._escribir(tabla)
+            escritor = self._escritores.pop(tabla, None)
+            if escritor is not None:
+                escritor.close()
+                os.replace(self.rutas[tabla] + ".tmp", self.rutas[tabla])
+                rutas.append(self.rutas[tabla])
+        return rutas
+
+    def close(self):
+        for tabla, escritor in self._escritores.items():
+            escritor.close()
+            os.remove(self.rutas[tabla] + ".tmp")
+        self._escritores = {}
+
+
+def _importar_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("La salida Parquet requiere el paquete pyarrow. Instálelo con: pip install pyarrow")
+    return pa, pq
+
+
+def validar_formatos(formatos):
+    """
+    Verifica que se puedan generar los formatos pedidos, sin crear ningún archivo.
+
+    Permite detectar un formato inválido o una dependencia faltante antes de consultar la API,
+    también cuando las salidas se crean después, como al combinar fragmentos.
+
+    Raises:
+        ValueError: Si algún formato no es soportado.
+        ImportError: Si se pide Parquet y pyarrow no está instalado.
+    """
+    for formato in formatos:
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato de salida no soportado: {formato}. Use uno de {', '.join(FORMATOS)}.")
+        if formato == FORMATO_PARQUET:
+            _importar_pyarrow()
+
+
+def crear_salidas(formatos, ruta_actuaciones, ruta_resultado=None, carpeta=".", sufijo=None):
+    """
+    Crea las salidas de un lote.
+
+    Args:
+        formatos (list): Formatos a generar: "excel", "csv", "jsonl" y/o "parquet".
+        ruta_actuaciones (str): Libro de Excel de actuaciones.
+        ruta_resultado (str, optional): Libro de Excel de resultados. Por defecto incluye la fecha y hora actual.
+        carpeta (str): Carpeta de los archivos CSV, JSONL y del conjunto de datos Parquet.
+        sufijo (str, optional): Sufijo de los nombres de archivo de este lote. Por defecto la fecha y hora actual.
+
+    Returns:
+        list: Las salidas, en el orden de `formatos`.
+
+    Raises:
+        ValueError: Si algún formato no es soportado.
+        ImportError: Si se pide Parquet y pyarrow no está instalado.
+    """
+    sufijo = sufijo or datetime.now().strftime("%Y%m%d_%H%M%S")
+    salidas = []
+    try:
+        for formato in formatos:
+            if formato == FORMATO_EXCEL:
+                salidas.append(SalidaExcel(ruta_actuaciones, ruta_resultado or f"resultado_procesos_{sufijo}.xlsx"))
+            elif formato == FORMATO_CSV:
+                salidas.append(SalidaCSV(carpeta, sufijo))
+            elif formato == FORMATO_JSONL:
+                salidas.append(SalidaJSONL(carpeta, sufijo))
+            elif formato == FORMATO_PARQUET:
+                salidas.append(SalidaParquet(carpeta, sufijo))
+            else:
+                raise ValueError(f"Formato de salida no soportado: {formato}. Use uno de {', '.join(FORMATOS)}.")
+    except Exception:
+        for salida in salidas:
+            salida.close()
+        raise
+    return salidas
@@ -0,0 +1,94 @@
+import time
+import sqlite3
+import threading
+
+RUTA_MARCAS = "marcas_agua.sqlite3"
+FORMATO_FECHA = "%Y-%m-%dT%H:%M:%S"
+
+
+def clave_actuacion(actuacion):
+    """
+    Devuelve la clave con la que se ordenan las actuaciones de un proceso.
+
+    La fecha de la actuación no trae hora, así que el consecutivo de la actuación desempata
+    las actuaciones registradas el mismo día.
+    """
+    return (actuacion.get("fechaActuacion") or "", actuacion.get("consActuacion") or 0)
+
+
+class MarcasAgua:
+    """
+    Guarda, por cada idProceso, la actuación más reciente vista (su marca de agua).
+
+    Las marcas se cargan en memoria al abrir el archivo. Las nuevas solo se escriben en disco al
+    llamar a `guardar`, de modo que si la ejecución se interrumpe antes de guardar los resultados,
+    la siguiente vuelve a reportar esas actuaciones como nuevas.
+    """
+
+    def __init__(self, ruta=RUTA_MARCAS):
+        """
+        Args:
+            ruta (str): Archivo SQLite donde se guardan las marcas de agua.
+        """
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute("""
+            CREATE TABLE IF NOT EXISTS marcas (
+                idProceso TEXT PRIMARY KEY,
+                fechaActuacion TEXT NOT NULL,
+                consActuacion INTEGER NOT NULL,
+                actualizado REAL NOT NULL
+            )""")
+        self._conexion.commit()
+        self._marcas = {
+            id_proceso: (fecha, cons)
+            for id_proceso, fecha, cons in self._conexion.execute(
+                "SELECT idProceso, fechaActuacion, consActuacion FROM marcas")
+        }
+        self._pendientes = {}
+
+    def obtener(self, id_proceso):
+        """
+        Devuelve la marca de agua de un proceso.
+
+        Returns:
+            tuple: `(fechaActuacion, consActuacion)` de la actuación más reciente vista, o None si el
+                proceso nunca se ha sincronizado.
+        """
+        with self._lock:
+            return self._marcas.get(str(id_proceso))
+
+    def registrar(self, id_proceso, actuacion):
+        """
+        Avanza la marca de agua de un proceso si la actuación es más reciente que la actual.
+
+        Args:
+            id_proceso (int | str): Identificador del proceso.
+            actuacion (dict): Actuación devuelta por la API.
+        """
+        clave = clave_actuacion(actuacion)
+        with self._lock:
+            actual = self._marcas.get(str(id_proceso))
+            if actual is None or clave > actual:
+                self._marcas[str(id_proceso)] = clave
+                self._pendientes[str(id_proceso)] = clave
+
+    def guardar(self):
+        """
+        Escribe en disco, en una sola transacción, las marcas de agua que avanzaron.
+        """
+        with self._lock:
+            ahora = time.time()
+            self._conexion.executemany(
+                "INSERT OR REPLACE INTO marcas (idProceso, fechaActuacion, consActuacion, actualizado) VALUES (?, ?, ?, ?)",
+                [(id_proceso, fecha, cons, ahora) for id_proceso, (fecha, cons) in self._pendientes.items()])
+            self._conexion.commit()
+            self._pendientes.clear()
+
+    def close(self):
+        """
+        Cierra el archivo de marcas sin guardar las marcas pendientes.
+        """
+        with self._lock:
+            self._conexion.close()
@@ -0,0 +1,49 @@
+import os
+import sys
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [RAIZ, os.path.join(RAIZ, "benchmarks")]
+
+from servidor_simulado import iniciar, url_base, ConfiguracionSimulada  # noqa: E402
+
+
+@pytest.fixture
+def servidor_con():
+    """
+    Fábrica de servidores simulados en puertos libres: recibe los argumentos de `ConfiguracionSimulada`
+    y devuelve la URL base. Los servidores se detienen al terminar la prueba.
+    """
+    servidores = []
+
+    def crear(**config):
+        srv = iniciar(0, ConfiguracionSimulada(**config))
+        servidores.append(srv)
+        return url_base(srv)
+
+    yield crear
+    for srv in servidores:
+        srv.shutdown()
+        srv.server_close()
+
+
+@pytest.fixture
+def servidor(servidor_con):
+    """
+    Servidor simulado de la API en un puerto libre; devuelve su URL base.
+    """
+    return servidor_con()
+
+
+@pytest.fixture(autouse=True)
+def carpeta_temporal(tmp_path, monkeypatch):
+    # Caché, diario, marcas y salidas usan rutas relativas: cada prueba trabaja en su propia carpeta
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def radicaciones(cantidad, inicio=1):
+    """
+    Devuelve `cantidad` números de radicación válidos y distintos.
+    """
+    return [f"{numero:023d}" for numero in range(inicio, inicio + cantidad)]
@@ -0,0 +1,84 @@
+import time
+import sqlite3
+import cache
+import cli
+from cache import CacheRespuestas
+from conftest import radicaciones
+from lote import process_data
+from metricas import Metricas
+
+RUTA = "Proceso/Actuaciones/1"
+
+
+def ultimo_acceso(ruta_cache, clave):
+    with sqlite3.connect(ruta_cache) as conexion:
+        return conexion.execute("SELECT ultimo_acceso FROM respuestas WHERE clave = ?", (clave,)).fetchone()[0]
+
+
+def test_una_entrada_vencida_no_se_entrega():
+    respuestas = CacheRespuestas(ttl_por_endpoint={"Proceso/Actuaciones": 0.2})
+    respuestas.guardar(RUTA, {}, b"{}")
+    assert respuestas.obtener(RUTA) == b"{}"
+
+    time.sleep(0.3)
+    assert respuestas.obtener(RUTA) is None
+    assert respuestas.purgar_expiradas() == 1
+    respuestas.close()
+
+
+def test_al_superar_el_tamano_se_expulsan_las_menos_usadas():
+    respuestas = CacheRespuestas(tamano_maximo=300)
+    for numero in range(3):
+        respuestas.guardar(f"Proceso/Actuaciones/{numero}", {}, b"x" * 100)
+    # El acierto de la primera, aún sin anotar en disco, la vuelve la más reciente
+    assert respuestas.obtener("Proceso/Actuaciones/0") is not None
+
+    respuestas.guardar("Proceso/Actuaciones/3", {}, b"x" * 100)
+    assert respuestas.obtener("Proceso/Actuaciones/0") is not None
+    assert respuestas.obtener("Proceso/Actuaciones/1") is None
+    respuestas.close()
+
+
+def test_los_aciertos_se_anotan_por_tandas_y_al_cerrar(monkeypatch):
+    monkeypatch.setattr(cache, "ACCESOS_POR_ESCRITURA", 3)
+    respuestas = CacheRespuestas()
+    for numero in range(3):
+        respuestas.guardar(f"Proceso/Actuaciones/{numero}", {}, b"{}")
+    guardado = ultimo_acceso(respuestas.ruta, cache.clave_de(RUTA))
+
+    respuestas.obtener(RUTA)
+    assert ultimo_acceso(respuestas.ruta, cache.clave_de(RUTA)) == guardado
+    respuestas.obtener("Proceso/Actuaciones/2")
+    respuestas.obtener("Proceso/Actuaciones/2")
+    # Tres aciertos pendientes sobre dos claves no completan la tanda
+    assert ultimo_acceso(respuestas.ruta, cache.clave_de(RUTA)) == guardado
+    respuestas.obtener("Proceso/Actuaciones/0")
+    assert ultimo_acceso(respuestas.ruta, cache.clave_de(RUTA)) > guardado
+
+    respuestas.obtener("Proceso/Actuaciones/0")
+    anotado = ultimo_acceso(respuestas.ruta, cache.clave_de("Proceso/Actuaciones/0"))
+    respuestas.close()
+    assert ultimo_acceso(respuestas.ruta, cache.clave_de("Proceso/Actuaciones/0")) > anotado
+
+
+def test_refrescar_consulta_la_api_aunque_haya_cache(servidor):
+    data = radicaciones(4)
+
+    def aciertos(**opciones):
+        metricas = Metricas()
+        process_data(data, url_base=servidor, ruta_historial=None, formatos=["jsonl"], metricas=metricas,
+                     al_mensaje=lambda *_: None, **opciones)
+        return metricas.contadores["cache_aciertos"]
+
+    assert aciertos() == 0
+    assert aciertos() > 0
+    assert aciertos(refrescar_cache=True) == 0
+
+
+def test_la_opcion_cache_elige_el_archivo(servidor, carpeta_temporal):
+    (carpeta_temporal / "entrada.csv").write_text("radicacion\n" + "\n".join(radicaciones(2)) + "\n")
+    assert cli.main(["consultar", "entrada.csv", "--url-api", servidor, "--sin-historial", "--formatos", "jsonl",
+                     "--cache", "otra_cache.sqlite3"]) == 0
+
+    assert (carpeta_temporal / "otra_cache.sqlite3").exists()
+    assert not (carpeta_temporal / cache.RUTA_CACHE).exists()
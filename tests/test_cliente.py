@@ -0,0 +1,63 @@
+import servidor_simulado
+from cliente import ClienteRama
+from conftest import radicaciones
+from metricas import Metricas
+
+RUTA = "Procesos/Consulta/NumeroRadicacion"
+
+
+def esperas_registradas(monkeypatch):
+    # Esperas de backoff calculadas por el cliente (no incluye las de Retry-After)
+    esperas = []
+    espera = ClienteRama._espera
+
+    def registrar(self, intento):
+        esperas.append(espera(self, intento))
+        return esperas[-1]
+
+    monkeypatch.setattr(ClienteRama, "_espera", registrar)
+    return esperas
+
+
+def test_los_errores_del_servidor_se_reintentan_con_backoff(servidor_con, monkeypatch):
+    esperas = esperas_registradas(monkeypatch)
+    metricas = Metricas()
+    rama = ClienteRama(servidor_con(tasa_error=1.0), reintentos=3, backoff_base=0.01, tasa_maxima=100, metricas=metricas)
+    response = rama.get(RUTA, params={"numero": radicaciones(1)[0]})
+    rama.close()
+
+    # Se agotan los reintentos y se entrega la última respuesta
+    assert response.status_code == 503
+    assert metricas.contadores["reintentos"] == 3
+    assert len(esperas) == 3
+    assert all(0 <= espera <= 0.01 * 2 ** intento for intento, espera in enumerate(esperas))
+    # Cada 503 reduce la tasa a la mitad
+    assert rama.limitador.tasa == 100 / 2 ** 4
+
+
+def test_un_429_penaliza_la_tasa_y_respeta_retry_after(servidor, monkeypatch):
+    do_get = servidor_simulado.ManejadorSimulado.do_GET
+    saturadas = []
+
+    def saturado_dos_veces(self):
+        if len(saturadas) < 2:
+            saturadas.append(self.path)
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        do_get(self)
+
+    monkeypatch.setattr(servidor_simulado.ManejadorSimulado, "do_GET", saturado_dos_veces)
+    esperas = esperas_registradas(monkeypatch)
+    rama = ClienteRama(servidor, tasa_maxima=100)
+    response = rama.get(RUTA, params={"numero": radicaciones(1)[0]})
+    rama.close()
+
+    assert response.status_code == 200
+    assert len(saturadas) == 2
+    # Retry-After reemplaza al backoff
+    assert esperas == []
+    # Dos penalizaciones y una recompensa aditiva del 5% de la tasa máxima
+    assert rama.limitador.tasa == 100 / 4 + 5
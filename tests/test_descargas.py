@@ -0,0 +1,93 @@
+import os
+import hashlib
+import threading
+import pytest
+from cliente import ClienteRama, HEADERS_DOCUMENTOS
+from descargas import AlmacenDocumentos
+
+TAMANO = 64 * 1024  # tamaño de los adjuntos del servidor simulado
+
+
+def contenido_documento(id_documento):
+    # El mismo contenido que genera el servidor simulado
+    bloque = hashlib.sha256(id_documento.encode()).digest()
+    return (bloque * (TAMANO // len(bloque) + 1))[:TAMANO]
+
+
+@pytest.fixture
+def almacen(servidor):
+    cliente = ClienteRama(servidor)
+    almacen = AlmacenDocumentos(cliente, "adjuntos")
+    yield almacen
+    almacen.close()
+    cliente.close()
+
+
+def url_documento(almacen, id_documento):
+    return almacen.cliente.url(f"Descarga/Documento/{id_documento}")
+
+
+def leer(ruta):
+    with open(ruta, "rb") as archivo:
+        return archivo.read()
+
+
+def test_un_parcial_se_reanuda_con_range(almacen):
+    url = url_documento(almacen, "101")
+    with open(almacen._ruta_parcial(url), "wb") as parcial:
+        parcial.write(contenido_documento("101")[:1000])
+    with open(almacen._ruta_parcial(url) + ".nombre", "w", encoding="utf-8") as nombre:
+        nombre.write("documento_101.pdf")
+
+    destino, recibidos = almacen.descargar(url, HEADERS_DOCUMENTOS, ".")
+    assert recibidos == TAMANO - 1000
+    assert os.path.basename(destino) == "documento_101.pdf"
+    assert leer(destino) == contenido_documento("101")
+    assert os.listdir(almacen.ruta_parciales) == []
+
+
+def test_un_parcial_que_no_corresponde_se_descarta(almacen):
+    url = url_documento(almacen, "102")
+    # Más largo que el documento: el servidor responde 416 y se descarga completo
+    with open(almacen._ruta_parcial(url), "wb") as parcial:
+        parcial.write(b"x" * (TAMANO + 10))
+
+    destino, recibidos = almacen.descargar(url, HEADERS_DOCUMENTOS, ".")
+    assert recibidos == TAMANO
+    assert leer(destino) == contenido_documento("102")
+
+
+def test_un_documento_repetido_se_enlaza_sin_descargarlo(almacen):
+    url = url_documento(almacen, "103")
+    os.makedirs("a")
+    os.makedirs("b")
+    primero, recibidos = almacen.descargar(url, HEADERS_DOCUMENTOS, "a")
+    segundo, repetidos = almacen.descargar(url, HEADERS_DOCUMENTOS, "b")
+
+    assert (recibidos, repetidos) == (TAMANO, 0)
+    assert os.path.samefile(primero, segundo)
+    assert os.stat(primero).st_nlink == 3  # el objeto del almacén y los dos enlaces
+
+
+def test_descargas_simultaneas_de_la_misma_url_la_descargan_una_vez(servidor):
+    # Cada hilo usa su propio almacén sobre la misma carpeta, como los procesos de los fragmentos
+    url = ClienteRama(servidor).url("Descarga/Documento/104")
+    recibidos = []
+
+    def descargar(numero):
+        cliente = ClienteRama(servidor)
+        almacen = AlmacenDocumentos(cliente, "adjuntos")
+        os.makedirs(f"radicacion_{numero}")
+        recibidos.append(almacen.descargar(url, HEADERS_DOCUMENTOS, f"radicacion_{numero}")[1])
+        almacen.close()
+        cliente.close()
+
+    hilos = [threading.Thread(target=descargar, args=(numero,)) for numero in range(6)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert sorted(recibidos) == [0] * 5 + [TAMANO]
+    for numero in range(6):
+        assert leer(f"radicacion_{numero}/documento_104.pdf") == contenido_documento("104")
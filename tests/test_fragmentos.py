@@ -0,0 +1,53 @@
+import json
+import glob
+import cli
+from conftest import radicaciones
+
+
+def consultar(servidor, *extra):
+    return cli.main(["consultar", "entrada.csv", "--url-api", servidor, "--sin-historial", "--formatos", "jsonl",
+                     "--fragmentos", "2", *extra])
+
+
+def radicaciones_del_resultado(carpeta):
+    ruta, = glob.glob(f"{carpeta}/resultado_*.jsonl")
+    with open(ruta, encoding="utf-8") as archivo:
+        return [json.loads(linea)["numeroRadicacion"] for linea in archivo]
+
+
+def test_cada_ejecucion_con_fragmentos_vuelve_a_consultar(servidor, carpeta_temporal, capfd):
+    data = radicaciones(16)
+    (carpeta_temporal / "entrada.csv").write_text("radicacion\n" + "\n".join(data) + "\n")
+
+    assert consultar(servidor, "--carpeta-salidas", "primera") == 0
+    assert radicaciones_del_resultado("primera") == data
+    capfd.readouterr()
+
+    # Una ejecución nueva descarta los diarios de los fragmentos en lugar de reanudarlos
+    assert consultar(servidor, "--carpeta-salidas", "segunda") == 0
+    salida = capfd.readouterr().out
+    assert "[fragmento 0] Reanudando el lote" not in salida
+    assert "[fragmento 1] Reanudando el lote" not in salida
+    assert radicaciones_del_resultado("segunda") == data
+
+
+def test_un_fragmento_con_reanudar_continua_su_diario(servidor, carpeta_temporal, capfd):
+    data = radicaciones(16)
+    (carpeta_temporal / "entrada.csv").write_text("radicacion\n" + "\n".join(data) + "\n")
+    assert consultar(servidor, "--fragmento", "0", "1") == 0
+    capfd.readouterr()
+
+    assert consultar(servidor, "--fragmento", "0", "--reanudar") == 0
+    assert "[fragmento 0] Reanudando el lote" in capfd.readouterr().out
+
+    assert consultar(servidor, "--combinar", "--carpeta-salidas", "combinado") == 0
+    assert radicaciones_del_resultado("combinado") == data
+
+
+def test_combinar_sin_todos_los_fragmentos_termina_con_error(servidor, carpeta_temporal, capfd):
+    (carpeta_temporal / "entrada.csv").write_text("radicacion\n" + "\n".join(radicaciones(16)) + "\n")
+    assert consultar(servidor, "--fragmento", "0") == 0
+    capfd.readouterr()
+
+    assert consultar(servidor, "--combinar") == 1
+    assert "Hay fragmentos sin terminar: 1." in capfd.readouterr().out
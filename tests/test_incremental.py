@@ -0,0 +1,64 @@
+import sqlite3
+from conftest import radicaciones
+from lote import process_data
+from salidas import Salida, SalidaJSONL
+from sincronizacion import RUTA_MARCAS
+
+
+class SalidaFallida(Salida):
+    nombre = "fallida"
+
+    def agregar(self, tabla, registro):
+        pass
+
+    def guardar(self):
+        raise OSError("disco lleno")
+
+
+def incremental(url, data, salidas=None, al_resultado=None):
+    return process_data(data, url_base=url, ruta_historial=None, formatos=["jsonl"], salidas=salidas, incremental=True,
+                        al_mensaje=lambda *_: None, al_resultado=al_resultado)
+
+
+def marcas():
+    with sqlite3.connect(RUTA_MARCAS) as conexion:
+        return dict(conexion.execute("SELECT idProceso, consActuacion FROM marcas"))
+
+
+def primera_consulta(url, data):
+    # Registra las marcas de todas las radicaciones y devuelve el idProceso de la primera
+    resultados = []
+    resumen = incremental(url, data, al_resultado=resultados.append)
+    assert resumen["exitosos"] == len(data) and resumen["con_actividad"] == []
+    return resultados[0]["procesos"][0]["idProceso"]
+
+
+def retroceder_marca(id_proceso):
+    # Simula una actuación nueva: la marca queda en la penúltima actuación del mismo día
+    with sqlite3.connect(RUTA_MARCAS) as conexion:
+        conexion.execute("UPDATE marcas SET consActuacion = consActuacion - 1 WHERE idProceso = ?", (str(id_proceso),))
+
+
+def test_solo_se_reportan_las_actuaciones_posteriores_a_la_marca(servidor):
+    data = radicaciones(4)
+    id_proceso = primera_consulta(servidor, data)
+    assert incremental(servidor, data)["con_actividad"] == []
+
+    retroceder_marca(id_proceso)
+    assert incremental(servidor, data)["con_actividad"] == [(data[0], id_proceso, 1)]
+    # La marca avanzó: la actuación ya no es nueva
+    assert incremental(servidor, data)["con_actividad"] == []
+
+
+def test_las_marcas_no_avanzan_si_falla_alguna_salida(servidor, carpeta_temporal):
+    data = radicaciones(2)
+    id_proceso = primera_consulta(servidor, data)
+    retroceder_marca(id_proceso)
+    antes = marcas()
+
+    fallido = incremental(servidor, data, [SalidaJSONL(str(carpeta_temporal), "a"), SalidaFallida()])
+    assert fallido["con_actividad"] == [(data[0], id_proceso, 1)]
+    assert marcas() == antes
+
+    # La siguiente ejecución vuelve a reportar la misma actuación
+    assert incremental(servidor, data)["con_actividad"] == fallido["con_actividad"]
@@ -0,0 +1,137 @@
+import json
+import asyncio
+import pytest
+import cli
+import motor
+import servidor_simulado
+from conftest import radicaciones
+from lote import process_data
+from motor import ControlLote
+
+
+def ejecutar(url, data, mensajes=None, **opciones):
+    def al_mensaje(*mensaje):
+        if mensajes is not None:
+            mensajes.append(" ".join(map(str, mensaje)))
+
+    return process_data(data, url_base=url, ruta_historial=None, formatos=["jsonl"], al_mensaje=al_mensaje, **opciones)
+
+
+def filas_resultado(resumen):
+    with open(resumen["archivos"]["jsonl"][1], encoding="utf-8") as archivo:
+        return [json.loads(linea) for linea in archivo]
+
+
+def test_reanudar_no_vuelve_a_consultar_las_terminadas(servidor):
+    data = radicaciones(12)
+    primero = ejecutar(servidor, data, concurrencia=4)
+    mensajes = []
+    segundo = ejecutar(servidor, data, mensajes, concurrencia=4, reanudar=True)
+
+    assert "Reanudando el lote: 12 registros tomados del diario, 0 por consultar." in mensajes
+    assert segundo["exitosos"] == primero["exitosos"] == 12
+    assert [fila["numeroRadicacion"] for fila in filas_resultado(segundo)] == data
+
+
+def test_el_diario_anota_los_resultados_que_esperan_su_turno(servidor, monkeypatch):
+    data = radicaciones(10)
+    consultar = motor.MotorConsultas.consultar_radicacion
+
+    async def primera_lenta(self, numero):
+        if numero == data[0]:
+            await asyncio.sleep(0.5)
+        return await consultar(self, numero)
+
+    def fallar_antes_de_la_primera(completados, total):
+        # Todas terminaron menos la primera: sus resultados siguen esperando turno para las salidas
+        if completados == total - 1:
+            raise RuntimeError("interrupción simulada")
+
+    monkeypatch.setattr(motor.MotorConsultas, "consultar_radicacion", primera_lenta)
+    with pytest.raises(RuntimeError):
+        ejecutar(servidor, data, concurrencia=4, al_progreso=fallar_antes_de_la_primera)
+    monkeypatch.setattr(motor.MotorConsultas, "consultar_radicacion", consultar)
+
+    mensajes = []
+    resumen = ejecutar(servidor, data, mensajes, concurrencia=4, reanudar=True)
+    assert "Reanudando el lote: 9 registros tomados del diario, 1 por consultar." in mensajes
+    assert [fila["numeroRadicacion"] for fila in filas_resultado(resumen)] == data
+
+
+def test_cancelar_y_reanudar_completa_el_lote(servidor):
+    data = radicaciones(20)
+    control = ControlLote()
+
+    def cancelar_a_la_mitad(completados, total):
+        if completados == 10:
+            control.cancelar()
+
+    cancelado = ejecutar(servidor, data, concurrencia=1, control=control, al_progreso=cancelar_a_la_mitad)
+    assert cancelado["cancelado"]
+    assert [fila["numeroRadicacion"] for fila in filas_resultado(cancelado)] == data[:10]
+
+    mensajes = []
+    reanudado = ejecutar(servidor, data, mensajes, concurrencia=4, reanudar=True)
+    assert not reanudado["cancelado"]
+    assert "Reanudando el lote: 10 registros tomados del diario, 10 por consultar." in mensajes
+    assert [fila["numeroRadicacion"] for fila in filas_resultado(reanudado)] == data
+
+
+def test_las_filas_de_resultado_siguen_el_orden_de_entrada(servidor):
+    validas = radicaciones(3)
+    data = ["invalida 1", validas[0], validas[1], "invalida 2", validas[0], validas[2], "invalida 3"]
+    resumen = ejecutar(servidor, data, concurrencia=3)
+
+    filas = filas_resultado(resumen)
+    assert [fila["numeroRadicacion"] for fila in filas] == data
+    assert [fila["estado"] for fila in filas if fila["numeroRadicacion"].startswith("invalida")] == ["Error"] * 3
+
+
+def test_reanudar_con_otros_parametros_termina_con_error(servidor, carpeta_temporal, capsys):
+    (carpeta_temporal / "entrada.csv").write_text("radicacion\n" + "\n".join(radicaciones(3)) + "\n")
+    argumentos = ["consultar", "entrada.csv", "--url-api", servidor, "--sin-historial", "--formatos", "jsonl"]
+    assert cli.main(argumentos) == 0
+    capsys.readouterr()
+
+    assert cli.main(argumentos + ["--reanudar", "--modo", "completo"]) == 1
+    assert "se generó con otros parámetros" in capsys.readouterr().out
+
+
+def test_un_recurso_que_no_se_puede_abrir_cierra_el_lote(servidor, carpeta_temporal, capsys):
+    (carpeta_temporal / "entrada.csv").write_text("radicacion\n" + "\n".join(radicaciones(3)) + "\n")
+    codigo = cli.main(["consultar", "entrada.csv", "--url-api", servidor, "--formatos", "csv", "--descargar",
+                       "--historial", str(carpeta_temporal / "no_existe" / "historial.sqlite3")])
+
+    assert codigo == 1
+    assert "unable to open database file" in capsys.readouterr().out
+    # Los archivos temporales de las salidas se descartan
+    assert not list(carpeta_temporal.glob("*.csv.tmp")) and not list(carpeta_temporal.glob("*_*.csv"))
+
+
+def test_las_consultas_evitadas_cuentan_las_paginas_de_la_consulta_compartida(servidor_con, monkeypatch):
+    data = radicaciones(3)
+    procesos_de = servidor_simulado.procesos_de
+
+    def mismo_proceso(numero, config):
+        # Todas las radicaciones apuntan al proceso de la primera
+        return [dict(proceso, idProceso=procesos_de(data[0], config)[0]["idProceso"])
+                for proceso in procesos_de(numero, config)]
+
+    monkeypatch.setattr(servidor_simulado, "procesos_de", mismo_proceso)
+    # Cinco actuaciones de a dos por página: la consulta compartida hace tres solicitudes
+    resumen = ejecutar(servidor_con(por_pagina=2), data, concurrencia=1, modo="completo")
+
+    assert resumen["exitosos"] == 3
+    assert resumen["consultas_evitadas"]["actuaciones"] == 2 * 3
+
+
+def test_se_recorren_todas_las_paginas_de_actuaciones(servidor_con):
+    data = radicaciones(3)
+    # Doce actuaciones de a cinco por página: tres páginas por proceso
+    resumen = ejecutar(servidor_con(actuaciones=12, por_pagina=5), data, concurrencia=2, modo="completo")
+
+    with open(resumen["archivos"]["jsonl"][0], encoding="utf-8") as archivo:
+        actuaciones = [json.loads(linea) for linea in archivo]
+    for numero in data:
+        consecutivos = [fila["consActuacion"] for fila in actuaciones if fila["numeroRadicacion"] == numero]
+        assert consecutivos == list(range(12, 0, -1))
@@ -0,0 +1,54 @@
+import csv
+import sys
+import json
+import pytest
+import cli
+from conftest import radicaciones
+from lote import process_data
+
+
+def leer_csv(ruta):
+    with open(ruta, newline="", encoding="utf-8") as archivo:
+        return list(csv.DictReader(archivo))
+
+
+def leer_jsonl(ruta):
+    with open(ruta, encoding="utf-8") as archivo:
+        return [json.loads(linea) for linea in archivo]
+
+
+def test_csv_y_jsonl_tienen_las_mismas_filas(servidor):
+    data = radicaciones(3)
+    resumen = process_data(data + ["invalida"], url_base=servidor, ruta_historial=None, formatos=["csv", "jsonl"],
+                           modo="completo", al_mensaje=lambda *_: None)
+    actuaciones_csv, resultado_csv = map(leer_csv, resumen["archivos"]["csv"])
+    actuaciones_jsonl, resultado_jsonl = map(leer_jsonl, resumen["archivos"]["jsonl"])
+
+    assert len(actuaciones_csv) == len(actuaciones_jsonl) == 3 * 5
+    for fila_csv, fila_jsonl in zip(actuaciones_csv, actuaciones_jsonl):
+        assert fila_csv["numeroRadicacion"] == fila_jsonl["numeroRadicacion"]
+        assert fila_csv["consActuacion"] == str(fila_jsonl["consActuacion"])
+        # Las fechas van en ISO 8601 y las URLs de documentos, separadas por ";" en el CSV
+        assert fila_csv["fechaActuacion"] == fila_jsonl["fechaActuacion"]
+        assert fila_jsonl["fechaActuacion"].endswith("T00:00:00")
+        assert fila_csv["urlsDocumentos"] == ";".join(fila_jsonl["urlsDocumentos"] or [])
+
+    assert [fila["numeroRadicacion"] for fila in resultado_csv] == data + ["invalida"]
+    assert [(fila["numeroRadicacion"], fila["estado"]) for fila in resultado_csv] == \
+        [(fila["numeroRadicacion"], fila["estado"]) for fila in resultado_jsonl]
+    assert resultado_jsonl[-1]["estado"] == "Error"
+
+
+def test_parquet_sin_pyarrow_falla_antes_de_consultar(servidor, carpeta_temporal, capsys, monkeypatch):
+    # Un módulo en None hace que el import falle aunque pyarrow esté instalado
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    monkeypatch.setitem(sys.modules, "pyarrow.parquet", None)
+    (carpeta_temporal / "entrada.csv").write_text("radicacion\n" + "\n".join(radicaciones(2)) + "\n")
+
+    assert cli.main(["consultar", "entrada.csv", "--url-api", servidor, "--sin-historial",
+                     "--formatos", "jsonl", "parquet"]) == 1
+    assert "pip install pyarrow" in capsys.readouterr().out
+    assert sorted(ruta.name for ruta in carpeta_temporal.iterdir()) == ["entrada.csv"]
+
+    with pytest.raises(ImportError):
+        process_data(radicaciones(2), url_base=servidor, ruta_historial=None, formatos=["parquet"])
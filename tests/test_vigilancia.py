@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+import pytest
+import vigilancia
+from conftest import radicaciones
+from vigilancia import intervalo_sondeo, PlanificadorSondeo, INTERVALO_MINIMO, INTERVALO_MAXIMO
+
+AHORA = datetime(2025, 6, 1).timestamp()
+DIA = 24 * 60 * 60
+
+
+def hace(dias):
+    return (datetime.fromtimestamp(AHORA) - timedelta(days=dias)).strftime("%Y-%m-%dT00:00:00")
+
+
+@pytest.mark.parametrize("fecha, intervalo", [
+    (None, INTERVALO_MAXIMO),
+    ("no es una fecha", INTERVALO_MAXIMO),
+    (hace(0), INTERVALO_MINIMO),
+    (hace(5), 0.5 * DIA),
+    (hace(365), INTERVALO_MAXIMO),
+])
+def test_el_intervalo_depende_de_la_ultima_actuacion(fecha, intervalo):
+    assert intervalo_sondeo(fecha, AHORA) == pytest.approx(intervalo)
+
+
+def test_las_vencidas_salen_de_la_mas_atrasada_a_la_mas_reciente(monkeypatch):
+    monkeypatch.setattr(vigilancia.random, "uniform", lambda a, b: 1.0)
+    activa, inactiva, sin_actuaciones = radicaciones(3)
+    planificador = PlanificadorSondeo()
+    planificador.vigilar([sin_actuaciones, inactiva, activa], ahora=AHORA)
+
+    # Las nuevas vencen de inmediato; el límite reparte el cupo de la ronda
+    primeras = planificador.vencidas(ahora=AHORA, limite=2)
+    assert len(primeras) == 2
+    assert sorted(primeras + planificador.vencidas(ahora=AHORA)) == [activa, inactiva, sin_actuaciones]
+    planificador.reprogramar(sin_actuaciones, ahora=AHORA)
+    planificador.reprogramar(inactiva, hace(100), ahora=AHORA)
+    planificador.reprogramar(activa, hace(2), ahora=AHORA)
+
+    assert planificador.proximo() == pytest.approx(AHORA + 0.2 * DIA)
+    assert planificador.vencidas(ahora=AHORA + DIA) == [activa]
+    assert planificador.vencidas(ahora=AHORA + INTERVALO_MAXIMO) == [inactiva, sin_actuaciones]
+    planificador.close()
+
+
+def test_los_fallos_seguidos_alargan_la_espera_y_el_turno_se_conserva(monkeypatch):
+    monkeypatch.setattr(vigilancia.random, "uniform", lambda a, b: 1.0)
+    numero, = radicaciones(1)
+    planificador = PlanificadorSondeo()
+    planificador.vigilar([numero], ahora=AHORA)
+    esperas = []
+    for _ in range(3):
+        planificador.vencidas(ahora=AHORA, limite=1)
+        esperas.append(planificador.reprogramar(numero, error=True, ahora=AHORA) - AHORA)
+    assert esperas == [INTERVALO_MINIMO, 2 * INTERVALO_MINIMO, 4 * INTERVALO_MINIMO]
+    planificador.guardar()
+    planificador.close()
+
+    # Al reiniciar, la radicación no se consulta antes de su turno
+    reiniciado = PlanificadorSondeo()
+    reiniciado.vigilar([numero], ahora=AHORA)
+    assert reiniciado.vencidas(ahora=AHORA) == []
+    assert reiniciado.proximo() == AHORA + 4 * INTERVALO_MINIMO
+    reiniciado.close()
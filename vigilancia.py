@@ -0,0 +1,278 @@
+import time
+import heapq
+import random
+import sqlite3
+import threading
+from datetime import datetime
+from cliente import ClienteRama, URL_BASE
+from cache import CacheRespuestas, RUTA_CACHE
+from sincronizacion import MarcasAgua
+from motor import MotorConsultas, MODO_ULTIMA
+
+RUTA_VIGILANCIA = "vigilancia.sqlite3"
+# Marcas de agua propias del demonio: si compartiera las de `consultar --incremental`, cada uno
+# ocultaría al otro las actuaciones nuevas
+RUTA_MARCAS_VIGILANCIA = "vigilancia_marcas.sqlite3"
+SOLICITUDES_POR_MINUTO = 120
+INTERVALO_MINIMO = 60 * 60  # segundos
+INTERVALO_MAXIMO = 7 * 24 * 60 * 60
+# Fracción del tiempo sin actuaciones que se espera antes de volver a consultar un proceso
+FRACCION_INACTIVIDAD = 0.1
+JITTER = 0.1
+DURACION_RONDA = 60  # segundos de presupuesto que se reparten en cada ronda
+SOLICITUDES_POR_RADICACION = 2  # NumeroRadicacion + Actuaciones, en promedio
+ESPERA_MAXIMA = 60  # segundos entre revisiones de la cola cuando no hay nada vencido
+# Las consultas que vencen dentro de este margen se adelantan para agruparlas en la ronda en curso
+ADELANTO = 60  # segundos
+
+
+def intervalo_sondeo(fecha_ultima_actuacion, ahora, intervalo_minimo=INTERVALO_MINIMO,
+                     intervalo_maximo=INTERVALO_MAXIMO):
+    """
+    Calcula cada cuánto consultar un proceso según su actividad reciente.
+
+    Un proceso con actuaciones recientes se consulta con frecuencia, y uno inactivo cada vez
+    menos: el intervalo es una fracción del tiempo transcurrido desde su última actuación,
+    acotada entre el mínimo y el máximo.
+
+    Args:
+        fecha_ultima_actuacion (str): Fecha de la última actuación conocida ("2025-01-02T00:00:00"), o None.
+        ahora (float): Momento actual, como `time.time()`.
+        intervalo_minimo (float): Intervalo mínimo, en segundos.
+        intervalo_maximo (float): Intervalo máximo, en segundos. Es el de los procesos sin actuaciones.
+
+    Returns:
+        float: Segundos hasta la siguiente consulta.
+    """
+    if not fecha_ultima_actuacion:
+        return intervalo_maximo
+    try:
+        ultima = datetime.fromisoformat(fecha_ultima_actuacion).timestamp()
+    except ValueError:
+        return intervalo_maximo
+    inactividad = max(0.0, ahora - ultima)
+    return min(intervalo_maximo, max(intervalo_minimo, inactividad * FRACCION_INACTIVIDAD))
+
+
+class PlanificadorSondeo:
+    """
+    Cola de prioridad de las radicaciones vigiladas, ordenada por el momento de su próxima consulta.
+
+    El estado (próxima consulta, última actuación conocida y fallos seguidos de cada radicación)
+    se guarda en SQLite, de modo que al reiniciar el demonio cada radicación conserva su turno.
+    """
+
+    def __init__(self, ruta=RUTA_VIGILANCIA, intervalo_minimo=INTERVALO_MINIMO, intervalo_maximo=INTERVALO_MAXIMO):
+        """
+        Args:
+            ruta (str): Archivo SQLite con el estado del planificador.
+            intervalo_minimo (float): Intervalo mínimo entre dos consultas de una radicación, en segundos.
+            intervalo_maximo (float): Intervalo máximo entre dos consultas de una radicación, en segundos.
+        """
+        self.ruta = ruta
+        self.intervalo_minimo = intervalo_minimo
+        self.intervalo_maximo = intervalo_maximo
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute("""
+            CREATE TABLE IF NOT EXISTS sondeos (
+                numeroRadicacion TEXT PRIMARY KEY,
+                proximo REAL NOT NULL,
+                ultimo REAL,
+                fechaUltimaActuacion TEXT,
+                fallos INTEGER NOT NULL DEFAULT 0
+            )""")
+        self._conexion.commit()
+        self._estado = {
+            numero: {"proximo": proximo, "fechaUltimaActuacion": fecha, "fallos": fallos}
+            for numero, proximo, fecha, fallos in self._conexion.execute(
+                "SELECT numeroRadicacion, proximo, fechaUltimaActuacion, fallos FROM sondeos")
+        }
+        self._cola = []
+        self._pendientes = set()
+
+    def vigilar(self, radicaciones, ahora=None):
+        """
+        Define las radicaciones vigiladas. Las nuevas se consultan de inmediato y las que ya tenían
+        estado conservan su turno.
+
+        Args:
+            radicaciones (list): Números de radicación a vigilar.
+            ahora (float, optional): Momento actual, como `time.time()`.
+        """
+        ahora = time.time() if ahora is None else ahora
+        with self._lock:
+            self._cola = []
+            for numero in dict.fromkeys(radicaciones):
+                estado = self._estado.get(numero)
+                if estado is None:
+                    estado = self._estado[numero] = {"proximo": ahora, "fechaUltimaActuacion": None, "fallos": 0}
+                    self._pendientes.add(numero)
+                self._cola.append((estado["proximo"], numero))
+            heapq.heapify(self._cola)
+
+    def __len__(self):
+        return len(self._cola)
+
+    def proximo(self):
+        """
+        Devuelve el momento de la próxima consulta programada, o None si la cola está vacía.
+        """
+        with self._lock:
+            return self._cola[0][0] if self._cola else None
+
+    def vencidas(self, ahora=None, limite=None):
+        """
+        Saca de la cola las radicaciones cuya consulta ya venció, empezando por las más atrasadas.
+
+        Cada radicación entregada debe volver a la cola con `reprogramar`.
+
+        Args:
+            ahora (float, optional): Momento actual, como `time.time()`.
+            limite (int, optional): Número máximo de radicaciones a entregar.
+
+        Returns:
+            list: Números de radicación a consultar.
+        """
+        ahora = time.time() if ahora is None else ahora
+        vencidas = []
+        with self._lock:
+            while self._cola and self._cola[0][0] <= ahora and (limite is None or len(vencidas) < limite):
+                vencidas.append(heapq.heappop(self._cola)[1])
+        return vencidas
+
+    def reprogramar(self, numeroRadicacion, fecha_ultima_actuacion=None, error=False, ahora=None):
+        """
+        Devuelve una radicación a la cola con su próxima consulta según su actividad.
+
+        Args:
+            numeroRadicacion (str): Radicación consultada.
+            fecha_ultima_actuacion (str, optional): Fecha de la actuación más reciente conocida. Si es None
+                se conserva la anterior.
+            error (bool): Si la consulta falló. Los fallos seguidos alargan la espera de forma exponencial.
+            ahora (float, optional): Momento actual, como `time.time()`.
+
+        Returns:
+            float: Momento de la próxima consulta.
+        """
+        ahora = time.time() if ahora is None else ahora
+        with self._lock:
+            estado = self._estado[numeroRadicacion]
+            if fecha_ultima_actuacion and (estado["fechaUltimaActuacion"] or "") < fecha_ultima_actuacion:
+                estado["fechaUltimaActuacion"] = fecha_ultima_actuacion
+            if error:
+                estado["fallos"] += 1
+                intervalo = min(self.intervalo_maximo, self.intervalo_minimo * 2 ** (estado["fallos"] - 1))
+            else:
+                estado["fallos"] = 0
+                intervalo = intervalo_sondeo(estado["fechaUltimaActuacion"], ahora, self.intervalo_minimo,
+                                             self.intervalo_maximo)
+            # El jitter evita que las radicaciones agregadas juntas venzan siempre juntas
+            estado["proximo"] = ahora + intervalo * random.uniform(1 - JITTER, 1 + JITTER)
+            estado["ultimo"] = ahora
+            heapq.heappush(self._cola, (estado["proximo"], numeroRadicacion))
+            self._pendientes.add(numeroRadicacion)
+            return estado["proximo"]
+
+    def guardar(self):
+        """
+        Escribe en disco, en una sola transacción, el estado de las radicaciones que cambiaron.
+        """
+        with self._lock:
+            filas = []
+            for numero in self._pendientes:
+                estado = self._estado[numero]
+                filas.append((numero, estado["proximo"], estado.get("ultimo"), estado["fechaUltimaActuacion"],
+                              estado["fallos"]))
+            self._conexion.executemany(
+                "INSERT INTO sondeos (numeroRadicacion, proximo, ultimo, fechaUltimaActuacion, fallos) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (numeroRadicacion) DO UPDATE SET proximo = excluded.proximo, "
+                "ultimo = COALESCE(excluded.ultimo, ultimo), fechaUltimaActuacion = excluded.fechaUltimaActuacion, "
+                "fallos = excluded.fallos",
+                filas)
+            self._conexion.commit()
+            self._pendientes.clear()
+
+    def close(self):
+        with self._lock:
+            self._conexion.close()
+
+
+def vigilar(radicaciones, solicitudes_por_minuto=SOLICITUDES_POR_MINUTO, concurrencia=4, modo=MODO_ULTIMA,
+            ruta_estado=RUTA_VIGILANCIA, ruta_marcas=RUTA_MARCAS_VIGILANCIA, ruta_cache=RUTA_CACHE, intervalo_minimo=INTERVALO_MINIMO,
+            intervalo_maximo=INTERVALO_MAXIMO, historial=None, url_base=URL_BASE, detener=None, al_cambio=None,
+            al_mensaje=print):
+    """
+    Vigila de forma continua un portafolio de radicaciones y reporta solo los procesos con actuaciones nuevas.
+
+    En cada ronda se consultan, empezando por las más atrasadas, las radicaciones cuya consulta
+    venció, hasta agotar el presupuesto de solicitudes de la ronda. Las consultas son las mismas
+    del modo incremental: la primera vez se registra la marca de agua de cada proceso sin
+    reportarlo, y después solo se piden las actuaciones posteriores a la marca. Cada radicación
+    vuelve a la cola con un intervalo que depende del tiempo transcurrido desde su última actuación.
+
+    Args:
+        radicaciones (list): Números de radicación normalizados.
+        solicitudes_por_minuto (float): Presupuesto global de solicitudes a la API.
+        concurrencia (int): Solicitudes simultáneas a la API.
+        modo (str): Actuaciones nuevas a reportar de cada proceso: "ultima" o "completo".
+        ruta_estado (str): Archivo SQLite con el estado del planificador.
+        ruta_marcas (str): Archivo de marcas de agua del demonio, distinto del que usa `consultar --incremental`.
+        ruta_cache (str): Archivo SQLite de la caché local de respuestas de la API.
+        intervalo_minimo (float): Intervalo mínimo entre dos consultas de una radicación, en segundos.
+        intervalo_maximo (float): Intervalo máximo entre dos consultas de una radicación, en segundos.
+        historial (HistorialActuaciones, optional): Historial local donde se guardan todas las respuestas.
+        url_base (str): URL base de la API.
+        detener (threading.Event, optional): Al activarse, el demonio termina después de la ronda en curso.
+        al_cambio (callable, optional): Recibe el resultado de cada radicación con actuaciones nuevas, solo
+            con sus procesos que cambiaron.
+        al_mensaje (callable, optional): Recibe cada mensaje para el usuario.
+    """
+    detener = detener or threading.Event()
+    planificador = PlanificadorSondeo(ruta_estado, intervalo_minimo, intervalo_maximo)
+    planificador.vigilar(radicaciones)
+    marcas = MarcasAgua(ruta_marcas)
+    cache = CacheRespuestas(ruta_cache)
+    cliente = ClienteRama(url_base.rstrip("/"), conexiones=concurrencia, tasa_maxima=solicitudes_por_minuto / 60,
+                          cache=cache)
+    motor = MotorConsultas(concurrencia=concurrencia, cliente=cliente, marcas=marcas, modo=modo, historial=historial)
+    cupo = max(1, int(solicitudes_por_minuto * DURACION_RONDA / 60 / SOLICITUDES_POR_RADICACION))
+    al_mensaje(f"Vigilando {len(planificador)} radicaciones con {solicitudes_por_minuto:g} solicitudes por minuto.")
+
+    def al_resultado(resultado):
+        numero = resultado["numeroRadicacion"]
+        fechas = []
+        cambiados = []
+        for proceso in resultado["procesos"]:
+            if proceso["actuaciones"]:
+                marcas.registrar(proceso["idProceso"], proceso["actuaciones"][0]["actuacion"])
+            if proceso["nuevas"]:
+                cambiados.append(proceso)
+            marca = marcas.obtener(proceso["idProceso"])
+            if marca is not None:
+                fechas.append(marca[0])
+        planificador.reprogramar(numero, max(fechas) if fechas else None, error=resultado["error"] is not None)
+        if cambiados and al_cambio is not None:
+            al_cambio(dict(resultado, procesos=cambiados))
+
+    try:
+        while not detener.is_set():
+            vencidas = planificador.vencidas(time.time() + min(ADELANTO, intervalo_minimo * JITTER), limite=cupo)
+            if not vencidas:
+                proximo = planificador.proximo()
+                espera = ESPERA_MAXIMA if proximo is None else min(ESPERA_MAXIMA, max(0.0, proximo - time.time()))
+                detener.wait(espera)
+                continue
+            inicio = time.monotonic()
+            motor.procesar(vencidas, al_resultado)
+            # Las marcas avanzan después de reportar los cambios, igual que en el modo incremental
+            marcas.guardar()
+            planificador.guardar()
+            al_mensaje(f"Ronda de {len(vencidas)} radicaciones en {time.monotonic() - inicio:.1f} s. "
+                       f"Próxima consulta pendiente: {datetime.fromtimestamp(planificador.proximo()):%Y-%m-%d %H:%M:%S}.")
+    finally:
+        planificador.guardar()
+        planificador.close()
+        marcas.close()
+        cliente.close()
+        cache.close()